@@ -0,0 +1,259 @@
+import gc
+import json
+import sys
+
+from chart import Chart
+from display import Display
+import main
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    from time import perf_counter_ns
+
+    def ticks_us() -> int:
+        return perf_counter_ns() // 1000
+
+    def ticks_diff(ticks1: int, ticks2: int) -> int:
+        return ticks1 - ticks2
+
+
+DATASET_SIZES = (24, 48, 96, 192)
+
+LOG_PATH = "bench.log"
+BASELINE_PATH = "bench_baseline.json"
+
+# Allowed growth over the baseline before a stage is flagged as a regression
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.10
+# Absolute slack, so that stages close to zero do not flag on noise
+TIME_SLACK_US = 500
+MEMORY_SLACK_BYTES = 256
+
+# Most bytes a stage may allocate on the device, whatever the size of the dataset. The stages work in preallocated
+# buffers, so a stage over its budget has a hot path that allocates again. get_data builds the series and has none.
+ALLOCATION_BUDGETS = {
+    "Chart.update": 8192,
+    "Display.pack_planes": 512,
+    "Display._lut": 512,
+    "Display.redraw": 2048,
+    # The thread on core 1 takes a 4 kB stack from the heap
+    "Display.redraw_dual_core": 6144,
+}
+
+
+class GcProbe:
+    """
+    Measures heap use on MicroPython. The collector is disabled during a stage, so that the growth of
+    gc.mem_alloc() is the number of bytes the stage allocated. MicroPython only reports the bytes in use and not
+    the number of allocations, so stages are compared by bytes.
+    """
+
+    def start(self) -> None:
+        gc.collect()
+        gc.disable()
+        self._start = gc.mem_alloc()
+
+    def stop(self) -> tuple:
+        """
+        Returns (peak bytes, retained bytes) since start.
+        """
+        allocated = gc.mem_alloc() - self._start
+        gc.enable()
+        gc.collect()
+        return allocated, gc.mem_alloc() - self._start
+
+
+class Benchmark:
+    """
+    Runs pipeline stages and records time and heap use for each.
+    """
+
+    def __init__(self, probe=None, clock=None):
+        """
+        :param probe: Heap probe with start() and stop(), GcProbe if None.
+        :param clock: Optional function returning modelled I/O time in us, added to the measured time.
+        """
+        self._probe = probe if probe is not None else GcProbe()
+        self._clock = clock
+        self.results = {}
+
+    def stage(self, name: str, func, *args):
+        """
+        Runs func(*args) as a named stage and returns its result.
+        """
+        io_start = self._clock() if self._clock is not None else 0
+        self._probe.start()
+        start = ticks_us()
+        try:
+            result = func(*args)
+        finally:
+            time_us = ticks_diff(ticks_us(), start)
+            peak_bytes, retained_bytes = self._probe.stop()
+
+        if self._clock is not None:
+            time_us += self._clock() - io_start
+
+        self.results[name] = {
+            "time_us": time_us,
+            "peak_bytes": peak_bytes,
+            "retained_bytes": retained_bytes,
+        }
+        return result
+
+    def compare(self, baseline: dict) -> list:
+        """
+        Returns a list of descriptions of the stages that regressed against a baseline.
+        """
+        regressions = []
+        for name, result in self.results.items():
+            reference = baseline.get(name)
+            if reference is None:
+                continue
+
+            limit = reference["time_us"] * (1 + TIME_TOLERANCE) + TIME_SLACK_US
+            if result["time_us"] > limit:
+                regressions.append(f"{name}: time {result['time_us']} us, baseline {reference['time_us']} us")
+
+            limit = reference["peak_bytes"] * (1 + MEMORY_TOLERANCE) + MEMORY_SLACK_BYTES
+            if result["peak_bytes"] > limit:
+                regressions.append(f"{name}: peak {result['peak_bytes']} B, baseline {reference['peak_bytes']} B")
+
+        return regressions
+
+    def check_budgets(self, budgets: dict = ALLOCATION_BUDGETS) -> list:
+        """
+        Returns a list of descriptions of the stages that allocated more than their budget.
+        :param budgets: Peak bytes allowed per stage, keyed by stage name without the dataset.
+        """
+        violations = []
+        for name, result in self.results.items():
+            budget = budgets.get(name.split("/")[-1])
+            if budget is not None and result["peak_bytes"] > budget:
+                violations.append(f"{name}: peak {result['peak_bytes']} B, budget {budget} B")
+
+        return violations
+
+    def report(self) -> str:
+        lines = []
+        for name, result in self.results.items():
+            lines.append("%-32s %10d us %9d B peak %9d B retained" % (
+                name, result["time_us"], result["peak_bytes"], result["retained_bytes"]))
+        return "\n".join(lines)
+
+
+class PayloadHandler:
+    """
+    Stands in for RequestHandler and streams a fixed response body.
+    """
+    CHUNK_SIZE = 512
+
+    def __init__(self, body: bytes):
+        self._body = body
+
+    def stream_steps(self, url: str, feed, conditional: bool = False):
+        body = memoryview(self._body)
+        for start in range(0, len(body), self.CHUNK_SIZE):
+            feed(body[start:start + self.CHUNK_SIZE])
+            yield 0
+        return True
+
+    def load_cache(self):
+        return None
+
+    def save_cache(self, series) -> None:
+        pass
+
+
+def make_payload(points: int) -> bytes:
+    """
+    Returns a synthetic response body with a number of hourly prices, starting on 2024-01-01.
+    The current interval is a third into the data.
+    """
+    intervals = []
+    for index in range(points):
+        day = 1 + index // 24
+        hour = index % 24
+        # Morning and evening peaks on top of a base price
+        price = 60 + 40 * ((hour - 8) % 24 < 4) + 70 * ((hour - 17) % 24 < 4) + (index * 37) % 11
+        intervals.append({
+            "startDateTime": "2024-01-%02dT%02d:00:00.000+01:00" % (day, hour),
+            "price": price,
+        })
+
+    return json.dumps({"current": intervals[points // 3], "intervals": intervals}).encode()
+
+
+def run(display: Display, bench: Benchmark, body: bytes) -> None:
+    """
+    Runs every stage of the render and push pipeline once on a response body.
+    """
+    handler = PayloadHandler(body)
+    data = bench.stage("get_data", main.get_data, handler)
+
+    display.image.fill(display.WHITE)
+    chart = Chart(display)
+    bench.stage("Chart.update", chart.update, data)
+
+    bench.stage("Display.pack_planes", display.pack_planes)
+    bench.stage("Display._lut", display._lut)
+    bench.stage("Display.redraw", display.redraw)
+    bench.stage("Display.redraw_dual_core", display.redraw, True)
+
+
+def run_datasets(display: Display, sizes: tuple = DATASET_SIZES, recorded: dict = None, probe=None,
+                 clock=None) -> dict:
+    """
+    Runs the pipeline on synthetic datasets of each size and on recorded payloads.
+    Returns the results keyed by "<dataset>/<stage>".
+    :param recorded: Recorded response bodies keyed by name.
+    """
+    datasets = [(str(size), make_payload(size)) for size in sizes]
+    if recorded:
+        datasets += list(recorded.items())
+
+    results = {}
+    for dataset, body in datasets:
+        bench = Benchmark(probe, clock)
+        run(display, bench, body)
+        for name, result in bench.results.items():
+            results[dataset + "/" + name] = result
+
+    return results
+
+
+def run_on_device() -> bool:
+    """
+    Runs the benchmark on the device, appends the results to the log on flash and
+    compares them with the baseline on flash if there is one.
+    Returns False if a stage went over its allocation budget or regressed.
+    """
+    display = Display()
+    results = run_datasets(display)
+
+    bench = Benchmark()
+    bench.results = results
+    print(bench.report())
+
+    violations = bench.check_budgets()
+    for violation in violations:
+        print("OVER BUDGET", violation)
+
+    with open(LOG_PATH, "a") as file:
+        file.write(json.dumps({"platform": sys.platform, "results": results}))
+        file.write("\n")
+
+    try:
+        with open(BASELINE_PATH) as file:
+            baseline = json.load(file)
+    except OSError:
+        print("No baseline, saving results as baseline")
+        with open(BASELINE_PATH, "w") as file:
+            json.dump(results, file)
+        return not violations
+
+    regressions = bench.compare(baseline)
+    for regression in regressions:
+        print("REGRESSION", regression)
+
+    return not violations and not regressions
@@ -0,0 +1,56 @@
+import os
+import sys
+import utime
+
+LOG_PATH = "boot.log"
+# The log is moved to LOG_PATH.1 past this size, so that it never takes more than twice this of the flash
+LOG_MAX_BYTES = 4096
+
+# (name, time in us) of every module loaded with load() and every phase marked with mark()
+imports = []
+phases = []
+
+
+def load(name: str):
+    """
+    Imports a module and records how long the import took, unless it was already imported.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    start = utime.ticks_us()
+    module = __import__(name)
+    imports.append((name, utime.ticks_diff(utime.ticks_us(), start)))
+    return module
+
+
+def mark(name: str) -> None:
+    """
+    Records the time since reset at which a phase of the wake starts.
+    """
+    phases.append((name, utime.ticks_us()))
+
+
+def report() -> str:
+    parts = ["%s:%d" % (name, us) for name, us in phases]
+    parts += ["import %s:%d" % (name, us) for name, us in imports]
+    return " ".join(parts)
+
+
+def save(path: str = LOG_PATH) -> None:
+    """
+    Appends the profile of this wake to the boot log.
+    """
+    try:
+        if os.stat(path)[6] > LOG_MAX_BYTES:
+            os.rename(path, path + ".1")
+    except OSError:
+        pass
+
+    try:
+        with open(path, "a") as file:
+            file.write(report())
+            file.write("\n")
+    except OSError:
+        pass
@@ -1,5 +1,9 @@
+import memory
+import plot
 from display import Display
 from partialdate import PartialDate
+from series import Series, bisect_left, bisect_right
+from sprites import SpriteCache
 
 
 class Chart:
@@ -10,97 +14,91 @@ class Chart:
     DETAIL_CHART_HEIGHT = 189
     OVERVIEW_CHART_HEIGHT = 100
 
-    TIME_SLOTS_TO_SHOW = 18
+    # Hours shown in the detail chart, in as many slots as the resolution of the data needs
+    HOURS_TO_SHOW = 18
 
-    def __init__(self, display: Display):
+    def __init__(self, display: Display, sprites: SpriteCache = None):
+        """
+        :param sprites: Prebuilt labels and dash row, built for this chart if None.
+        """
         self._display = display
-        self._current_time = None
-        self._data = []
-        self._current_value = 0
-        self._max_value = 0
-        self._min_value = 0
-        self._avg_value = 0
-
-    def update(self, data: list, current_time: PartialDate) -> None:
+        self._sprites = sprites if sprites is not None else SpriteCache(display.WIDTH)
+        self._data = None
+        self._overview = None
+
+    def update(self, data, current_time: PartialDate = None, overview: Series = None) -> None:
         """
         Redraws the chart to the display buffer.
-        :param data: Data to show in chart. Ordered list of tuples formatted as (time: PartialDate, value: float).
-        :param current_time: Current time.
+        :param data: Series to show in chart, or an ordered list of tuples formatted as (time: PartialDate, value: float).
+        :param current_time: Current time. Only used when data is a list, a Series knows its current slot.
+        :param overview: Series shown in the overview chart, such as a longer period read from the history on flash.
+            The overview shows data if None.
         """
-        self._current_time = current_time
-        self._data = data
-        self._max_value = 0
-        self._min_value = data[0][1]
-        self._avg_value = 0
-
-        current_time_index = None
+        if not isinstance(data, Series):
+            data = Series.from_points(data, current_time)
 
-        for index, (time, value) in enumerate(data):
-            self._avg_value += value
+        if data.current_index is None:
+            raise ValueError("Current time is not in the data")
 
-            if current_time.is_same_hour(time):
-                self._current_value = value
-                current_time_index = index
-
-            if self._max_value < value:
-                self._max_value = value
-
-            if self._min_value > value:
-                self._min_value = value
-
-        self._avg_value /= len(data)
-        
-        start_index = current_time_index - 1
-        end_index = min(start_index + self.TIME_SLOTS_TO_SHOW + 2, len(self._data) - 1)
+        self._data = data
+        self._overview = overview if overview is not None and len(overview) > 1 else data
 
-        start = self._data[start_index][0]
-        stop = self._data[end_index][0]
+        start_key, stop_key = self.get_window(data.current_key, data.slot_minutes)
+        start_index = bisect_left(data.keys, start_key)
+        end_index = bisect_right(data.keys, stop_key) - 1
 
         self._draw_top_bar()
-        self._draw_detail_chart(start, stop)
-        self._draw_overview_chart(start, stop)
+        self._draw_detail_chart(start_index, end_index)
+        self._draw_overview_chart(start_index, end_index)
+
+    @classmethod
+    def get_window(cls, current_key: int, slot_minutes: int = 60) -> tuple:
+        """
+        Returns the keys of the first and last slot shown in the detail chart.
+        The detail chart shows the slots from an hour before the current, the edge slots are only partly visible.
+        """
+        slots_per_hour = _slots_per_hour(slot_minutes)
+        start_key = current_key - slots_per_hour
+        return start_key, start_key + (cls.HOURS_TO_SHOW + 2) * slots_per_hour
 
     def _draw_top_bar(self) -> None:
         self._display.image.rect(0, 0, self._display.WIDTH, self.TOP_BAR_HEIGHT, self._display.BLACK, True)
 
-        now_str = _format_float_str(self._current_value, 3, 2)
-        avg_str = _format_float_str(self._avg_value, 3, 2)
-        max_str = _format_float_str(self._max_value, 3, 2)
-        min_str = _format_float_str(self._min_value, 3, 2)
-        
-        string = f"Nu: {now_str}  Med: {avg_str}  Max: {max_str}  Min: {min_str}"
+        # One format, without a temporary string per value
+        string = "Nu: %.2f  Med: %.2f  Max: %.2f  Min: %.2f" % (self._data.current_value, self._data.average,
+                                                                 self._data.max_value, self._data.min_value)
 
         x = self._display.WIDTH // 2
         y = 2 + self.CHAR_HEIGHT // 2
         self._draw_centered_text(string, x, y, self._display.WHITE)
 
 
-    def _draw_detail_chart(self, start: PartialDate, stop: PartialDate) -> None:
-        data_to_draw = [data_point for data_point in self._data if data_point[0].is_in_range(start, stop)]
+    def _draw_detail_chart(self, start_index: int, end_index: int) -> None:
+        values = self._data.values
+        count = end_index - start_index + 1
+        slots_per_hour = _slots_per_hour(self._data.slot_minutes)
 
-        point_distance = self._display.WIDTH / (len(data_to_draw) - 2)
+        # The hour before the current one is left of the chart, the slots of the next HOURS_TO_SHOW + 1 hours fill it
+        point_distance = self._display.WIDTH / (count - 1 - slots_per_hour)
         bottom_spacing = 2
         graph_height = self.DETAIL_CHART_HEIGHT - self.CHAR_HEIGHT - bottom_spacing
-        value_scale_factor = graph_height / self._max_value
-
-        previous_x = previous_y = None
-
-        for index, (time, value) in enumerate(data_to_draw):
-            point_x = int(index * point_distance - point_distance / 2)
-            point_y = int(self.TOP_BAR_HEIGHT + graph_height - value * value_scale_factor)
-
-            if index != 0:
-                self._display.image.line(previous_x, previous_y, point_x, point_y, self._display.BLACK)
-
-                if index != len(data_to_draw) - 1:
-                    text = _format_int_str(time.hour, 2)
-                    text_y = self.TOP_BAR_HEIGHT + graph_height + 1 + self.CHAR_HEIGHT // 2
-                    self._draw_centered_text(text, point_x, text_y, self._display.BLACK)
-
-            previous_x = point_x
-            previous_y = point_y
-
-        self._draw_dashed_line(int(self.TOP_BAR_HEIGHT + graph_height - self._avg_value * value_scale_factor))
+        value_scale_factor = graph_height / self._data.max_value
+
+        points, point_count = self._project(values, start_index, end_index + 1,
+                                            point_distance / 2 - point_distance * slots_per_hour, point_distance,
+                                            self.TOP_BAR_HEIGHT + graph_height, value_scale_factor)
+        plot.polyline(self._display.image, points, point_count, self._display.BLACK)
+
+        # A label in the middle of every hour in the chart
+        text_y = self.TOP_BAR_HEIGHT + graph_height + 1
+        for index in range(slots_per_hour, count - slots_per_hour):
+            if self._data.keys[start_index + index] * self._data.slot_minutes % 60:
+                continue
+            text_x = int(index * point_distance - point_distance * slots_per_hour / 2) - self.CHAR_WIDTH
+            self._sprites.draw_hour(self._display.image, self._data.hour(start_index + index), text_x, text_y,
+                                    self._display.BLACK)
+
+        self._draw_dashed_line(int(self.TOP_BAR_HEIGHT + graph_height - self._data.average * value_scale_factor))
         self._draw_y_axis_values(graph_height, value_scale_factor)
 
         divider_y = self.TOP_BAR_HEIGHT + self.DETAIL_CHART_HEIGHT - 1
@@ -108,7 +106,7 @@ class Chart:
 
     def _draw_y_axis_values(self, graph_height: int, value_scale_factor: float) -> None:
         floor_to = 20
-        max_draw_value = (self._max_value // floor_to) * floor_to
+        max_draw_value = (self._data.max_value // floor_to) * floor_to
 
         values_to_draw = [max_draw_value, max_draw_value * 3 / 4, max_draw_value * 2 / 4, max_draw_value * 1 / 4]
 
@@ -116,48 +114,63 @@ class Chart:
             text = str(int(value))
             y_pos = int(self.TOP_BAR_HEIGHT + graph_height - value * value_scale_factor)
             x_pos = 5
-            self._display.image.text(text, x_pos, y_pos, self._display.DARK_GRAY)
+            self._sprites.draw_label(self._display.image, text, x_pos, y_pos, self._display.DARK_GRAY)
 
-    def _draw_overview_chart(self, detail_start: PartialDate, detail_end: PartialDate) -> None:
-        point_distance = self._display.WIDTH / (len(self._data) - 1)
-        value_scale_factor = self.OVERVIEW_CHART_HEIGHT / self._max_value
+    def _draw_overview_chart(self, detail_start_index: int, detail_end_index: int) -> None:
+        overview = self._overview
+        values = overview.values
+        point_distance = self._display.WIDTH / (len(values) - 1)
+        value_scale_factor = self.OVERVIEW_CHART_HEIGHT / overview.max_value
         start_height = self.TOP_BAR_HEIGHT + self.DETAIL_CHART_HEIGHT
 
-        start = None
-        end = None
-        for index, (time, value) in enumerate(self._data):
-            if start is None and time.more_or_equal_to(detail_start):
-                start = int(index * point_distance + point_distance / 2)
+        if overview is not self._data:
+            # Positions of the detail window in the slots of the overview
+            detail_start_index = self._overview_position(self._data.keys[detail_start_index])
+            detail_end_index = self._overview_position(self._data.keys[detail_end_index] + 1) - 1
 
-            if start is not None and time.less_or_equal_to(detail_end):
-                end = int(index * point_distance - point_distance / 2)
+        start = int(detail_start_index * point_distance + point_distance / 2)
+        end = int(detail_end_index * point_distance - point_distance / 2)
 
         width = end - start
         height = self.OVERVIEW_CHART_HEIGHT
         self._display.image.rect(start, start_height, width, height, self._display.LIGHT_GRAY, True)
 
-        previous_x = None
-        previous_y = None
+        points, point_count = self._project(values, 0, len(values), 0, point_distance,
+                                            start_height + self.OVERVIEW_CHART_HEIGHT, value_scale_factor)
+        plot.polyline(self._display.image, points, point_count, self._display.BLACK)
 
-        for index, (time, value) in enumerate(self._data):
-            point_x = int(index * point_distance)
-            point_y = int(start_height + self.OVERVIEW_CHART_HEIGHT - value * value_scale_factor)
-
-            if index != 0:
-                self._display.image.line(previous_x, previous_y, point_x, point_y, self._display.BLACK)
-
-            previous_x = point_x
-            previous_y = point_y
-
-        line_y = int(start_height + self.OVERVIEW_CHART_HEIGHT - self._avg_value * value_scale_factor)
+        line_y = int(start_height + self.OVERVIEW_CHART_HEIGHT - overview.average * value_scale_factor)
         self._draw_dashed_line(line_y)
 
-    def _draw_dashed_line(self, y_pos: int) -> None:
-        dash_len = 4
+    def _overview_position(self, key: int) -> float:
+        """
+        Returns the position of the start of a slot of the data counted in slots of the overview from its first.
+        Gaps in the overview are not counted.
+        """
+        minute = key * self._data.slot_minutes
+        overview = self._overview
+        slot = minute / overview.slot_minutes
+        index = bisect_right(overview.keys, minute // overview.slot_minutes)
+        if index == 0:
+            return 0
+        if index == len(overview):
+            return index - 1 + slot - overview.keys[-1]
+        return index - 1 + (slot - overview.keys[index - 1]) / (overview.keys[index] - overview.keys[index - 1])
+
+    def _project(self, values, start: int, stop: int, x_offset: float, x_step: float, y_offset: int,
+                 y_scale: float) -> tuple:
+        """
+        Converts values to pixel coordinates, at most two per pixel column.
+        Returns (reused array of x, y pairs, number of points).
+        """
+        # Sized for a point per column of the display up front, so that the buffer is not replaced as series grow
+        columns = abs(int((stop - 1 - start) * x_step)) + 2
+        length = max(4 * min(stop - start, columns), 4 * (self._display.WIDTH + 2))
+        points = memory.array_buffer("points", "h", length)
+        return points, plot.project(values, start, stop, x_offset, x_step, y_offset, y_scale, points)
 
-        for start_x in range(dash_len // 2, self._display.WIDTH, dash_len * 2):
-            end_x = start_x + dash_len - 1
-            self._display.image.line(start_x, y_pos, end_x, y_pos, self._display.DARK_GRAY)
+    def _draw_dashed_line(self, y_pos: int) -> None:
+        self._sprites.draw_dashed_line(self._display.image, y_pos, self._display.DARK_GRAY)
 
     def _draw_centered_text(self, text: str, x: int, y: int, color) -> None:
         x -= (self.CHAR_WIDTH * len(text)) // 2
@@ -165,23 +178,9 @@ class Chart:
         self._display.image.text(text, x, y, color)
 
 
-def _interpolate_between(value1, value2, hour) -> float:
-    return value1 + (value2 - value1) * hour
-
-
-def _format_int_str(value: float, length: int = 1) -> str:
-    value = int(value)
-    missing = length - len(str(value))
-    return "0" * missing + str(value)
+def _slots_per_hour(slot_minutes: int) -> int:
+    return max(1, 60 // slot_minutes)
 
 
-def _format_float_str(value: float, integers: int, decimals: int) -> str:
-    string = str(round(float(value), decimals))
-
-    decimal_count = 0
-    for index, char in enumerate(string):
-        if char == ".":
-            decimal_count = len(string) - index - 1
-
-    missing_decimals = decimals - decimal_count
-    return string + "0" * missing_decimals
+def _interpolate_between(value1, value2, hour) -> float:
+    return value1 + (value2 - value1) * hour
@@ -0,0 +1,55 @@
+import machine
+import time
+
+from partialdate import days_from_civil, civil_from_days
+
+# The clock is considered unset before this year, the RTC starts in 2021 after a reset
+MIN_YEAR = 2024
+
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def now():
+    """
+    Returns the time in seconds since 1970-01-01 00:00 UTC, or None if the clock has not been set.
+    """
+    year, month, day, hour, minute, second = time.gmtime()[:6]
+    if year < MIN_YEAR:
+        return None
+
+    return ((days_from_civil(year, month, day) * 24 + hour) * 60 + minute) * 60 + second
+
+
+def set_time(utc_seconds: int) -> None:
+    """
+    Sets the RTC to a time in seconds since 1970-01-01 00:00 UTC.
+    """
+    days, seconds = divmod(utc_seconds, 86400)
+    year, month, day = civil_from_days(days)
+    # The RTC counts weekdays from Monday, 1970-01-01 was a Thursday
+    weekday = (days + 3) % 7
+    machine.RTC().datetime((year, month, day, weekday, seconds // 3600, seconds // 60 % 60, seconds % 60, 0))
+
+
+def parse_http_date(value: str):
+    """
+    Returns the time of an HTTP date such as "Sun, 06 Nov 1994 08:49:37 GMT" in seconds since
+    1970-01-01 00:00 UTC, or None if the date can not be parsed.
+    """
+    parts = value.split()
+    if len(parts) != 6 or parts[5] != "GMT" or parts[2] not in _MONTHS:
+        return None
+
+    clock = parts[4].split(":")
+    if len(clock) != 3:
+        return None
+
+    try:
+        day = int(parts[1])
+        year = int(parts[3])
+        hour, minute, second = int(clock[0]), int(clock[1]), int(clock[2])
+    except ValueError:
+        return None
+
+    month = _MONTHS.index(parts[2]) + 1
+    return ((days_from_civil(year, month, day) * 24 + hour) * 60 + minute) * 60 + second
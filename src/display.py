@@ -1,9 +1,26 @@
 import machine
 import framebuf
 import utime
+import uasyncio
+import memory
+import planes
+import telemetry
+from planar import PlanarFrameBuffer
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+# Step of a command sequence that waits for the display instead of a fixed delay
+WAIT_BUSY = -1
+
+# Phases of a redraw, bound once so that a redraw does not allocate them
+_SPI_PHASE = telemetry.Phase(telemetry.SPI)
+_PACK_PHASE = telemetry.Phase(telemetry.PACK)
 
 # 0~3 gray
-LUT_VCOM = [
+LUT_VCOM = bytes([
     0x00, 0x0A, 0x00, 0x00, 0x00, 0x01,
     0x60, 0x14, 0x14, 0x00, 0x00, 0x01,
     0x00, 0x14, 0x00, 0x00, 0x00, 0x01,
@@ -11,9 +28,9 @@ LUT_VCOM = [
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00
-]
+])
 # R21
-LUT_WW = [
+LUT_WW = bytes([
     0x40, 0x0A, 0x00, 0x00, 0x00, 0x01,
     0x90, 0x14, 0x14, 0x00, 0x00, 0x01,
     0x10, 0x14, 0x0A, 0x00, 0x00, 0x01,
@@ -21,9 +38,9 @@ LUT_WW = [
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-]
+])
 # R22H r
-LUT_BW = [
+LUT_BW = bytes([
     0x40, 0x0A, 0x00, 0x00, 0x00, 0x01,
     0x90, 0x14, 0x14, 0x00, 0x00, 0x01,
     0x00, 0x14, 0x0A, 0x00, 0x00, 0x01,
@@ -31,9 +48,9 @@ LUT_BW = [
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-]
+])
 # R23H w
-LUT_WB = [
+LUT_WB = bytes([
     0x40, 0x0A, 0x00, 0x00, 0x00, 0x01,
     0x90, 0x14, 0x14, 0x00, 0x00, 0x01,
     0x00, 0x14, 0x0A, 0x00, 0x00, 0x01,
@@ -41,9 +58,9 @@ LUT_WB = [
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-]
+])
 #  R24H b
-LUT_BB = [
+LUT_BB = bytes([
     0x80, 0x0A, 0x00, 0x00, 0x00, 0x01,
     0x90, 0x14, 0x14, 0x00, 0x00, 0x01,
     0x20, 0x14, 0x0A, 0x00, 0x00, 0x01,
@@ -51,7 +68,26 @@ LUT_BB = [
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-]
+])
+
+# Black and white only, one short phase driving every pixel straight to its level
+LUT_VCOM_FAST = bytes([0x00, 0x0E, 0x00, 0x00, 0x00, 0x01] + [0x00] * 36)
+# Pixels ending white
+LUT_WHITE_FAST = bytes([0xA0, 0x0E, 0x00, 0x00, 0x00, 0x01] + [0x00] * 36)
+# Pixels ending black
+LUT_BLACK_FAST = bytes([0x50, 0x0E, 0x00, 0x00, 0x00, 0x01] + [0x00] * 36)
+
+# 4 gray for windows, the last phase of each 4 gray waveform, which drives every pixel to its level. The phases before
+# it flash the pixels between black and white to clear their previous level, which is left to the QUALITY refresh.
+LUT_VCOM_PARTIAL = bytes([0x00, 0x13, 0x0A, 0x01, 0x00, 0x01] + [0x00] * 36)
+LUT_WW_PARTIAL = bytes([0xA0, 0x13, 0x01, 0x00, 0x00, 0x01] + [0x00] * 36)
+LUT_BW_PARTIAL = bytes([0x99, 0x0C, 0x01, 0x03, 0x04, 0x01] + [0x00] * 36)
+LUT_WB_PARTIAL = bytes([0x99, 0x0B, 0x04, 0x04, 0x01, 0x01] + [0x00] * 36)
+LUT_BB_PARTIAL = bytes([0x50, 0x13, 0x01, 0x00, 0x00, 0x01] + [0x00] * 36)
+
+
+class DisplayError(Exception):
+    pass
 
 
 class Display:
@@ -63,12 +99,35 @@ class Display:
     CS_PIN = 6
     BUSY_PIN = 21
 
+    # Largest block written to the SPI bus in one call
+    CHUNK_SIZE = 1024
+    # Rows packed by core 1 between handoffs to core 0 in a dual core redraw
+    PACK_ROWS = 10
+
     BLACK = 0x00
     DARK_GRAY = 0xaa
     LIGHT_GRAY = 0x55
     WHITE = 0xff
 
-    def __init__(self):
+    # Refresh profiles
+    QUALITY = 0  # whole screen in 4 gray, clears ghosting
+    FAST = 1  # whole screen in black and white with a short waveform, for frames without gray
+    PARTIAL = 2  # windows in 4 gray with a short waveform
+    PROFILE_NAMES = ("quality", "fast", "partial")
+
+    # The display pulls BUSY low within this time after a command that makes it busy
+    BUSY_START_MS = 10
+    # Longest sleep between checks of BUSY, in case the edge does not wake the CPU
+    BUSY_SLEEP_MS = 1000
+    # A display busy for longer than this is stuck
+    BUSY_TIMEOUT_MS = 20000
+
+    def __init__(self, planar: bool = False, init: bool = True):
+        """
+        :param planar: Draw straight into the planes sent to the display instead of a GS2_HMSB buffer.
+            Saves the 30 kB image buffer and the conversion on every redraw.
+        :param init: Initialise the display now. If False, await init_async before sending anything.
+        """
         self._reset_pin = machine.Pin(self.RST_PIN, machine.Pin.OUT)
         self._dc_pin = machine.Pin(self.DC_PIN, machine.Pin.OUT)
         self._cs_pin = machine.Pin(self.CS_PIN, machine.Pin.OUT)
@@ -77,27 +136,64 @@ class Display:
         self._spi = machine.SPI(1)
         self._spi.init(baudrate=4000_000)
 
-        self._buffer = bytearray(self.HEIGHT * self.WIDTH // 4)
-        self.image = framebuf.FrameBuffer(self._buffer, self.WIDTH, self.HEIGHT, framebuf.GS2_HMSB)
+        # Reusable transfer buffers
+        self._command_buffer = bytearray(1)
+        self._window_buffer = bytearray(9)
+        self._chunk_buffer = memory.buffer("spi", self.CHUNK_SIZE)
+
+        # Transfer counters, reset at the start of every frame
+        self.transactions = 0
+        self.bytes_sent = 0
+
+        # Duration of the last refresh, measured until BUSY is released, in total and per profile
+        self.refresh_ms = 0
+        self.refresh_times = {}
+        self._profile = self.QUALITY
+
+        # Set by the interrupt on the rising edge of BUSY, the handler is bound once to not allocate in the wait
+        self._busy_flag = uasyncio.ThreadSafeFlag()
+        self._busy_released = False
+        self._busy_handler = self._on_busy_release
+
+        # Handoff between the packing on core 1 and the transfer on core 0 in a dual core redraw. Both cores read
+        # and write the pack state while holding _pack_lock, _pack_ready is released when core 1 makes progress.
+        self._pack_lock = _thread.allocate_lock() if _thread is not None else None
+        self._pack_ready = _thread.allocate_lock() if _thread is not None else None
+        self._packed_rows = 0
+        self._pack_error = None
+        self._pack_done = True
+        self._pack_cancel = False
+
+        # Planes sent to the display, packed from the image buffer on redraw unless drawn into directly
+        self._old_plane = bytearray(self.HEIGHT * self.WIDTH // 8)
+        self._new_plane = bytearray(self.HEIGHT * self.WIDTH // 8)
+
+        self.planar = planar
+        if planar:
+            self._buffer = None
+            self.image = PlanarFrameBuffer(self._old_plane, self._new_plane, self.WIDTH, self.HEIGHT)
+        else:
+            self._buffer = bytearray(self.HEIGHT * self.WIDTH // 4)
+            self.image = framebuf.FrameBuffer(self._buffer, self.WIDTH, self.HEIGHT, framebuf.GS2_HMSB)
+
+        if init:
+            self._run(self._init())
+            #self.clear()
+            self._delay_ms(500)
 
-        self._init()
-        #self.clear()
-        self._delay_ms(500)
+    async def init_async(self) -> None:
+        """
+        Initialises the display, letting other tasks run during the reset pulses and the power on.
+        """
+        await self._run_async(self._init())
+        await uasyncio.sleep_ms(500)
 
     def turn_on_display(self) -> None:
-        self._send_command(0x12)
-        self._delay_ms(100)
-        self._read_busy()
+        self._run(self._turn_on_display())
 
     # Hardware reset
     def reset(self) -> None:
-        for _ in range(3):
-            self._digital_write(self._reset_pin, 1)
-            self._delay_ms(20)
-            self._digital_write(self._reset_pin, 0)
-            self._delay_ms(2)
-        self._digital_write(self._reset_pin, 1)
-        self._delay_ms(20)
+        self._run(self._reset())
 
     def clear(self) -> None:
         if self.WIDTH % 8 == 0:
@@ -105,82 +201,230 @@ class Display:
         else:
             wide = self.WIDTH // 8 + 1
 
-        self._send_command(0x10)
-        for j in range(0, self.HEIGHT):
-            for i in range(0, wide):
-                self._send_data(0xff)
-
-        self._send_command(0x13)
-        for j in range(0, self.HEIGHT):
-            for i in range(0, wide):
-                self._send_data(0xff)
+        self.reset_transfer_stats()
+        self._send_repeated(0x10, 0xff, wide * self.HEIGHT)
+        self._send_repeated(0x13, 0xff, wide * self.HEIGHT)
 
         self._send_command(0x12)
         self._delay_ms(10)
         self.turn_on_display()
 
-    def redraw(self) -> None:
+    def _turn_on_display(self):
+        start = utime.ticks_ms()
+        self._send_command(0x12)
+        yield WAIT_BUSY
+        self.refresh_ms = utime.ticks_diff(utime.ticks_ms(), start)
+        self.refresh_times[self._profile] = self.refresh_ms
+        print("e-Paper refresh", self.PROFILE_NAMES[self._profile], self.refresh_ms, "ms")
+
+    def _reset(self):
+        for _ in range(3):
+            self._digital_write(self._reset_pin, 1)
+            yield 20
+            self._digital_write(self._reset_pin, 0)
+            yield 2
+        self._digital_write(self._reset_pin, 1)
+        yield 20
+
+    def redraw(self, dual_core: bool = False) -> None:
         """
         Sends the image buffer to the display.
+        :param dual_core: Pack the planes on core 1 while core 0 sends the rows already packed. Packs first and
+            then sends on one core if False, in planar mode or without _thread. The firmware draws in planar mode,
+            which has nothing to pack, so this only speeds up redraws of the GS2_HMSB buffer. Core 1 marks the
+            packing done just before its thread returns, so a second dual core redraw straight after this one can
+            fail to start core 1 while it is still in use.
         """
-        def send_bytes(temp: bool):
-            for i in range(self.WIDTH * self.HEIGHT // 8):
-                output_byte = 0
-
-                # Iterate over the least significant and most significant bits of the pixel
-                for j in range(2):
-                    # Extract the pixel value from the image
-                    pixel_value = self._buffer[i * 2 + j]
-
-                    # Iterate over the two least significant and two most significant bits of the pixel value
-                    for k in range(2):
-                        # Extract the two least significant bits of the pixel value
-                        pixel_bits = pixel_value & 0x03
-
-                        # Set output_byte based on the value of pixel_bits
-                        if pixel_bits == 0x03:
-                            output_byte |= 0x01  # white
-                        elif pixel_bits == 0x00:
-                            output_byte |= 0x00  # black
-                        elif pixel_bits == 0x02:
-                            output_byte |= 0x00 if temp else 0x01  # gray1
-                        else:  # 0x01
-                            output_byte |= 0x01 if temp else 0x00  # gray2
-
-                        # Shift output_byte one position to the left
-                        output_byte <<= 1
-                        # Shift pixel_value two positions to the right
-                        pixel_value >>= 2
-                        # Extract the two most significant bits of the pixel value
-                        pixel_bits = pixel_value & 0x03
-
-                        # Set output_byte based on the value of pixel_bits
-                        if pixel_bits == 0x03:  # white
-                            output_byte |= 0x01
-                        elif pixel_bits == 0x00:  # black
-                            output_byte |= 0x00
-                        elif pixel_bits == 0x02:
-                            output_byte |= 0x00 if temp else 0x01  # gray1
-                        else:  # 0x01
-                            output_byte |= 0x01 if temp else 0x00  # gray2
-
-                        # If j is not equal to 1 or k is not equal to 1, shift output_byte one position to the left
-                        if (j != 1) | (k != 1):
-                            output_byte <<= 1
-
-                        # Shift pixel_value two positions to the right
-                        pixel_value >>= 2
-
-                self._send_data(output_byte)
-
-        self._send_command(0x10)
-        send_bytes(True)
-
-        self._send_command(0x13)
-        send_bytes(False)
-
-        self._lut()
-        self.turn_on_display()
+        if dual_core and _thread is not None and not self.planar:
+            self._run(self._redraw_dual_core())
+        else:
+            self.pack_planes()
+            self.redraw_planes()
+
+    @telemetry.Phase(telemetry.PACK)
+    def pack_planes(self) -> None:
+        """
+        Converts the image buffer into the planes sent to the display. Does nothing in planar mode.
+        """
+        if not self.planar:
+            planes.pack(self._buffer, self._old_plane, self._new_plane)
+
+    def get_planes(self) -> tuple:
+        """
+        Returns the packed planes as (old plane, new plane).
+        """
+        return self._old_plane, self._new_plane
+
+    def redraw_planes(self, profile: int = QUALITY, while_busy=None) -> None:
+        """
+        Sends the packed planes to the display and refreshes the whole screen.
+        :param profile: QUALITY, or FAST if the frame only has black and white, which is when the planes are equal.
+        :param while_busy: Called once the refresh has started, before the CPU light-sleeps until it ends.
+        """
+        self._run(self._redraw_planes(profile), while_busy)
+
+    async def redraw_planes_async(self, profile: int = QUALITY) -> None:
+        """
+        Same as redraw_planes, letting other tasks run while the display refreshes.
+        """
+        await self._run_async(self._redraw_planes(profile))
+
+    def redraw_windows(self, windows: list, while_busy=None) -> None:
+        """
+        Sends parts of the packed planes to the display and refreshes only those parts. The controller refreshes
+        one window at a time, so several windows are sent and refreshed as the window bounding them all.
+        :param windows: List of (x, y, width, height) tuples. x and width must be multiples of 8.
+        :param while_busy: Called once the refresh has started, before the CPU light-sleeps until it ends.
+        """
+        self._run(self._redraw_windows(windows), while_busy)
+
+    async def redraw_windows_async(self, windows: list) -> None:
+        """
+        Same as redraw_windows, letting other tasks run while the display refreshes.
+        """
+        await self._run_async(self._redraw_windows(windows))
+
+    def _redraw_planes(self, profile: int):
+        self.reset_transfer_stats()
+        self._profile = profile
+
+        with _SPI_PHASE:
+            self._send(0x10, self._old_plane)
+            self._send(0x13, self._new_plane)
+
+        self._lut(profile)
+        yield from self._turn_on_display()
+
+    def _redraw_dual_core(self):
+        self.reset_transfer_stats()
+        self._profile = self.QUALITY
+
+        self._packed_rows = 0
+        self._pack_error = None
+        self._pack_done = False
+        self._pack_cancel = False
+        if not self._pack_ready.locked():
+            self._pack_ready.acquire()
+        _thread.start_new_thread(self._pack_rows, ())
+
+        try:
+            with _SPI_PHASE:
+                self._send_packed(0x10, self._old_plane)
+                # Core 1 packs the new plane together with the old one, so it is ready by now
+                self._wait_packed(self.HEIGHT)
+                self._send(0x13, self._new_plane)
+        finally:
+            # Core 1 stops at the next block if the transfer failed, and is free again once this returns
+            with self._pack_lock:
+                self._pack_cancel = True
+            while not self._pack_done:
+                self._pack_ready.acquire()
+
+        self._lut(self.QUALITY)
+        yield from self._turn_on_display()
+
+    def _pack_rows(self) -> None:
+        """
+        Runs on core 1: packs the image buffer into the planes PACK_ROWS rows at a time and hands every block over
+        to core 0. An exception is handed over instead, to be raised on core 0.
+        """
+        src_row_bytes = self.WIDTH // 4
+        row_bytes = self.WIDTH // 8
+        src = memoryview(self._buffer)
+        old_plane = memoryview(self._old_plane)
+        new_plane = memoryview(self._new_plane)
+
+        try:
+            for row in range(0, self.HEIGHT, self.PACK_ROWS):
+                if self._pack_cancel:
+                    break
+
+                end = min(row + self.PACK_ROWS, self.HEIGHT)
+                planes.pack(src[row * src_row_bytes:end * src_row_bytes], old_plane[row * row_bytes:end * row_bytes],
+                            new_plane[row * row_bytes:end * row_bytes])
+
+                with self._pack_lock:
+                    self._packed_rows = end
+                    if self._pack_ready.locked():
+                        self._pack_ready.release()
+        except Exception as e:
+            with self._pack_lock:
+                self._pack_error = e
+        finally:
+            with self._pack_lock:
+                self._pack_done = True
+                if self._pack_ready.locked():
+                    self._pack_ready.release()
+
+    def _wait_packed(self, rows: int) -> None:
+        """
+        Waits on core 0 until core 1 has packed a number of rows, and raises the exception of core 1 if it failed.
+        """
+        with _PACK_PHASE:
+            while True:
+                with self._pack_lock:
+                    packed_rows = self._packed_rows
+                    error = self._pack_error
+                    done = self._pack_done
+
+                if error is not None:
+                    raise error
+                if packed_rows >= rows:
+                    return
+                if done:
+                    raise DisplayError("Packing stopped at row %d" % packed_rows)
+
+                self._pack_ready.acquire()
+
+    def _send_packed(self, command: int, plane) -> None:
+        """
+        Sends a command followed by a plane as one transaction, each chunk as soon as core 1 has packed its rows.
+        """
+        row_bytes = self.WIDTH // 8
+        view = memoryview(plane)
+        count = len(view)
+
+        self._begin_transaction(command)
+
+        for start in range(0, count, self.CHUNK_SIZE):
+            end = min(start + self.CHUNK_SIZE, count)
+            self._wait_packed((end + row_bytes - 1) // row_bytes)
+            self._spi.write(view[start:end])
+
+        self._end_transaction(count)
+
+    def _redraw_windows(self, windows: list):
+        self.reset_transfer_stats()
+        self._profile = self.PARTIAL
+        self._lut(self.PARTIAL)
+
+        x, y, width, height = windows[0]
+        x_end = x + width - 1
+        y_end = y + height - 1
+        for window_x, window_y, window_width, window_height in windows[1:]:
+            x = min(x, window_x)
+            y = min(y, window_y)
+            x_end = max(x_end, window_x + window_width - 1)
+            y_end = max(y_end, window_y + window_height - 1)
+
+        window = self._window_buffer
+        window[0] = x >> 8
+        window[1] = x & 0xff
+        window[2] = x_end >> 8
+        window[3] = x_end & 0xff
+        window[4] = y >> 8
+        window[5] = y & 0xff
+        window[6] = y_end >> 8
+        window[7] = y_end & 0xff
+        window[8] = 0x28
+
+        with _SPI_PHASE:
+            self._send_command(0x91)  # partial in
+            self._send(0x90, window)  # partial window
+            self._send_window(0x10, self._old_plane, x, y, x_end - x + 1, y_end - y + 1)
+            self._send_window(0x13, self._new_plane, x, y, x_end - x + 1, y_end - y + 1)
+        yield from self._turn_on_display()
+        self._send_command(0x92)  # partial out
 
     def sleep(self) -> None:
         """
@@ -188,8 +432,14 @@ class Display:
         """
         # self.send_command(0x02)  # power off
         # self.ReadBusy()
-        self._send_command(0x07)  # deep sleep
-        self._send_data(0xA5)
+        self._send(0x07, b"\xa5")  # deep sleep
+
+    def reset_transfer_stats(self) -> None:
+        """
+        Resets the counters of SPI transactions and bytes sent.
+        """
+        self.transactions = 0
+        self.bytes_sent = 0
 
     def _digital_write(self, pin, value) -> None:
         pin.value(value)
@@ -200,91 +450,225 @@ class Display:
     def _delay_ms(self, delay) -> None:
         utime.sleep(delay / 1000.0)
 
-    def _spi_writebyte(self, data) -> None:
-        self._spi.write(bytearray(data))
+    def _run(self, steps, while_busy=None) -> None:
+        """
+        Runs a command sequence, a generator sending commands and yielding delays in ms or WAIT_BUSY, blocking.
+        :param while_busy: Called at the first WAIT_BUSY, before the wait.
+        """
+        for step in steps:
+            if step == WAIT_BUSY:
+                if while_busy is not None:
+                    while_busy()
+                    while_busy = None
+                self._read_busy()
+            else:
+                self._delay_ms(step)
+
+    async def _run_async(self, steps) -> None:
+        """
+        Runs a command sequence, sleeping in the event loop during the delays and BUSY waits.
+        """
+        for step in steps:
+            if step == WAIT_BUSY:
+                await self._read_busy_async()
+            else:
+                await uasyncio.sleep_ms(step)
 
     def _module_exit(self) -> None:
         self._digital_write(self._reset_pin, 0)
 
     def _send_command(self, command) -> None:
+        self._send(command)
+
+    def _send(self, command: int, data=None) -> None:
+        """
+        Sends a command followed by its data as one transaction.
+        :param command: Command byte.
+        :param data: Data to send after the command, as bytes, bytearray or memoryview.
+        """
+        self._begin_transaction(command)
+
+        count = 0
+        if data is not None:
+            view = memoryview(data)
+            count = len(view)
+            for start in range(0, count, self.CHUNK_SIZE):
+                self._spi.write(view[start:start + self.CHUNK_SIZE])
+
+        self._end_transaction(count)
+
+    def _send_repeated(self, command: int, value: int, count: int) -> None:
+        """
+        Sends a command followed by the same data byte repeated count times, as one transaction.
+        """
+        chunk = self._chunk_buffer
+        for i in range(len(chunk)):
+            chunk[i] = value
+
+        self._begin_transaction(command)
+
+        view = memoryview(chunk)
+        remaining = count
+        while remaining > 0:
+            size = min(remaining, len(chunk))
+            self._spi.write(view[:size])
+            remaining -= size
+
+        self._end_transaction(count)
+
+    def _send_window(self, command: int, plane, x: int, y: int, width: int, height: int) -> None:
+        """
+        Sends a command followed by the rows of a plane inside a window, as one transaction.
+        x and width must be multiples of 8.
+        """
+        row_bytes = self.WIDTH // 8
+        x_bytes = x // 8
+        width_bytes = width // 8
+        view = memoryview(plane)
+
+        self._begin_transaction(command)
+
+        for row in range(y, y + height):
+            start = row * row_bytes + x_bytes
+            self._spi.write(view[start:start + width_bytes])
+
+        self._end_transaction(width_bytes * height)
+
+    def _begin_transaction(self, command: int) -> None:
+        self._command_buffer[0] = command
+
         self._digital_write(self._dc_pin, 0)
         self._digital_write(self._cs_pin, 0)
-        self._spi_writebyte([command])
-        self._digital_write(self._cs_pin, 1)
-
-    def _send_data(self, data) -> None:
+        self._spi.write(self._command_buffer)
         self._digital_write(self._dc_pin, 1)
-        self._digital_write(self._cs_pin, 0)
-        self._spi_writebyte([data])
+
+    def _end_transaction(self, data_count: int) -> None:
         self._digital_write(self._cs_pin, 1)
+        self.transactions += 1
+        self.bytes_sent += 1 + data_count
 
+    @telemetry.Phase(telemetry.BUSY)
     def _read_busy(self) -> None:
         """
-        Waits until the display is busy.
-        """
-        print("e-Paper busy")
-        while not self._digital_read(self._busy_pin):  # LOW: idle, HIGH: busy
-            self._send_command(0x71)
-            self._delay_ms(100)
-        print("e-Paper busy release")
-
-    def _lut(self) -> None:
-        self._send_command(0x20)
-        for count in range(0, 42):
-            self._send_data(LUT_VCOM[count])
-
-        self._send_command(0x21)
-        for count in range(0, 42):
-            self._send_data(LUT_WW[count])
-
-        self._send_command(0x22)
-        for count in range(0, 42):
-            self._send_data(LUT_BW[count])
-
-        self._send_command(0x23)
-        for count in range(0, 42):
-            self._send_data(LUT_WB[count])
-
-        self._send_command(0x24)
-        for count in range(0, 42):
-            self._send_data(LUT_BB[count])
-
-        self._send_command(0x25)
-        for count in range(0, 42):
-            self._send_data(LUT_WW[count])
-
-    def _init(self) -> None:
-        self.reset()
-        self._send_command(0x01)  # POWER SETTING
-        self._send_data(0x03)
-        self._send_data(0x00)  # VGH=20V,VGL=-20V
-        self._send_data(0x2b)  # VDH=15V
-        self._send_data(0x2b)  # VDL=-15V
-        self._send_data(0x13)
-
-        self._send_command(0x06)  # booster soft start
-        self._send_data(0x17)  # A
-        self._send_data(0x17)  # B
-        self._send_data(0x17)  # C
+        Waits until the display is not busy, in light sleep until the rising edge of BUSY wakes the CPU.
+        Raises a DisplayError if the display stays busy for longer than BUSY_TIMEOUT_MS.
+        """
+        start = self._arm_busy()
+        try:
+            while True:
+                self._busy_released = False
+                if not self._is_busy():
+                    break
+
+                timeout_ms = self._busy_sleep_ms(start)
+                # An edge between the check of BUSY and the sleep would be handled before the sleep and not wake
+                # it. With interrupts disabled it stays pending and ends the sleep at once.
+                state = machine.disable_irq()
+                if not self._busy_released:
+                    machine.lightsleep(timeout_ms)
+                machine.enable_irq(state)
+        finally:
+            self._busy_pin.irq(None)
+
+    async def _read_busy_async(self) -> None:
+        """
+        Waits until the display is not busy, letting other tasks run until the rising edge of BUSY.
+        Raises a DisplayError if the display stays busy for longer than BUSY_TIMEOUT_MS.
+        """
+        # Added directly, since phases of other tasks open and close while this one waits
+        start = self._arm_busy()
+        try:
+            while self._is_busy():
+                timeout_ms = self._busy_sleep_ms(start)
+                try:
+                    await uasyncio.wait_for_ms(self._busy_flag.wait(), timeout_ms)
+                except uasyncio.TimeoutError:
+                    pass
+        finally:
+            self._busy_pin.irq(None)
+            telemetry.add(telemetry.BUSY, utime.ticks_diff(utime.ticks_ms(), start) * 1000)
+
+    def _arm_busy(self) -> int:
+        """
+        Waits for the display to pull BUSY low and enables the interrupt on its release.
+        Returns the ticks in ms at the start of the wait.
+        """
+        start = utime.ticks_ms()
+        while self._digital_read(self._busy_pin) and utime.ticks_diff(utime.ticks_ms(), start) < self.BUSY_START_MS:
+            utime.sleep_ms(1)
 
-        self._send_command(0x04)
-        self._read_busy()
+        self._busy_flag.clear()
+        self._busy_pin.irq(self._busy_handler, machine.Pin.IRQ_RISING)
+        return start
+
+    def _is_busy(self) -> bool:
+        # Get status, some revisions of the controller only update BUSY after it
+        self._send_command(0x71)
+        return not self._digital_read(self._busy_pin)  # LOW: busy, HIGH: idle
+
+    def _busy_sleep_ms(self, start: int) -> int:
+        """
+        Returns the time to sleep before checking BUSY again.
+        Raises a DisplayError if the display has been busy for too long.
+        """
+        remaining = self.BUSY_TIMEOUT_MS - utime.ticks_diff(utime.ticks_ms(), start)
+        if remaining <= 0:
+            raise DisplayError("Display busy for more than %d ms" % self.BUSY_TIMEOUT_MS)
+        return min(remaining, self.BUSY_SLEEP_MS)
+
+    def _on_busy_release(self, pin) -> None:
+        self._busy_released = True
+        self._busy_flag.set()
+
+    @telemetry.Phase(telemetry.LUT)
+    def _lut(self, profile: int = QUALITY) -> None:
+        if profile == self.FAST:
+            self._send(0x20, LUT_VCOM_FAST)
+            self._send(0x21, LUT_WHITE_FAST)
+            self._send(0x22, LUT_WHITE_FAST)
+            self._send(0x23, LUT_BLACK_FAST)
+            self._send(0x24, LUT_BLACK_FAST)
+            self._send(0x25, LUT_WHITE_FAST)
+            return
+
+        if profile == self.PARTIAL:
+            self._send(0x20, LUT_VCOM_PARTIAL)
+            self._send(0x21, LUT_WW_PARTIAL)
+            self._send(0x22, LUT_BW_PARTIAL)
+            self._send(0x23, LUT_WB_PARTIAL)
+            self._send(0x24, LUT_BB_PARTIAL)
+            self._send(0x25, LUT_WW_PARTIAL)
+            return
+
+        self._send(0x20, LUT_VCOM)
+        self._send(0x21, LUT_WW)
+        self._send(0x22, LUT_BW)
+        self._send(0x23, LUT_WB)
+        self._send(0x24, LUT_BB)
+        self._send(0x25, LUT_WW)
+
+    def _init(self):
+        yield from self._reset()
+        # POWER SETTING: VGH=20V,VGL=-20V, VDH=15V, VDL=-15V
+        self._send(0x01, b"\x03\x00\x2b\x2b\x13")
+
+        # booster soft start A, B, C
+        self._send(0x06, b"\x17\x17\x17")
 
-        self._send_command(0x00)  # panel setting
-        self._send_data(0x3f)  # KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
+        self._send_command(0x04)
+        yield WAIT_BUSY
 
-        self._send_command(0x30)  # PLL setting
-        self._send_data(0x3c)  # 100hz
+        # panel setting: KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
+        self._send(0x00, b"\x3f")
 
-        self._send_command(0x61)  # resolution setting
-        self._send_data(0x01)  # 400
-        self._send_data(0x90)
-        self._send_data(0x01)  # 300
-        self._send_data(0x2c)
+        # PLL setting: 100hz
+        self._send(0x30, b"\x3c")
 
-        self._send_command(0x82)  # vcom_DC setting
-        self._send_data(0x12)
+        # resolution setting: 400 x 300
+        self._send(0x61, b"\x01\x90\x01\x2c")
 
-        self._send_command(0x50)  # VCOM AND DATA INTERVAL SETTING
-        self._send_data(0x97)
+        # vcom_DC setting
+        self._send(0x82, b"\x12")
 
+        # VCOM AND DATA INTERVAL SETTING
+        self._send(0x50, b"\x97")
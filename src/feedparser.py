@@ -0,0 +1,379 @@
+class FeedParseError(Exception):
+    pass
+
+
+# Keys of interest
+_OTHER = 0
+_CURRENT = 1
+_INTERVALS = 2
+_START = 3
+_PRICE = 4
+
+_KEYS = (
+    (b"current", _CURRENT),
+    (b"intervals", _INTERVALS),
+    (b"startDateTime", _START),
+    (b"price", _PRICE),
+)
+_LONGEST_KEY = 13
+
+# Container types
+_OBJECT = 0
+_ARRAY = 1
+
+_QUOTE = 0x22
+_BACKSLASH = 0x5c
+
+# Character classes
+_SKIP = 1  # whitespace and ':'
+_NUMBER = 2  # characters starting or continuing a number
+_LITERAL = 3  # letters of true, false and null
+
+
+def _build_classes() -> bytearray:
+    classes = bytearray(256)
+    for char in b" \t\r\n:":
+        classes[char] = _SKIP
+    for char in b"+-0123456789.":
+        classes[char] = _NUMBER
+    for char in range(0x61, 0x7b):  # a-z
+        classes[char] = _LITERAL
+    classes[0x45] = _NUMBER  # E
+    return classes
+
+
+_CLASSES = _build_classes()
+
+
+class FeedParser:
+    """
+    Incremental parser for the price feed.
+    Only current.startDateTime and intervals[*].startDateTime/price are extracted, everything else is skipped
+    without building any objects. The body can be fed in chunks of any size.
+    """
+    # Longest token that is parsed, strings that are not used are skipped whatever their length
+    BUFFER_SIZE = 1024
+    MAX_DEPTH = 16
+
+    def __init__(self, on_current, on_interval):
+        """
+        :param on_current: Called as on_current(year, month, day, hour, minute) with the current time.
+        :param on_interval: Called as on_interval(year, month, day, hour, minute, price) for every interval, in
+            order.
+        """
+        self._on_current = on_current
+        self._on_interval = on_interval
+
+        self._buffer = bytearray(self.BUFFER_SIZE)
+        self._length = 0
+
+        self._types = bytearray(self.MAX_DEPTH)
+        self._keys = bytearray(self.MAX_DEPTH)
+        self._depth = 0
+        self._expect_key = False
+
+        # Inside a string that is not used and did not fit in the buffer, and whether its next byte is escaped
+        self._skipping = False
+        self._skip_escaped = False
+
+        self._date = None
+        self._price = None
+
+        # Offset from UTC in minutes of the current time, None if the feed does not state it
+        self.utc_offset = None
+
+    def feed(self, data) -> None:
+        """
+        Parses the next chunk of the body.
+        """
+        data = memoryview(data)
+        while len(data):
+            count = min(len(data), len(self._buffer) - self._length)
+            if count == 0:
+                raise FeedParseError("Token too long")
+
+            self._buffer[self._length:self._length + count] = data[:count]
+            self._length += count
+            data = data[count:]
+
+            used = self._parse(False)
+            self._consume(used)
+
+    def close(self) -> None:
+        """
+        Parses what is left of the body.
+        """
+        self._consume(self._parse(True))
+        if self._depth != 0 or self._skipping:
+            raise FeedParseError("Unexpected end of feed")
+
+    def _consume(self, used: int) -> None:
+        """
+        Moves the incomplete token at the end of the buffer to the start.
+        """
+        buffer = self._buffer
+        remaining = self._length - used
+        if used:
+            for i in range(remaining):
+                buffer[i] = buffer[used + i]
+        self._length = remaining
+
+    def _parse(self, final: bool) -> int:
+        """
+        Parses the complete tokens in the buffer and returns the number of bytes used.
+        """
+        buffer = self._buffer
+        classes = _CLASSES
+        length = self._length
+        i = 0
+
+        if self._skipping:
+            i = self._skip(buffer, 1 if self._skip_escaped else 0, length)
+
+        while i < length:
+            char = buffer[i]
+
+            if classes[char] == _SKIP:
+                i += 1
+            elif char == 0x2c:  # ','
+                self._expect_key = self._depth > 0 and self._types[self._depth - 1] == _OBJECT
+                i += 1
+            elif char == 0x7b:  # '{'
+                self._push(_OBJECT)
+                self._expect_key = True
+                i += 1
+            elif char == 0x5b:  # '['
+                self._push(_ARRAY)
+                self._expect_key = False
+                i += 1
+            elif char == 0x7d or char == 0x5d:  # '}' or ']'
+                self._pop()
+                i += 1
+            elif char == _QUOTE:
+                end = _find_quote(buffer, i + 1, length)
+                if end < 0:
+                    if self._expect_key:
+                        if length - i - 1 <= _LONGEST_KEY:
+                            break
+                        self._keys[self._depth - 1] = _OTHER
+                        self._expect_key = False
+                    elif self._wants_string():
+                        break
+                    i = self._skip(buffer, i + 1, length)
+                    continue
+
+                if self._expect_key:
+                    self._keys[self._depth - 1] = _key_id(buffer, i + 1, end)
+                    self._expect_key = False
+                else:
+                    self._string_value(buffer, i + 1, end)
+                i = end + 1
+            else:
+                end = i
+                while end < length and classes[buffer[end]] >= _NUMBER:
+                    end += 1
+                if end == length and not final:
+                    break
+                if end == i:
+                    raise FeedParseError("Unexpected character")
+
+                if classes[char] == _NUMBER:
+                    self._number_value(buffer, i, end)
+                i = end
+
+        return i
+
+    def _push(self, container: int) -> None:
+        if self._depth == self.MAX_DEPTH:
+            raise FeedParseError("Feed nested too deep")
+
+        self._types[self._depth] = container
+        self._keys[self._depth] = _OTHER
+        self._depth += 1
+
+    def _pop(self) -> None:
+        if self._depth == 0:
+            raise FeedParseError("Unbalanced feed")
+
+        if self._in_interval():
+            if self._date is None or self._price is None:
+                raise FeedParseError("Interval without startDateTime or price")
+
+            year, month, day, hour, minute = self._date
+            self._on_interval(year, month, day, hour, minute, self._price)
+            self._date = None
+            self._price = None
+
+        self._depth -= 1
+
+    def _in_interval(self) -> bool:
+        return self._depth == 3 and self._keys[0] == _INTERVALS and self._types[1] == _ARRAY and \
+            self._types[2] == _OBJECT
+
+    def _wants_string(self) -> bool:
+        """
+        Returns True if the string value starting at the current position is parsed.
+        """
+        key = self._keys[self._depth - 1] if self._depth else _OTHER
+        return key == _START or key == _PRICE
+
+    def _skip(self, buffer, start: int, length: int) -> int:
+        """
+        Skips the rest of a string that is not used and returns the index after it, or the length of the buffer if
+        the string goes on in the next chunk.
+        """
+        end = _find_quote(buffer, start, length)
+        if end >= 0:
+            self._skipping = False
+            return end + 1
+
+        self._skipping = True
+        self._skip_escaped = _ends_in_escape(buffer, start, length)
+        return length
+
+    def _string_value(self, buffer, start: int, end: int) -> None:
+        key = self._keys[self._depth - 1] if self._depth else _OTHER
+        if key == _START:
+            if self._in_interval():
+                self._date = _parse_date(buffer, start, end)
+            elif self._depth == 2 and self._keys[0] == _CURRENT:
+                year, month, day, hour, minute = _parse_date(buffer, start, end)
+                self.utc_offset = _parse_offset(buffer, start, end)
+                self._on_current(year, month, day, hour, minute)
+        elif key == _PRICE and self._in_interval():
+            self._price = _parse_number(buffer, start, end)
+
+    def _number_value(self, buffer, start: int, end: int) -> None:
+        if self._depth and self._keys[self._depth - 1] == _PRICE and self._in_interval():
+            self._price = _parse_number(buffer, start, end)
+
+
+def _find_quote(buffer, start: int, length: int) -> int:
+    """
+    Returns the index of the quote ending a string, or -1 if it is not in the buffer.
+    """
+    i = start
+    while i < length:
+        char = buffer[i]
+        if char == _QUOTE:
+            return i
+        if char == _BACKSLASH:
+            i += 1
+        i += 1
+    return -1
+
+
+def _ends_in_escape(buffer, start: int, length: int) -> bool:
+    """
+    Returns True if the string in the buffer from start ends with a backslash escaping the next byte.
+    """
+    count = 0
+    i = length - 1
+    while i >= start and buffer[i] == _BACKSLASH:
+        count += 1
+        i -= 1
+    return count % 2 == 1
+
+
+def _key_id(buffer, start: int, end: int) -> int:
+    length = end - start
+    for name, key in _KEYS:
+        if len(name) != length:
+            continue
+        for i in range(length):
+            if buffer[start + i] != name[i]:
+                break
+        else:
+            return key
+    return _OTHER
+
+
+def _parse_int(buffer, start: int, end: int) -> int:
+    value = 0
+    for i in range(start, end):
+        digit = buffer[i] - 0x30
+        if not 0 <= digit <= 9:
+            raise FeedParseError("Expected a digit")
+        value = value * 10 + digit
+    return value
+
+
+def _parse_date(buffer, start: int, end: int) -> tuple:
+    """
+    Parses an ISO 8601 date formatted as YYYY-MM-DDTHH:MM... into (year, month, day, hour, minute).
+    The minute is 0 if the date stops at the hour.
+    """
+    if end - start < 13:
+        raise FeedParseError("Invalid date")
+
+    return (
+        _parse_int(buffer, start, start + 4),
+        _parse_int(buffer, start + 5, start + 7),
+        _parse_int(buffer, start + 8, start + 10),
+        _parse_int(buffer, start + 11, start + 13),
+        _parse_int(buffer, start + 14, start + 16) if end - start >= 16 else 0,
+    )
+
+
+def _parse_offset(buffer, start: int, end: int):
+    """
+    Parses the UTC offset at the end of an ISO 8601 date into minutes, or returns None if there is none.
+    """
+    if end - start >= 1 and buffer[end - 1] == 0x5a:  # 'Z'
+        return 0
+
+    if end - start < 19 or buffer[end - 3] != 0x3a:  # ':'
+        return None
+
+    sign = buffer[end - 6]
+    if sign != 0x2b and sign != 0x2d:  # '+' or '-'
+        return None
+
+    minutes = _parse_int(buffer, end - 5, end - 3) * 60 + _parse_int(buffer, end - 2, end)
+    return -minutes if sign == 0x2d else minutes
+
+
+def _parse_number(buffer, start: int, end: int) -> float:
+    """
+    Parses a decimal number, optionally with a sign, fraction and exponent.
+    """
+    i = start
+    negative = False
+    if i < end and (buffer[i] == 0x2b or buffer[i] == 0x2d):  # '+' or '-'
+        negative = buffer[i] == 0x2d
+        i += 1
+
+    mantissa = 0
+    scale = 0
+    digits = 0
+    while i < end and 0x30 <= buffer[i] <= 0x39:
+        mantissa = mantissa * 10 + buffer[i] - 0x30
+        digits += 1
+        i += 1
+
+    if i < end and buffer[i] == 0x2e:  # '.'
+        i += 1
+        while i < end and 0x30 <= buffer[i] <= 0x39:
+            mantissa = mantissa * 10 + buffer[i] - 0x30
+            scale -= 1
+            digits += 1
+            i += 1
+
+    if i < end and (buffer[i] == 0x65 or buffer[i] == 0x45):  # 'e' or 'E'
+        i += 1
+        exponent_negative = False
+        if i < end and (buffer[i] == 0x2b or buffer[i] == 0x2d):
+            exponent_negative = buffer[i] == 0x2d
+            i += 1
+        exponent = _parse_int(buffer, i, end)
+        scale += -exponent if exponent_negative else exponent
+        i = end
+
+    if i != end or digits == 0:
+        raise FeedParseError("Invalid number")
+
+    if scale < 0:
+        value = mantissa / 10.0 ** -scale
+    else:
+        value = mantissa * 10.0 ** scale
+    return -value if negative else value
@@ -0,0 +1,328 @@
+import binascii
+import os
+import struct
+
+import memory
+
+
+def _pack_python(source, start: int, length: int, target) -> int:
+    """
+    PackBits: a header byte n < 128 is followed by n + 1 literal bytes, a header byte n > 128 by a byte repeated
+    257 - n times.
+    """
+    position = 0
+    size = 0
+    while position < length:
+        value = source[start + position]
+        run = 1
+        while position + run < length and run < 128 and source[start + position + run] == value:
+            run += 1
+
+        if run > 2:
+            target[size] = 257 - run
+            target[size + 1] = value
+            size += 2
+            position += run
+            continue
+
+        literal = size
+        size += 1
+        count = 0
+        while position < length and count < 128:
+            if position + 2 < length and source[start + position] == source[start + position + 1] and \
+                    source[start + position] == source[start + position + 2]:
+                break
+            target[size] = source[start + position]
+            size += 1
+            position += 1
+            count += 1
+        target[literal] = count - 1
+
+    return size
+
+
+def _unpack_python(source, length: int, target, start: int, capacity: int) -> int:
+    """
+    Returns the number of bytes unpacked, or -1 if they would not fit in capacity bytes.
+    """
+    position = 0
+    size = 0
+    while position < length:
+        header = source[position]
+        position += 1
+        if size + (header + 1 if header < 128 else 257 - header) > capacity:
+            return -1
+        if header < 128:
+            for i in range(header + 1):
+                target[start + size + i] = source[position + i]
+            position += header + 1
+            size += header + 1
+        elif header > 128:
+            value = source[position]
+            position += 1
+            for i in range(257 - header):
+                target[start + size + i] = value
+            size += 257 - header
+    return size
+
+
+try:
+    import micropython
+
+    @micropython.viper
+    def _pack_viper(source: ptr8, start: int, length: int, target: ptr8) -> int:
+        position = 0
+        size = 0
+        while position < length:
+            value = source[start + position]
+            run = 1
+            while position + run < length and run < 128 and source[start + position + run] == value:
+                run += 1
+
+            if run > 2:
+                target[size] = 257 - run
+                target[size + 1] = value
+                size += 2
+                position += run
+                continue
+
+            literal = size
+            size += 1
+            count = 0
+            while position < length and count < 128:
+                if position + 2 < length and source[start + position] == source[start + position + 1] and \
+                        source[start + position] == source[start + position + 2]:
+                    break
+                target[size] = source[start + position]
+                size += 1
+                position += 1
+                count += 1
+            target[literal] = count - 1
+
+        return size
+
+    @micropython.viper
+    def _unpack_viper(source: ptr8, length: int, target: ptr8, start: int, capacity: int) -> int:
+        position = 0
+        size = 0
+        while position < length:
+            header = source[position]
+            position += 1
+            count = header + 1 if header < 128 else 257 - header
+            if size + count > capacity:
+                return -1
+            if header < 128:
+                for i in range(header + 1):
+                    target[start + size + i] = source[position + i]
+                position += header + 1
+                size += header + 1
+            elif header > 128:
+                value = source[position]
+                position += 1
+                for i in range(257 - header):
+                    target[start + size + i] = value
+                size += 257 - header
+        return size
+
+    _pack = _pack_viper
+    _unpack = _unpack_viper
+except (ImportError, AttributeError):
+    _pack = _pack_python
+    _unpack = _unpack_python
+
+
+class FrameCache:
+    """
+    Frames of the coming slots rendered in advance on a network wake, so that later wakes show their slot without
+    the network, the feed parser or the chart. The file holds a header with the checksum of the series the frames
+    were drawn from, an index keyed by slot and the frames. The planes of a frame are PackBits compressed in blocks
+    of BLOCK_ROWS rows, each block after its compressed length.
+    """
+    PATH = "frames.bin"
+    MAGIC = b"MCB1"
+    # magic, slot minutes, UTC offset in minutes, key of the last slot with a price, checksum of the series,
+    # number of frames
+    HEADER_FORMAT = "<4sHhlIH"
+    # key of the slot, key of the last slot shown, offset of the frame in the file
+    ENTRY_FORMAT = "<llI"
+
+    MAX_FRAMES = 48
+    BLOCK_ROWS = 10
+    # Flash left free for the other files
+    RESERVE_BYTES = 32 * 1024
+
+    def __init__(self, width: int, height: int, path: str = PATH):
+        self._row_bytes = width // 8
+        self._plane_size = self._row_bytes * height
+        self._path = path
+
+        self._header_size = struct.calcsize(self.HEADER_FORMAT)
+        self._entry_size = struct.calcsize(self.ENTRY_FORMAT)
+        self._data_offset = self._header_size + self._entry_size * self.MAX_FRAMES
+
+        block_size = self._row_bytes * self.BLOCK_ROWS
+        self._block_size = block_size
+        # A compressed block after its length, which can be a byte per 128 longer than the raw block
+        self._packed = memory.buffer("frame_packed", 2 + block_size + block_size // 128 + 1)
+
+        self.slot_minutes = 60
+        self.utc_offset = 0
+        self.last_key = None
+        self._checksum = None
+        self._entries = []
+
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key_at(self, utc_seconds: int) -> int:
+        """
+        Returns the key of the slot containing a time given in seconds since 1970-01-01 00:00 UTC.
+        """
+        return (utc_seconds // 60 + self.utc_offset) // self.slot_minutes
+
+    def matches(self, series) -> bool:
+        """
+        Returns True if the frames were drawn from a series.
+        """
+        return self._checksum is not None and self._checksum == _series_checksum(series)
+
+    def find(self, key: int):
+        """
+        Returns the key of the last slot shown in the frame of a slot, or None if there is no such frame.
+        """
+        for entry_key, stop_key, offset in self._entries:
+            if entry_key == key:
+                return stop_key
+        return None
+
+    def load(self, key: int, old_plane, new_plane) -> None:
+        """
+        Reads the frame of a slot into the planes. Raises an OSError if the frame is missing or damaged.
+        """
+        for index in range(len(self._entries)):
+            if self._entries[index][0] == key:
+                break
+        else:
+            raise OSError("No frame for slot")
+
+        with open(self._path, "rb") as file:
+            file.seek(self._entries[index][2])
+            for plane in (old_plane, new_plane):
+                for offset in range(0, self._plane_size, self._block_size):
+                    _read_exactly(file, self._packed, 2)
+                    length = self._packed[0] | self._packed[1] << 8
+                    if length > len(self._packed):
+                        raise OSError("Frame is damaged")
+                    _read_exactly(file, self._packed, length)
+                    size = min(self._block_size, self._plane_size - offset)
+                    if _unpack(self._packed, length, plane, offset, size) != size:
+                        raise OSError("Frame is damaged")
+
+    def begin(self, series) -> None:
+        """
+        Drops the stored frames and starts frames of a series.
+        """
+        self.forget()
+        self.slot_minutes = series.slot_minutes
+        self.utc_offset = series.utc_offset
+        self.last_key = series.keys[-1]
+        self._checksum = _series_checksum(series)
+
+        with open(self._path, "wb") as file:
+            self._write_index(file)
+            # Entries of frames not yet written are zero
+            file.write(bytearray(self._data_offset - file.tell()))
+
+    def has_room(self) -> bool:
+        """
+        Returns True if the index and the flash have room for another frame, in the worst case of compression.
+        """
+        if len(self._entries) >= self.MAX_FRAMES:
+            return False
+
+        blocks = (self._plane_size + self._block_size - 1) // self._block_size
+        frame_size = 2 * (self._plane_size + blocks * (2 + self._block_size // 128 + 1))
+        try:
+            stat = os.statvfs("/")
+        except (AttributeError, OSError):
+            return True
+        return stat[0] * stat[3] >= frame_size + self.RESERVE_BYTES
+
+    def add(self, key: int, stop_key: int, old_plane, new_plane) -> None:
+        """
+        Appends the frame of a slot drawn in the planes.
+        """
+        with open(self._path, "r+b") as file:
+            file.seek(0, 2)
+            offset = file.tell()
+            view = memoryview(self._packed)
+            for plane in (old_plane, new_plane):
+                for start in range(0, self._plane_size, self._block_size):
+                    length = _pack(plane, start, min(self._block_size, self._plane_size - start), view[2:])
+                    self._packed[0] = length & 0xff
+                    self._packed[1] = length >> 8
+                    file.write(view[:2 + length])
+
+            # The index is written after the frame, so that an interrupted write leaves the earlier frames usable
+            self._entries.append((key, stop_key, offset))
+            self._write_index(file)
+
+    def forget(self) -> None:
+        """
+        Removes the stored frames.
+        """
+        try:
+            os.remove(self._path)
+        except OSError:
+            pass
+
+        self.last_key = None
+        self._checksum = None
+        self._entries = []
+
+    def _write_index(self, file) -> None:
+        file.seek(0)
+        file.write(struct.pack(self.HEADER_FORMAT, self.MAGIC, self.slot_minutes, self.utc_offset, self.last_key,
+                               self._checksum, len(self._entries)))
+        for entry in self._entries:
+            file.write(struct.pack(self.ENTRY_FORMAT, *entry))
+
+    def _load_index(self) -> None:
+        try:
+            with open(self._path, "rb") as file:
+                header = file.read(self._header_size)
+                if len(header) != self._header_size:
+                    return
+
+                magic, slot_minutes, utc_offset, last_key, checksum, count = struct.unpack(self.HEADER_FORMAT,
+                                                                                           header)
+                if magic != self.MAGIC or count > self.MAX_FRAMES:
+                    return
+
+                entries = []
+                for _ in range(count):
+                    entries.append(struct.unpack(self.ENTRY_FORMAT, file.read(self._entry_size)))
+        except (OSError, ValueError):
+            return
+
+        self.slot_minutes = slot_minutes
+        self.utc_offset = utc_offset
+        self.last_key = last_key
+        self._checksum = checksum
+        self._entries = entries
+
+
+def _series_checksum(series) -> int:
+    return binascii.crc32(series.values, binascii.crc32(series.keys)) & 0xffffffff
+
+
+def _read_exactly(file, buffer, size: int) -> None:
+    view = memoryview(buffer)
+    read = 0
+    while read < size:
+        count = file.readinto(view[read:size])
+        if not count:
+            raise OSError("Frame is truncated")
+        read += count
@@ -0,0 +1,245 @@
+import binascii
+import os
+import struct
+
+import memory
+
+
+def _span_python(previous, previous_offset: int, current, current_offset: int, length: int) -> int:
+    first = -1
+    last = -1
+    for i in range(length):
+        if previous[previous_offset + i] != current[current_offset + i]:
+            if first < 0:
+                first = i
+            last = i
+
+    if first < 0:
+        return -1
+    return (first << 16) | last
+
+
+try:
+    import micropython
+
+    @micropython.viper
+    def _span_viper(previous: ptr8, previous_offset: int, current: ptr8, current_offset: int, length: int) -> int:
+        first = -1
+        last = -1
+        for i in range(length):
+            if previous[previous_offset + i] != current[current_offset + i]:
+                if first < 0:
+                    first = i
+                last = i
+
+        if first < 0:
+            return -1
+        return (first << 16) | last
+
+    _span = _span_viper
+except (ImportError, AttributeError):
+    _span = _span_python
+
+
+class FrameStore:
+    """
+    Keeps the last frame sent to the display on flash, so that the next wake can refresh only what changed.
+    The file holds a header with the checksum of the frame, followed by the old and the new plane.
+    """
+    PATH = "frame.bin"
+    MAGIC = b"MCF1"
+    HEADER_FORMAT = "<4sIH"
+
+    # Number of partial or fast refreshes before a full 4 gray refresh is forced to clear ghosting
+    FULL_REFRESH_INTERVAL = 24
+    # Largest number of windows returned, more windows are merged. The display refreshes the window bounding all
+    # of them at once, so the area is checked for that window.
+    MAX_WINDOWS = 1
+    # Dirty rows closer than this are put in the same window
+    MERGE_GAP = 8
+    # A full refresh is used when the windows cover more than this part of the screen
+    MAX_WINDOW_AREA = 0.5
+
+    ROWS_PER_READ = 10
+
+    def __init__(self, width: int, height: int, path: str = PATH):
+        self._width = width
+        self._height = height
+        self._row_bytes = width // 8
+        self._path = path
+
+        self._checksum = None
+        self._partial_refreshes = 0
+
+        self._header_size = struct.calcsize(self.HEADER_FORMAT)
+        self._old_rows = memory.buffer("old_rows", self._row_bytes * self.ROWS_PER_READ)
+        self._new_rows = memory.buffer("new_rows", self._row_bytes * self.ROWS_PER_READ)
+
+        self._load_header()
+
+    def get_windows(self, old_plane, new_plane):
+        """
+        Compares the planes with the stored frame.
+        Returns None if the whole screen should be refreshed, an empty list if nothing has changed,
+        and otherwise a list of (x, y, width, height) windows to refresh.
+        """
+        if self.cleanse_due:
+            return None
+
+        if _checksum(old_plane, new_plane) == self._checksum:
+            return []
+
+        try:
+            windows = self._diff(old_plane, new_plane)
+        except OSError:
+            return None
+
+        area = 0
+        for x, y, width, height in windows:
+            area += width * height
+
+        if area > self.MAX_WINDOW_AREA * self._width * self._height:
+            return None
+
+        return windows
+
+    @property
+    def cleanse_due(self) -> bool:
+        """
+        True if the next refresh should be a full 4 gray refresh, since the shown frame is not known or has had
+        FULL_REFRESH_INTERVAL partial or fast refreshes.
+        """
+        return self._checksum is None or self._partial_refreshes >= self.FULL_REFRESH_INTERVAL
+
+    def save(self, old_plane, new_plane, full_refresh: bool) -> None:
+        """
+        Stores the planes as the frame currently shown on the display.
+        :param full_refresh: True if the whole screen was refreshed in 4 gray, False after a partial or fast refresh.
+        """
+        checksum = _checksum(old_plane, new_plane)
+        if full_refresh:
+            partial_refreshes = 0
+        elif checksum != self._checksum:
+            partial_refreshes = self._partial_refreshes + 1
+        else:
+            return
+
+        with open(self._path, "wb") as file:
+            file.write(struct.pack(self.HEADER_FORMAT, self.MAGIC, checksum, partial_refreshes))
+            file.write(old_plane)
+            file.write(new_plane)
+
+        self._checksum = checksum
+        self._partial_refreshes = partial_refreshes
+
+    def forget(self) -> None:
+        """
+        Removes the stored frame, so that the next wake refreshes the whole screen.
+        """
+        try:
+            os.remove(self._path)
+        except OSError:
+            pass
+
+        self._checksum = None
+        self._partial_refreshes = 0
+
+    def _load_header(self) -> None:
+        try:
+            with open(self._path, "rb") as file:
+                header = file.read(self._header_size)
+        except OSError:
+            return
+
+        if len(header) != self._header_size:
+            return
+
+        magic, checksum, partial_refreshes = struct.unpack(self.HEADER_FORMAT, header)
+        if magic != self.MAGIC:
+            return
+
+        self._checksum = checksum
+        self._partial_refreshes = partial_refreshes
+
+    def _diff(self, old_plane, new_plane) -> list:
+        """
+        Returns the windows around the rows that differ from the stored frame.
+        """
+        row_bytes = self._row_bytes
+        plane_size = row_bytes * self._height
+
+        windows = []
+        window = None  # [first byte, last byte, first row, last row]
+
+        with open(self._path, "rb") as file:
+            for first_row in range(0, self._height, self.ROWS_PER_READ):
+                rows = min(self.ROWS_PER_READ, self._height - first_row)
+                offset = first_row * row_bytes
+                size = rows * row_bytes
+
+                file.seek(self._header_size + offset)
+                _read_exactly(file, self._old_rows, size)
+                file.seek(self._header_size + plane_size + offset)
+                _read_exactly(file, self._new_rows, size)
+
+                for row in range(rows):
+                    start = row * row_bytes
+                    old_span = _span(self._old_rows, start, old_plane, offset + start, row_bytes)
+                    new_span = _span(self._new_rows, start, new_plane, offset + start, row_bytes)
+
+                    if old_span < 0 and new_span < 0:
+                        continue
+
+                    first, last = _merge_spans(old_span, new_span)
+                    y = first_row + row
+
+                    if window is not None and y - window[3] <= self.MERGE_GAP:
+                        window[0] = min(window[0], first)
+                        window[1] = max(window[1], last)
+                        window[3] = y
+                    else:
+                        window = [first, last, y, y]
+                        windows.append(window)
+
+        while len(windows) > self.MAX_WINDOWS:
+            _merge_closest(windows)
+
+        return [(first * 8, top, (last - first + 1) * 8, bottom - top + 1) for first, last, top, bottom in windows]
+
+
+def _checksum(old_plane, new_plane) -> int:
+    return binascii.crc32(new_plane, binascii.crc32(old_plane)) & 0xffffffff
+
+
+def _read_exactly(file, buffer, size: int) -> None:
+    view = memoryview(buffer)
+    read = 0
+    while read < size:
+        count = file.readinto(view[read:size])
+        if not count:
+            raise OSError("Stored frame is truncated")
+        read += count
+
+
+def _merge_spans(span1: int, span2: int) -> tuple:
+    if span1 < 0:
+        return span2 >> 16, span2 & 0xffff
+    if span2 < 0:
+        return span1 >> 16, span1 & 0xffff
+    return min(span1 >> 16, span2 >> 16), max(span1 & 0xffff, span2 & 0xffff)
+
+
+def _merge_closest(windows: list) -> None:
+    """
+    Merges the two vertically closest windows in a list ordered by row.
+    """
+    closest = 0
+    for i in range(1, len(windows) - 1):
+        if windows[i + 1][2] - windows[i][3] < windows[closest + 1][2] - windows[closest][3]:
+            closest = i
+
+    upper = windows[closest]
+    lower = windows.pop(closest + 1)
+    upper[0] = min(upper[0], lower[0])
+    upper[1] = max(upper[1], lower[1])
+    upper[3] = lower[3]
@@ -0,0 +1,270 @@
+import struct
+
+import memory
+from series import Series, SlotAggregator
+
+# Tiers of the history
+RAW = 0  # every price as fetched
+HOURLY = 1  # minimum, maximum and average per hour
+DAILY = 2  # minimum, maximum and average per day
+
+TIER_NAMES = ("raw", "hourly", "daily")
+# Minutes per record of the aggregate tiers
+TIER_MINUTES = (None, 60, 24 * 60)
+# Records kept per tier, 16 days of quarter hours, 62 days of hours and two years of days
+CAPACITIES = (1536, 1488, 732)
+
+PATH = "history.bin"
+MAGIC = b"MCH1"
+# magic, UTC offset in minutes, then capacity, count and index of the next record of every tier
+HEADER_FORMAT = "<4sh" + "HHH" * len(CAPACITIES)
+# minute of the slot, price
+RAW_FORMAT = "<lf"
+# minute of the start of the period, minimum, maximum, sum, number of prices
+AGGREGATE_FORMAT = "<lfffH"
+
+RECORDS_PER_READ = 32
+
+
+class History:
+    """
+    Price history on flash, kept across wakes so that long overviews are read from flash instead of downloaded.
+    The file holds a header followed by a ring buffer of fixed size records per tier. Records are keyed by the
+    minute of their start counted from 1970-01-01 00:00 local time, in increasing order, so a time is found with
+    a binary search that reads one key per step. The aggregate tiers are updated as prices are appended.
+    """
+
+    def __init__(self, path: str = PATH, capacities: tuple = CAPACITIES):
+        self._path = path
+        self._capacities = capacities
+        self._formats = (RAW_FORMAT, AGGREGATE_FORMAT, AGGREGATE_FORMAT)
+        self._sizes = tuple(struct.calcsize(record_format) for record_format in self._formats)
+        self._header_size = struct.calcsize(HEADER_FORMAT)
+
+        offset = self._header_size
+        self._offsets = []
+        for tier, capacity in enumerate(capacities):
+            self._offsets.append(offset)
+            offset += capacity * self._sizes[tier]
+        self._file_size = offset
+
+        self._counts = [0] * len(capacities)
+        self._next = [0] * len(capacities)
+        self.utc_offset = 0
+
+        self._buffer = memory.buffer("history", max(self._sizes) * RECORDS_PER_READ)
+        self._load_header()
+
+    def __len__(self) -> int:
+        return self._counts[RAW]
+
+    def count(self, tier: int) -> int:
+        return self._counts[tier]
+
+    def last_minute(self, tier: int = RAW):
+        """
+        Returns the minute of the newest record of a tier, or None if the tier is empty.
+        """
+        if not self._counts[tier]:
+            return None
+        try:
+            with open(self._path, "rb") as file:
+                return self._key(file, tier, self._counts[tier] - 1)
+        except OSError:
+            return None
+
+    def append(self, series: Series) -> int:
+        """
+        Appends the prices of a series newer than the newest stored one and updates the aggregate tiers.
+        Returns the number of prices appended.
+        """
+        slot_minutes = series.slot_minutes
+        last = self.last_minute()
+        start = 0
+        if last is not None:
+            while start < len(series) and series.keys[start] * slot_minutes <= last:
+                start += 1
+        if start == len(series):
+            return 0
+
+        with self._open() as file:
+            # The newest record of each aggregate tier, [minute, minimum, maximum, sum, count], updated in place
+            # while its period lasts
+            periods = [None] * len(self._capacities)
+            for tier in range(1, len(self._capacities)):
+                if self._counts[tier]:
+                    periods[tier] = list(self._record(file, tier, self._counts[tier] - 1))
+
+            for index in range(start, len(series)):
+                minute = series.keys[index] * slot_minutes
+                value = series.values[index]
+                self._append(file, RAW, (minute, value))
+
+                for tier in range(1, len(self._capacities)):
+                    period_start = minute - minute % TIER_MINUTES[tier]
+                    period = periods[tier]
+                    if period is not None and period[0] == period_start:
+                        period[1] = min(period[1], value)
+                        period[2] = max(period[2], value)
+                        period[3] += value
+                        period[4] += 1
+                        self._write(file, tier, self._counts[tier] - 1, period)
+                    else:
+                        period = [period_start, value, value, value, 1]
+                        periods[tier] = period
+                        self._append(file, tier, period)
+
+            self.utc_offset = series.utc_offset
+            self._write_header(file)
+
+        return len(series) - start
+
+    def read(self, tier: int, first_minute: int, last_minute: int):
+        """
+        Yields (minute, minimum, maximum, average) of the records of a tier from first_minute to last_minute.
+        The minimum, maximum and average of a raw record are its price.
+        """
+        with open(self._path, "rb") as file:
+            index = self._bisect(file, tier, first_minute)
+            size = self._sizes[tier]
+            view = memoryview(self._buffer)
+
+            while index < self._counts[tier]:
+                # Read up to the end of the ring or to RECORDS_PER_READ records, whichever is first
+                position = self._position(tier, index)
+                records = min(RECORDS_PER_READ, self._counts[tier] - index, self._capacities[tier] - position)
+                file.seek(self._offsets[tier] + position * size)
+                _read_exactly(file, view, records * size)
+
+                for record in range(records):
+                    fields = struct.unpack_from(self._formats[tier], self._buffer, record * size)
+                    if fields[0] > last_minute:
+                        return
+                    if tier == RAW:
+                        yield fields[0], fields[1], fields[1], fields[1]
+                    else:
+                        yield fields[0], fields[1], fields[2], fields[3] / fields[4]
+                index += records
+
+    def series(self, tier: int, first_minute: int, last_minute: int, slot_minutes: int = None) -> Series:
+        """
+        Returns the averages of a tier from first_minute to last_minute as a series. Records in the same slot are
+        averaged.
+        :param slot_minutes: Slot length of the series, the period of the tier if None. Needed for the raw tier.
+        """
+        if slot_minutes is None:
+            slot_minutes = TIER_MINUTES[tier]
+
+        series = Series(slot_minutes)
+        series.utc_offset = self.utc_offset
+        aggregator = SlotAggregator(series)
+        for minute, minimum, maximum, average in self.read(tier, first_minute, last_minute):
+            aggregator.add(minute // slot_minutes, average)
+        aggregator.close()
+
+        return series
+
+    def _open(self):
+        try:
+            file = open(self._path, "r+b")
+        except OSError:
+            file = open(self._path, "w+b")
+
+        file.seek(0, 2)
+        if file.tell() < self._file_size or not any(self._counts):
+            # A new or damaged file, write empty rings a buffer at a time instead of allocating them at once
+            self._counts = [0] * len(self._capacities)
+            self._next = [0] * len(self._capacities)
+            self._buffer[:] = bytes(len(self._buffer))
+            file.seek(0)
+            for offset in range(0, self._file_size, len(self._buffer)):
+                file.write(memoryview(self._buffer)[:min(len(self._buffer), self._file_size - offset)])
+            self._write_header(file)
+        return file
+
+    def _load_header(self) -> None:
+        try:
+            with open(self._path, "rb") as file:
+                header = file.read(self._header_size)
+        except OSError:
+            return
+
+        if len(header) != self._header_size:
+            return
+
+        fields = struct.unpack(HEADER_FORMAT, header)
+        if fields[0] != MAGIC:
+            return
+
+        counts = []
+        next_indexes = []
+        for tier, capacity in enumerate(self._capacities):
+            stored_capacity, count, next_index = fields[2 + 3 * tier:5 + 3 * tier]
+            if stored_capacity != capacity or count > capacity or next_index >= capacity:
+                return
+            counts.append(count)
+            next_indexes.append(next_index)
+
+        self.utc_offset = fields[1]
+        self._counts = counts
+        self._next = next_indexes
+
+    def _write_header(self, file) -> None:
+        fields = []
+        for tier, capacity in enumerate(self._capacities):
+            fields += (capacity, self._counts[tier], self._next[tier])
+        file.seek(0)
+        file.write(struct.pack(HEADER_FORMAT, MAGIC, self.utc_offset, *fields))
+
+    def _position(self, tier: int, index: int) -> int:
+        """
+        Returns the position in the ring of the record at an index counted from the oldest.
+        """
+        capacity = self._capacities[tier]
+        return (self._next[tier] - self._counts[tier] + index) % capacity
+
+    def _append(self, file, tier: int, fields) -> None:
+        capacity = self._capacities[tier]
+        file.seek(self._offsets[tier] + self._next[tier] * self._sizes[tier])
+        file.write(struct.pack(self._formats[tier], *fields))
+        self._next[tier] = (self._next[tier] + 1) % capacity
+        if self._counts[tier] < capacity:
+            self._counts[tier] += 1
+
+    def _write(self, file, tier: int, index: int, fields) -> None:
+        file.seek(self._offsets[tier] + self._position(tier, index) * self._sizes[tier])
+        file.write(struct.pack(self._formats[tier], *fields))
+
+    def _record(self, file, tier: int, index: int) -> tuple:
+        size = self._sizes[tier]
+        file.seek(self._offsets[tier] + self._position(tier, index) * size)
+        _read_exactly(file, memoryview(self._buffer), size)
+        return struct.unpack_from(self._formats[tier], self._buffer)
+
+    def _key(self, file, tier: int, index: int) -> int:
+        file.seek(self._offsets[tier] + self._position(tier, index) * self._sizes[tier])
+        _read_exactly(file, memoryview(self._buffer), 4)
+        return struct.unpack_from("<l", self._buffer)[0]
+
+    def _bisect(self, file, tier: int, minute: int) -> int:
+        """
+        Returns the index of the first record of a tier starting at or after a minute.
+        """
+        low = 0
+        high = self._counts[tier]
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(file, tier, middle) < minute:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+def _read_exactly(file, view, size: int) -> None:
+    read = 0
+    while read < size:
+        count = file.readinto(view[read:size])
+        if not count:
+            raise OSError("History is truncated")
+        read += count
@@ -1,77 +1,374 @@
-from partialdate import PartialDate
-from display import Display
-from requesthandler import RequestHandler
-from chart import Chart
-import secrets
+import bootprofile
+bootprofile.mark("main")
+
 import machine
-import time
-import ntptime
+import utime
+import clock
+import telemetry
+from scheduler import Scheduler
 
+# The other modules are imported when they are needed, so that a wake only loads what it uses
 
-def set_time() -> None:
-    tries = 5
 
-    for i in range(tries):
-        try:
-            ntptime.settime()
-            return
-        except Exception as e:
-            if i == tries - 1:
-                raise e
-        
-        time.sleep(10)
+def get_data(request_handler, now: int = None, use_network: bool = True) -> 'Series':
+    """
+    Returns the price series, from the cache on flash when it still covers the chart and from the feed otherwise.
+    :param now: Current time in seconds since 1970-01-01 00:00 UTC, or None if the clock is not set.
+    :param use_network: Use the cache as long as it has the current slot, even if it does not cover the chart.
+
+    The slot length is secrets.SLOT_MINUTES, 60 if it is not set. Prices of a finer feed, such as quarter hours,
+    are averaged per slot while they are parsed.
+    """
+    return bootprofile.load("requesthandler").run_steps(_get_data(request_handler, now, use_network))
+
+
+async def get_data_async(request_handler, now: int = None, use_network: bool = True) -> 'Series':
+    """
+    Same as get_data, letting other tasks run after every chunk of the download, so that the display initialises
+    while the feed is downloaded and parsed.
+    """
+    uasyncio = bootprofile.load("uasyncio")
+    steps = _get_data(request_handler, now, use_network)
+    try:
+        while True:
+            await uasyncio.sleep_ms(next(steps))
+    except StopIteration as e:
+        return e.value
+
+
+def _get_data(request_handler, now: int, use_network: bool):
+    """
+    Steps of get_data, yielding the time in ms to wait after every chunk of the download.
+    """
+    Chart = bootprofile.load("chart").Chart
+    secrets = bootprofile.load("secrets")
+    series_module = bootprofile.load("series")
+    slot_minutes = getattr(secrets, "SLOT_MINUTES", 60)
+
+    cached = request_handler.load_cache()
+    if cached is not None and cached.slot_minutes != slot_minutes:
+        cached = None
+    if cached is not None and now is not None:
+        cached.set_current(cached.key_at(now))
+        start_key, stop_key = Chart.get_window(cached.current_key, slot_minutes)
+        if cached.current_index is not None and (not use_network or cached.covers(start_key, stop_key)):
+            return cached
+
+    feedparser = bootprofile.load("feedparser")
+    series = series_module.Series(slot_minutes)
+    aggregator = series_module.SlotAggregator(series)
+
+    def on_current(year: int, month: int, day: int, hour: int, minute: int) -> None:
+        series.set_current(series.key(year, month, day, hour, minute))
+
+    def on_interval(year: int, month: int, day: int, hour: int, minute: int, price: float) -> None:
+        aggregator.add(series.key(year, month, day, hour, minute), price)
+
+    parser = feedparser.FeedParser(on_current, on_interval)
+    feed = telemetry.Phase(telemetry.PARSE)(parser.feed)
+    with telemetry.Phase(telemetry.FETCH):
+        changed = yield from request_handler.stream_steps(secrets.API_URL, feed, cached is not None)
+
+    if not changed:
+        # The cached dataset is unchanged, its current slot is taken from the server time if the clock was not set
+        server_time = request_handler.get_server_time()
+        if cached.current_index is None and server_time is not None:
+            cached.set_current(cached.key_at(server_time))
+        if cached.current_index is not None:
+            return cached
+
+        with telemetry.Phase(telemetry.FETCH):
+            yield from request_handler.stream_steps(secrets.API_URL, feed)
+
+    with telemetry.Phase(telemetry.PARSE):
+        parser.close()
+        aggregator.close()
 
+    if series.current_key is None:
+        raise feedparser.FeedParseError("Feed has no current time")
 
-def get_data(request_handler) -> tuple:
-    json = request_handler.get_json(secrets.API_URL)
+    if parser.utc_offset is not None:
+        series.utc_offset = parser.utc_offset
+    request_handler.save_cache(series)
 
-    current = json["current"]["startDateTime"]
-    year = int(current[0:4])
-    month = int(current[5:7])
-    day = int(current[8:10])
-    hour = int(current[11:13])
+    return series
 
-    current_time = PartialDate(year, month, day, hour)
 
-    data = []
+def get_overview(series: 'Series', days: int):
+    """
+    Returns the hourly averages of the days up to the end of a series from the history on flash, or None if the
+    history has no more than the series.
+    """
+    history_module = bootprofile.load("history")
+    last_minute = series.keys[-1] * series.slot_minutes
+    try:
+        overview = history_module.History().series(history_module.HOURLY, last_minute - days * 24 * 60 + 1,
+                                                    last_minute)
+    except OSError:
+        return None
+
+    if len(overview) * overview.slot_minutes <= len(series) * series.slot_minutes:
+        return None
+    return overview
+
+
+def get_frame(request_handler, display: 'Display', url: str, now: int = None) -> tuple:
+    """
+    Reads a frame rendered by tools/prerender_server.py into the planes of a planar display.
+    Returns (series, stop key), the series has the current and the last slot of the chart and no prices.
+    :param now: Current time in seconds since 1970-01-01 00:00 UTC, or None to let the server use its clock.
+    """
+    prerender = bootprofile.load("prerender")
+    Series = bootprofile.load("series").Series
+
+    if now is not None:
+        url += ("&" if "?" in url else "?") + "time=%d" % now
+
+    old_plane, new_plane = display.get_planes()
+    reader = prerender.FrameReader(old_plane, new_plane)
+    with telemetry.Phase(telemetry.FETCH):
+        request_handler.stream(url, reader.feed)
+    current_key, last_key, stop_key, slot_minutes, utc_offset = reader.close()
+
+    return _frame_series(current_key, last_key, slot_minutes, utc_offset), stop_key
+
 
-    intervals = json["intervals"]
-    for interval in intervals:
-        time = interval["startDateTime"]
-        year = int(time[0:4])
-        month = int(time[5:7])
-        day = int(time[8:10])
-        hour = int(time[11:13])
-        price = float(interval["price"])
+def get_batch_frame(display: 'Display', now: int = None):
+    """
+    Reads the frame of the current slot rendered in advance by render_batch into the planes of a planar display.
+    Returns (series, stop key) like get_frame, or None if there is no such frame.
+    :param now: Current time in seconds since 1970-01-01 00:00 UTC.
+    """
+    FrameCache = bootprofile.load("framecache").FrameCache
+    cache = FrameCache(display.WIDTH, display.HEIGHT)
+    if now is None or not len(cache):
+        return None
 
-        data.append((PartialDate(year, month, day, hour), price))
+    current_key = cache.key_at(now)
+    stop_key = cache.find(current_key)
+    if stop_key is None:
+        return None
 
-    return data, current_time
+    try:
+        with telemetry.Phase(telemetry.CHART):
+            cache.load(current_key, *display.get_planes())
+    except OSError as e:
+        print("Batch frame failed:", e)
+        cache.forget()
+        display.image.fill(display.WHITE)
+        return None
+
+    return _frame_series(current_key, cache.last_key, cache.slot_minutes, cache.utc_offset), stop_key
 
 
-def update(display: Display) -> int:
-    request_handler = RequestHandler()
-    chart_data, current_time = get_data(request_handler)
+def render_batch(display: 'Display', series: 'Series', count: int) -> int:
+    """
+    Draws the frames of up to count slots after the current one to flash, so that the wakes of those slots show
+    them without the network. The frames of an older series are dropped. Returns the number of frames drawn.
+    """
+    FrameCache = bootprofile.load("framecache").FrameCache
+    Chart = bootprofile.load("chart").Chart
+    memory = bootprofile.load("memory")
 
+    cache = FrameCache(display.WIDTH, display.HEIGHT)
+    if cache.matches(series):
+        return 0
+
+    history_days = getattr(bootprofile.load("secrets"), "HISTORY_DAYS", 0)
+    overview = get_overview(series, history_days) if history_days else None
     chart = Chart(display)
-    chart.update(chart_data, current_time)
+    current_key = series.current_key
+    old_plane, new_plane = display.get_planes()
+
+    cache.begin(series)
+    drawn = 0
+    try:
+        for index in range(series.current_index + 1, min(len(series), series.current_index + 1 + count)):
+            if not cache.has_room():
+                break
+
+            key = series.keys[index]
+            series.set_current(key)
+            with telemetry.Phase(telemetry.CHART):
+                display.image.fill(display.WHITE)
+                chart.update(series, overview=overview)
+                display.pack_planes()
+            cache.add(key, Chart.get_window(key, series.slot_minutes)[1], old_plane, new_plane)
+            drawn += 1
+            memory.collect()
+    finally:
+        series.set_current(current_key)
+
+    return drawn
+
 
-    set_time()
+def _frame_series(current_key: int, last_key: int, slot_minutes: int, utc_offset: int) -> 'Series':
+    """
+    Returns a series for the scheduler with the current and the last slot of a frame drawn elsewhere and no prices.
+    """
+    series = bootprofile.load("series").Series(slot_minutes)
+    series.utc_offset = utc_offset
+    series.set_current(current_key)
+    series.append(current_key, 0.0)
+    if last_key > current_key:
+        series.append(last_key, 0.0)
+    return series
 
-    year, month, day, hour, minute, second, weekday, yearday = time.localtime()
-    request_handler._wlan.active(False)
-    request_handler._wlan.disconnect()
 
-    minutes_to_next_update = 60 - int(minute) + 5
-    return minutes_to_next_update
+async def update(display: 'Display', use_network: bool = True) -> tuple:
+    """
+    Draws the chart: from a frame rendered in advance on a wake without the network if secrets.BATCH_FRAMES is
+    set, from a prerendered frame if secrets.PRERENDER_URL is set and the server answers, and rendered here
+    otherwise. Returns (series, key of the last slot shown, True if the frame was rendered in advance).
+    """
+    secrets = bootprofile.load("secrets")
+    if not use_network and getattr(secrets, "BATCH_FRAMES", 0):
+        frame = get_batch_frame(display, clock.now())
+        if frame is not None:
+            if getattr(secrets, "SHOW_STATS", False):
+                telemetry.draw_footer(display.image, display.WIDTH, display.HEIGHT - 9, display.BLACK,
+                                      display.WHITE)
+            return frame + (True,)
+
+    RequestHandler = bootprofile.load("requesthandler").RequestHandler
+    prerender_url = getattr(secrets, "PRERENDER_URL", None)
+
+    # The radio is on from the first request until the clock is synced
+    bootprofile.mark("data")
+    with RequestHandler() as request_handler:
+        if use_network or prerender_url:
+            # Associates while the display initialises, the requests reuse the connection
+            await request_handler.connect_async()
+
+        chart_data = None
+        if prerender_url:
+            try:
+                chart_data, stop_key = get_frame(request_handler, display, prerender_url, clock.now())
+            except Exception as e:
+                print("Prerendered frame failed:", e)
+                display.image.fill(display.WHITE)
+
+        prerendered = chart_data is not None
+        history_days = getattr(secrets, "HISTORY_DAYS", 0)
+        if not prerendered:
+            chart_data = await get_data_async(request_handler, clock.now(), use_network)
+            if history_days:
+                try:
+                    # Only prices newer than the stored ones are written, a cached series adds nothing
+                    bootprofile.load("history").History().append(chart_data)
+                except OSError as e:
+                    print("History not saved:", e)
+
+        if request_handler.server_time is not None or clock.now() is None:
+            request_handler.sync_clock(chart_data.utc_time(chart_data.current_key))
+
+    print("Radio on", request_handler.radio_on_ms, "ms")
+
+    # The response and the parser are garbage now, collect before the chart allocates
+    memory = bootprofile.load("memory")
+    memory.collect()
+
+    if not prerendered:
+        bootprofile.mark("chart")
+        with telemetry.Phase(telemetry.CHART):
+            Chart = bootprofile.load("chart").Chart
+            overview = get_overview(chart_data, history_days) if history_days else None
+            Chart(display).update(chart_data, overview=overview)
+            start_key, stop_key = Chart.get_window(chart_data.current_key, chart_data.slot_minutes)
+        memory.collect(telemetry.CHART)
+
+    if getattr(secrets, "SHOW_STATS", False):
+        telemetry.draw_footer(display.image, display.WIDTH, display.HEIGHT - 9, display.BLACK, display.WHITE)
+
+    return chart_data, stop_key, prerendered
+
+
+def choose_refresh(display: 'Display', frame_store: 'FrameStore', old_plane, new_plane) -> tuple:
+    """
+    Returns the refresh profile for a frame and the windows to refresh with PARTIAL, or (None, None) if the frame is
+    already shown. Frames with only black and white, which have equal planes, use the fast waveform, and the
+    windows that changed are refreshed in 4 gray. A full 4 gray refresh clears the ghosting of both now and then.
+    A chart always has gray, so only error screens use FAST: a chart frame uses PARTIAL when the changed area is
+    within FrameStore.MAX_WINDOW_AREA and QUALITY otherwise.
+    """
+    windows = frame_store.get_windows(old_plane, new_plane)
+    if windows is not None and not windows:
+        return None, None
+
+    # The fast waveform only drives black and white, gray pixels would be lost whatever the size of the change
+    if not frame_store.cleanse_due and old_plane == new_plane:
+        return display.FAST, None
+    if windows is None:
+        return display.QUALITY, None
+    return display.PARTIAL, windows
+
+
+def refresh(display: 'Display') -> None:
+    """
+    Refreshes the parts of the display that differ from the frame shown before the last sleep.
+    The frame is stored on flash while the display refreshes, then the CPU light-sleeps until the refresh ends.
+    """
+    FrameStore = bootprofile.load("framestore").FrameStore
+
+    bootprofile.mark("refresh")
+    display.pack_planes()
+    old_plane, new_plane = display.get_planes()
+
+    frame_store = FrameStore(display.WIDTH, display.HEIGHT)
+    profile, windows = choose_refresh(display, frame_store, old_plane, new_plane)
+
+    if profile is None:
+        return
+
+    def save() -> None:
+        frame_store.save(old_plane, new_plane, profile == display.QUALITY)
+
+    # No other task runs by now, so the blocking redraw light-sleeps instead of idling in the event loop
+    try:
+        if profile == display.PARTIAL:
+            display.redraw_windows(windows, save)
+        else:
+            display.redraw_planes(profile, save)
+    except Exception:
+        # The frame may not be on the display, refresh the whole screen on the next wake
+        frame_store.forget()
+        raise
 
 
 def run() -> None:
-    display = Display()
+    telemetry.add(telemetry.BOOT, utime.ticks_us())
+
+    scheduler = Scheduler()
+    if scheduler.wake() == Scheduler.NOOP:
+        deepsleep(scheduler.sleep())
+
+    bootprofile.load("memory").init()
+    bootprofile.load("uasyncio").run(wake(scheduler))
+
+    bootprofile.mark("sleep")
+    bootprofile.save()
+    deepsleep(scheduler.sleep())
+
+
+async def wake(scheduler: Scheduler) -> None:
+    """
+    Updates the display. The display initialises in a task of its own, so that its reset and power on overlap
+    the network connect and the chart drawing.
+    """
+    uasyncio = bootprofile.load("uasyncio")
+    display_module = bootprofile.load("display")
+    Display = display_module.Display
+    bootprofile.mark("display")
+    display = Display(planar=True, init=False)
     display.image.fill(0xff)
+    display_init = uasyncio.create_task(display.init_async())
 
+    batch = None
     try:
-        minutes_to_next_update = update(display)
+        chart_data, stop_key, prerendered = await update(display, scheduler.kind == Scheduler.REFRESH)
+        scheduler.succeeded(chart_data, stop_key - chart_data.current_key)
+        if not prerendered and scheduler.kind == Scheduler.REFRESH:
+            batch = chart_data
     except Exception as e:
         name = type(e).__name__
         if hasattr(e, "message"):
@@ -84,16 +381,37 @@ def run() -> None:
         display.image.text(name, 0, 11, display.WHITE)
         display.image.text(msg, 0, 21, display.WHITE)
 
-        minutes_to_next_update = 60
+        scheduler.failed()
 
-    display.redraw()
-    display._delay_ms(500)
+    try:
+        await display_init
+        refresh(display)
+        display._delay_ms(500)
+    except display_module.DisplayError as e:
+        # A stuck display, retry after a delay instead of staying awake
+        print("Display error:", e)
+        scheduler.failed()
 
     display.sleep()
     display._delay_ms(500)
 
-    sleep_time = 1000 * 60 * minutes_to_next_update
-    machine.deepsleep(sleep_time)
+    batch_frames = getattr(bootprofile.load("secrets"), "BATCH_FRAMES", 0)
+    if batch is not None and batch_frames:
+        # The panel is asleep and the frame is stored, the display buffers are free for the coming frames
+        try:
+            print("Batch frames", render_batch(display, batch, batch_frames))
+        except OSError as e:
+            print("Batch frames failed:", e)
+            bootprofile.load("framecache").FrameCache(display.WIDTH, display.HEIGHT).forget()
+
+
+def deepsleep(time_ms: int) -> None:
+    """
+    Stores the telemetry of this wake and sleeps until the next one.
+    """
+    telemetry.add(telemetry.SLEEP, time_ms * 1000)
+    telemetry.save()
+    machine.deepsleep(time_ms)
 
 
 if __name__ == '__main__':
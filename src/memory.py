@@ -0,0 +1,75 @@
+import gc
+import struct
+from array import array
+
+import telemetry
+
+# Bytes allocated before the collector runs, so that garbage never piles up to where a large buffer no longer fits
+GC_THRESHOLD = 24 * 1024
+# Resolution of largest_free
+BLOCK_STEP = 256
+
+_mem_free = getattr(gc, "mem_free", None)
+
+# Working buffers shared by the modules, allocated once and reused
+_buffers = {}
+
+
+def init(threshold: int = GC_THRESHOLD) -> None:
+    """
+    Collects the garbage left by the imports and sets the collection threshold.
+    """
+    gc.collect()
+    if hasattr(gc, "threshold"):
+        gc.threshold(threshold)
+
+
+def buffer(name: str, size: int) -> bytearray:
+    """
+    Returns the working buffer of a name, allocated on the first call. The buffer is not cleared between uses.
+    """
+    buffer = _buffers.get(name)
+    if buffer is None or len(buffer) < size:
+        buffer = bytearray(size)
+        _buffers[name] = buffer
+    return buffer
+
+
+def array_buffer(name: str, typecode: str, length: int):
+    """
+    Returns the working array of a name with at least length items, allocated on the first call and replaced only
+    when a longer one is needed.
+    """
+    items = _buffers.get(name)
+    if items is None or len(items) < length:
+        items = array(typecode, bytearray(length * struct.calcsize(typecode)))
+        _buffers[name] = items
+    return items
+
+
+def collect(phase_id: int = None) -> None:
+    """
+    Collects the garbage at the end of a phase and adds the largest free block to the telemetry of the phase.
+    """
+    gc.collect()
+    if phase_id is not None:
+        telemetry.heap(phase_id, largest_free())
+
+
+def largest_free(step: int = BLOCK_STEP) -> int:
+    """
+    Returns the size of the largest buffer that can be allocated, to within step bytes. Takes a few collections,
+    so it is only sampled at phase boundaries.
+    """
+    low = 0
+    high = _mem_free() if _mem_free is not None else 256 * 1024
+    while high - low > step:
+        middle = (low + high) // 2
+        try:
+            block = bytearray(middle)
+            del block
+            low = middle
+        except MemoryError:
+            high = middle
+        gc.collect()
+    return low
@@ -1,14 +1,21 @@
 class PartialDate:
     """
     Class containing parts of a full date.
+    PartialDates are ordered by time and should not be modified after creation.
     """
+    __slots__ = ("year", "month", "day", "hour", "minute", "weekday", "_key")
 
-    def __init__(self, year: int, month: int, day: int, hour: int):
+    def __init__(self, year: int, month: int, day: int, hour: int, minute: int = 0):
         self.year = year
         self.month = month
         self.day = day
         self.hour = hour
-        self.weekday = 0
+        self.minute = minute
+
+        days = days_from_civil(year, month, day)
+        # 1970-01-01 was a Thursday
+        self.weekday = (days + 3) % 7
+        self._key = (days * 24 + hour) * 60 + minute
 
     def get_weekday(self):
         day = self.weekday
@@ -27,29 +34,87 @@ class PartialDate:
         if day == 6:
             return "Sun"
 
-    def _to_comparable(self) -> int:
+    @property
+    def key(self) -> int:
         """
-        Returns an integer that can be used for comparing PartialDates.
+        Number of hours since 1970-01-01 00:00.
         """
-        return self.year * 12 * 31 * 24 + self.month * 31 * 24 + self.day * 24 + self.hour
+        return self._key // 60
+
+    @property
+    def minutes(self) -> int:
+        """
+        Number of minutes since 1970-01-01 00:00.
+        """
+        return self._key
 
     def is_same_hour(self, other: 'PartialDate') -> bool:
         """
         Returns True if a given PartialDate is during the same hour.
         """
-        return self._to_comparable() == other._to_comparable()
+        return self._key // 60 == other._key // 60
 
     def is_in_range(self, before: 'PartialDate', after: 'PartialDate') -> bool:
         """
         Returns True if this PartialData is between two others.
         """
-        return self.more_or_equal_to(before) and self.less_or_equal_to(after)
+        return before._key <= self._key <= after._key
 
     def more_or_equal_to(self, other: 'PartialDate'):
-        return self._to_comparable() >= other._to_comparable()
+        return self._key >= other._key
 
     def less_or_equal_to(self, other: 'PartialDate'):
-        return self._to_comparable() <= other._to_comparable()
+        return self._key <= other._key
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PartialDate) and self._key == other._key
+
+    def __ne__(self, other) -> bool:
+        return not self.__eq__(other)
+
+    def __lt__(self, other: 'PartialDate') -> bool:
+        return self._key < other._key
+
+    def __le__(self, other: 'PartialDate') -> bool:
+        return self._key <= other._key
+
+    def __gt__(self, other: 'PartialDate') -> bool:
+        return self._key > other._key
+
+    def __ge__(self, other: 'PartialDate') -> bool:
+        return self._key >= other._key
+
+    def __hash__(self) -> int:
+        return hash(self._key)
 
     def __str__(self) -> str:
         return f"{self.year}, {self.month}, {self.day}, {self.hour}"
+
+
+def days_from_civil(year: int, month: int, day: int) -> int:
+    """
+    Returns the number of days since 1970-01-01 of a date in the proleptic Gregorian calendar.
+    """
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def civil_from_days(days: int) -> tuple:
+    """
+    Returns the date (year, month, day) a number of days after 1970-01-01, the inverse of days_from_civil.
+    """
+    days += 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    month_index = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * month_index + 2) // 5 + 1
+    month = month_index + (3 if month_index < 10 else -9)
+    year = year_of_era + era * 400 + (1 if month <= 2 else 0)
+    return year, month, day
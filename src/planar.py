@@ -0,0 +1,101 @@
+import framebuf
+
+
+class PlanarFrameBuffer:
+    """
+    Drawing surface over the two 1 bit planes sent to the display, with the same drawing methods as a GS2_HMSB
+    FrameBuffer. A gray level c (0 black - 3 white) is stored as bit c & 1 in the old plane (0x10) and bit c >> 1
+    in the new plane (0x13), so the planes can be sent without conversion.
+    """
+
+    def __init__(self, old_buffer, new_buffer, width: int, height: int):
+        """
+        :param old_buffer: Buffer of the old plane (0x10), width * height / 8 bytes.
+        :param new_buffer: Buffer of the new plane (0x13), width * height / 8 bytes.
+        """
+        self.old = framebuf.FrameBuffer(old_buffer, width, height, framebuf.MONO_HLSB)
+        self.new = framebuf.FrameBuffer(new_buffer, width, height, framebuf.MONO_HLSB)
+
+        # Palettes and keys used to blit 1 bit sprites into each plane
+        self._palette_buffers = (bytearray(1), bytearray(1))
+        self._palettes = (
+            framebuf.FrameBuffer(self._palette_buffers[0], 2, 1, framebuf.MONO_HLSB),
+            framebuf.FrameBuffer(self._palette_buffers[1], 2, 1, framebuf.MONO_HLSB),
+        )
+
+    def fill(self, c: int) -> None:
+        self.old.fill(c & 1)
+        self.new.fill((c >> 1) & 1)
+
+    def pixel(self, x: int, y: int, c: int = None):
+        if c is None:
+            old = self.old.pixel(x, y)
+            if old is None:
+                return None
+            return (self.new.pixel(x, y) << 1) | old
+
+        self.old.pixel(x, y, c & 1)
+        self.new.pixel(x, y, (c >> 1) & 1)
+
+    def hline(self, x: int, y: int, w: int, c: int) -> None:
+        self.old.hline(x, y, w, c & 1)
+        self.new.hline(x, y, w, (c >> 1) & 1)
+
+    def vline(self, x: int, y: int, h: int, c: int) -> None:
+        self.old.vline(x, y, h, c & 1)
+        self.new.vline(x, y, h, (c >> 1) & 1)
+
+    def rect(self, x: int, y: int, w: int, h: int, c: int, f: bool = False) -> None:
+        self.old.rect(x, y, w, h, c & 1, f)
+        self.new.rect(x, y, w, h, (c >> 1) & 1, f)
+
+    def fill_rect(self, x: int, y: int, w: int, h: int, c: int) -> None:
+        self.old.fill_rect(x, y, w, h, c & 1)
+        self.new.fill_rect(x, y, w, h, (c >> 1) & 1)
+
+    def line(self, x1: int, y1: int, x2: int, y2: int, c: int) -> None:
+        self.old.line(x1, y1, x2, y2, c & 1)
+        self.new.line(x1, y1, x2, y2, (c >> 1) & 1)
+
+    def text(self, s: str, x: int, y: int, c: int = 1) -> None:
+        self.old.text(s, x, y, c & 1)
+        self.new.text(s, x, y, (c >> 1) & 1)
+
+    def blit(self, fbuf, x: int, y: int, key: int = -1, palette=None) -> None:
+        """
+        Draws another PlanarFrameBuffer, or a 1 bit FrameBuffer through a palette of two gray levels.
+        Pixels whose gray level is key are not drawn.
+        """
+        if isinstance(fbuf, PlanarFrameBuffer):
+            if key != -1 or palette is not None:
+                raise ValueError("Key and palette are only supported for 1 bit sources")
+            self.old.blit(fbuf.old, x, y)
+            self.new.blit(fbuf.new, x, y)
+            return
+
+        if palette is None:
+            raise ValueError("A palette is needed to map a 1 bit source to gray levels")
+
+        colors = (palette.pixel(0, 0) & 0x03, palette.pixel(1, 0) & 0x03)
+        if key != -1:
+            key &= 0x03
+        if colors[0] == key and colors[1] == key:
+            return
+
+        for plane, plane_palette, buffer, shift in ((self.old, self._palettes[0], self._palette_buffers[0], 0),
+                                                    (self.new, self._palettes[1], self._palette_buffers[1], 1)):
+            bit0 = (colors[0] >> shift) & 1
+            bit1 = (colors[1] >> shift) & 1
+
+            if colors[0] == key:
+                # Transparent 0 bits map to the inverse of the drawn bit, which is then the key
+                bit0 = 1 - bit1
+                plane_key = bit0
+            elif colors[1] == key:
+                bit1 = 1 - bit0
+                plane_key = bit1
+            else:
+                plane_key = -1
+
+            buffer[0] = (bit0 << 7) | (bit1 << 6)
+            plane.blit(fbuf, x, y, plane_key, plane_palette)
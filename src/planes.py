@@ -0,0 +1,65 @@
+def _build_table() -> bytearray:
+    """
+    Builds a table mapping a GS2_HMSB byte (four pixels) to the matching bits of both display planes.
+    The high nibble holds the bits for the old plane (0x10), the low nibble the bits for the new plane (0x13).
+    """
+    table = bytearray(256)
+
+    for byte in range(256):
+        old_bits = 0
+        new_bits = 0
+
+        # The leftmost pixel is stored in the two least significant bits
+        for shift in range(0, 8, 2):
+            pixel = (byte >> shift) & 0x03
+            old_bits = (old_bits << 1) | (pixel & 0x01)  # white and gray2 are set
+            new_bits = (new_bits << 1) | (pixel >> 1)  # white and gray1 are set
+
+        table[byte] = (old_bits << 4) | new_bits
+
+    return table
+
+
+_TABLE = _build_table()
+
+
+def _pack_python(src, old, new, table, count: int) -> None:
+    j = 0
+    for i in range(count):
+        e0 = table[src[j]]
+        e1 = table[src[j + 1]]
+        old[i] = (e0 & 0xf0) | (e1 >> 4)
+        new[i] = ((e0 << 4) & 0xf0) | (e1 & 0x0f)
+        j += 2
+
+
+try:
+    import micropython
+
+    @micropython.viper
+    def _pack_viper(src: ptr8, old: ptr8, new: ptr8, table: ptr8, count: int):
+        j = 0
+        for i in range(count):
+            e0 = table[src[j]]
+            e1 = table[src[j + 1]]
+            old[i] = (e0 & 0xf0) | (e1 >> 4)
+            new[i] = ((e0 << 4) & 0xf0) | (e1 & 0x0f)
+            j += 2
+
+    _pack = _pack_viper
+except (ImportError, AttributeError):
+    _pack = _pack_python
+
+
+def pack(src, old, new) -> None:
+    """
+    Converts a GS2_HMSB buffer into the two 1 bit planes expected by the display.
+    :param src: GS2_HMSB image buffer.
+    :param old: Preallocated buffer receiving the old plane (0x10), half the size of src.
+    :param new: Preallocated buffer receiving the new plane (0x13), half the size of src.
+    """
+    count = len(src) // 2
+    if len(old) < count or len(new) < count:
+        raise ValueError("Plane buffers are too small")
+
+    _pack(src, old, new, _TABLE, count)
@@ -0,0 +1,77 @@
+def project(values, start: int, stop: int, x_offset: float, x_step: float, y_offset: int, y_scale: float,
+            points) -> int:
+    """
+    Converts values[start:stop] to pixel coordinates in one pass and stores them as x, y pairs in points.
+    Value i is at x = int((i - start) * x_step + x_offset) and y = int(y_offset - value * y_scale).
+    Values falling in the same pixel column are reduced to the lowest and highest y in the order they occur, so
+    a series with more values than the chart has columns keeps its visible extremes.
+    Returns the number of points stored, at most 2 per pixel column and never more than stop - start.
+    :param points: array("h") large enough for 4 * min(stop - start, columns) items.
+    """
+    count = 0
+    column = None
+    low = high = 0
+    low_last = False
+
+    for i in range(start, stop):
+        x = int((i - start) * x_step + x_offset)
+        y = int(y_offset - values[i] * y_scale)
+
+        if x == column:
+            if y < low:
+                low = y
+                low_last = True
+            elif y > high:
+                high = y
+                low_last = False
+            continue
+
+        if column is not None:
+            count = _put_column(points, count, column, low, high, low_last)
+
+        column = x
+        low = high = y
+        low_last = False
+
+    if column is not None:
+        count = _put_column(points, count, column, low, high, low_last)
+
+    return count
+
+
+def polyline(image, points, count: int, color: int) -> None:
+    """
+    Draws lines through the first count x, y pairs of points.
+    """
+    if count < 1:
+        return
+
+    previous_x = points[0]
+    previous_y = points[1]
+    for i in range(2, 2 * count, 2):
+        x = points[i]
+        y = points[i + 1]
+        image.line(previous_x, previous_y, x, y, color)
+        previous_x = x
+        previous_y = y
+
+
+def _put_column(points, count: int, x: int, low: int, high: int, low_last: bool) -> int:
+    """
+    Stores the extremes of a pixel column in the order they occurred. Returns the new number of points.
+    """
+    if low_last:
+        first, last = high, low
+    else:
+        first, last = low, high
+
+    points[2 * count] = x
+    points[2 * count + 1] = first
+    count += 1
+
+    if last != first:
+        points[2 * count] = x
+        points[2 * count + 1] = last
+        count += 1
+
+    return count
@@ -0,0 +1,64 @@
+import struct
+
+MAGIC = b"MCP1"
+# magic, key of the current slot, key of the last slot with a price, key of the last slot shown, slot minutes,
+# UTC offset in minutes
+HEADER_FORMAT = "<4slllHh"
+
+
+class FrameError(Exception):
+    pass
+
+
+class FrameReader:
+    """
+    Receives a frame prerendered by tools/prerender_server.py in chunks, straight into the planes of the display.
+    A frame is a header followed by the old and the new plane.
+    """
+
+    def __init__(self, old_plane, new_plane):
+        self._header = bytearray(struct.calcsize(HEADER_FORMAT))
+        self._views = (memoryview(self._header), memoryview(old_plane), memoryview(new_plane))
+        self._part = 0
+        self._offset = 0
+
+    def feed(self, chunk) -> None:
+        position = 0
+        size = len(chunk)
+        while position < size:
+            if self._part == len(self._views):
+                raise FrameError("Frame is too long")
+
+            view = self._views[self._part]
+            count = min(len(view) - self._offset, size - position)
+            view[self._offset:self._offset + count] = chunk[position:position + count]
+            position += count
+            self._offset += count
+
+            if self._offset == len(view):
+                self._part += 1
+                self._offset = 0
+
+    def close(self) -> tuple:
+        """
+        Returns (current key, last key, stop key, slot minutes, UTC offset) of the chart in the frame.
+        Raises a FrameError if the frame is incomplete.
+        """
+        if self._part != len(self._views):
+            raise FrameError("Frame is incomplete")
+
+        magic, current_key, last_key, stop_key, slot_minutes, utc_offset = struct.unpack(HEADER_FORMAT, self._header)
+        if magic != MAGIC:
+            raise FrameError("Not a frame")
+
+        return current_key, last_key, stop_key, slot_minutes, utc_offset
+
+
+def encode(old_plane, new_plane, current_key: int, last_key: int, stop_key: int, slot_minutes: int,
+           utc_offset: int) -> bytes:
+    """
+    Returns a frame holding the planes of a chart.
+    :param stop_key: Key of the last slot shown in the detail chart.
+    """
+    header = struct.pack(HEADER_FORMAT, MAGIC, current_key, last_key, stop_key, slot_minutes, utc_offset)
+    return header + bytes(old_plane) + bytes(new_plane)
@@ -1,60 +1,399 @@
-import network
-import time
-import urequests
+from array import array
+import os
+import struct
+import utime
 import secrets
 
+import clock
+import memory
+import telemetry
+from series import Series
+
+try:
+    import deflate
+except ImportError:
+    deflate = None
+
 
 class RequestException(Exception):
     pass
 
 
 class RequestHandler:
-    def __init__(self):
-        self._wlan = network.WLAN(network.STA_IF)
+    CHUNK_SIZE = 512
+
+    CACHE_PATH = "feed.bin"
+    CACHE_MAGIC = b"MCD1"
+    # magic, slot minutes, UTC offset, point count, coverage end key, ETag length, Last-Modified length
+    CACHE_HEADER_FORMAT = "<4sHhHlBB"
+
+    LINK_PATH = "wifi.bin"
+    # BSSID, channel, IP address, netmask, gateway, DNS server. The BSSID is zero and the channel 0 when the port
+    # does not report them.
+    LINK_FORMAT = "<6sB4s4s4s4s"
+    NO_BSSID = bytes(6)
+
+    CONNECT_TIMEOUT_MS = 15000
+    # A reconnect to a known access point with a known address normally takes well under a second
+    FAST_CONNECT_TIMEOUT_MS = 3000
+    CONNECT_POLL_MS = 50
+
+    NTP_TRIES = 3
+    NTP_RETRY_MS = 1000
 
-    def get_json(self, url: str) -> dict:
+    def __init__(self, compressed: bool = True, cache_path: str = CACHE_PATH, link_path: str = LINK_PATH):
         """
-        Returns the json from a given url.
+        The network is connected on the first request and stays connected until close(), so that the fetch and
+        the clock sync share one session. RequestHandler can be used as a context manager.
+        :param compressed: Ask for a gzip compressed response, if the firmware has the deflate module.
+        :param cache_path: File on flash holding the last dataset.
+        :param link_path: File on flash holding the access point and address of the last connection.
+        """
+        # Created on the first connect, the network modules are only loaded on wakes that use them
+        self._wlan = None
+        self._compressed = compressed and deflate is not None
+        self._chunk = memory.buffer("http", self.CHUNK_SIZE)
+        self._cache_path = cache_path
+        self._link_path = link_path
+
+        # Time from the Date header of the last response, and the ticks when it was received
+        self.server_time = None
+        self._server_ticks = 0
+
+        # Total time the radio has been on
+        self.radio_on_ms = 0
+        self._radio_on_ticks = None
+
+        # Validators of the cached dataset and of the last response
+        self._cached_etag = None
+        self._cached_last_modified = None
+        self._etag = None
+        self._last_modified = None
+
+    def stream(self, url: str, feed, conditional: bool = False) -> bool:
+        """
+        Reads the body from a given url in fixed size chunks and passes every chunk to feed.
+        The chunks are views of a reused buffer and are only valid during the call.
+        Returns False without reading a body if the request was conditional and the cached dataset is still current.
         Raises a RequestException if unsuccessful.
+        :param conditional: Only ask for the body if it has changed since the cached dataset was fetched.
+        """
+        return run_steps(self.stream_steps(url, feed, conditional))
+
+    def stream_steps(self, url: str, feed, conditional: bool = False):
+        """
+        Same as stream, yielding 0 after every chunk so that a caller can let other tasks run during the download.
+        The result of stream is the value of the generator.
         """
         self._connect()
 
-        request = urequests.get(url)
-        status_code = request.status_code
+        headers = {}
+        if self._compressed:
+            headers["Accept-Encoding"] = "gzip"
+        if conditional and self._cached_etag:
+            headers["If-None-Match"] = self._cached_etag
+        if conditional and self._cached_last_modified:
+            headers["If-Modified-Since"] = self._cached_last_modified
+
+        import urequests
+        request = urequests.get(url, headers=headers)
 
-        if status_code != 200:
+        try:
+            status_code = request.status_code
+            if status_code == 304 and conditional:
+                self._read_date(request)
+                return False
+            if status_code != 200:
+                raise RequestException("HTTP status:" + str(status_code))
+
+            self._etag = _header(request, "ETag")
+            self._last_modified = _header(request, "Last-Modified")
+            self._read_date(request)
+
+            body = request.raw
+            encoding = _header(request, "Content-Encoding")
+            if self._compressed and encoding is not None and encoding.lower() == "gzip":
+                body = deflate.DeflateIO(body, deflate.GZIP)
+
+            chunk = memoryview(self._chunk)
+            while True:
+                count = body.readinto(chunk)
+                if not count:
+                    break
+                feed(chunk[:count])
+                yield 0
+        finally:
             request.close()
-            self._disconnect()
-            raise RequestException("HTTP status:" + str(status_code))
 
-        json = request.json()
-        request.close()
+        return True
+
+    def get_server_time(self):
+        """
+        Returns the current time in seconds since 1970-01-01 00:00 UTC according to the Date header of the
+        last response, or None if no response had one.
+        """
+        if self.server_time is None:
+            return None
+        return self.server_time + utime.ticks_diff(utime.ticks_ms(), self._server_ticks) // 1000
+
+    def sync_clock(self, fallback_time: int = None) -> None:
+        """
+        Sets the clock from the Date header of the last response. Uses NTP if no response had one, and the
+        fallback time if NTP fails too.
+        :param fallback_time: Time in seconds since 1970-01-01 00:00 UTC to use as a last resort.
+        """
+        server_time = self.get_server_time()
+        if server_time is not None:
+            clock.set_time(server_time)
+            return
+
+        self._connect()
 
+        import ntptime
+        for i in range(self.NTP_TRIES):
+            try:
+                ntptime.settime()
+                return
+            except Exception as e:
+                if i == self.NTP_TRIES - 1 and fallback_time is None:
+                    raise e
+
+            if i < self.NTP_TRIES - 1:
+                utime.sleep_ms(self.NTP_RETRY_MS)
+
+        clock.set_time(fallback_time)
+
+    def close(self) -> None:
+        """
+        Ends the network session and turns the radio off.
+        """
         self._disconnect()
 
-        return json
+    def __enter__(self) -> 'RequestHandler':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def load_cache(self):
+        """
+        Returns the dataset stored on flash, or None if there is none.
+        """
+        try:
+            with open(self._cache_path, "rb") as file:
+                header = file.read(struct.calcsize(self.CACHE_HEADER_FORMAT))
+                magic, slot_minutes, utc_offset, count, coverage_end, etag_length, last_modified_length = \
+                    struct.unpack(self.CACHE_HEADER_FORMAT, header)
+                if magic != self.CACHE_MAGIC or count == 0:
+                    return None
+
+                etag = file.read(etag_length).decode()
+                last_modified = file.read(last_modified_length).decode()
+
+                keys = array("l", file.read(count * struct.calcsize("l")))
+                values = array("f", file.read(count * struct.calcsize("f")))
+        except (OSError, ValueError):
+            return None
+
+        if len(keys) != count or len(values) != count:
+            return None
+
+        self._cached_etag = etag or None
+        self._cached_last_modified = last_modified or None
+
+        return Series.from_arrays(keys, values, slot_minutes, utc_offset)
 
+    def save_cache(self, series: Series) -> None:
+        """
+        Stores a dataset on flash together with the validators of the response it was read from.
+        """
+        etag = (self._etag or "").encode()
+        last_modified = (self._last_modified or "").encode()
+        coverage_end = series.keys[-1] + 1
+
+        with open(self._cache_path, "wb") as file:
+            file.write(struct.pack(self.CACHE_HEADER_FORMAT, self.CACHE_MAGIC, series.slot_minutes, series.utc_offset,
+                                   len(series), coverage_end, len(etag), len(last_modified)))
+            file.write(etag)
+            file.write(last_modified)
+            file.write(series.keys)
+            file.write(series.values)
+
+        self._cached_etag = self._etag
+        self._cached_last_modified = self._last_modified
+
+    def _read_date(self, request) -> None:
+        date = _header(request, "Date")
+        server_time = clock.parse_http_date(date) if date is not None else None
+        if server_time is not None:
+            self.server_time = server_time
+            self._server_ticks = utime.ticks_ms()
+
+    async def connect_async(self) -> None:
+        """
+        Connects to the network like the first request would, letting other tasks run while the station
+        associates. Later requests reuse the connection.
+        """
+        import uasyncio
+
+        # Added directly, since phases of other tasks open and close while this one waits
+        start = utime.ticks_us()
+        try:
+            for delay in self._connect_steps():
+                await uasyncio.sleep_ms(delay)
+        finally:
+            telemetry.add(telemetry.CONNECT, utime.ticks_diff(utime.ticks_us(), start))
+
+    @telemetry.Phase(telemetry.CONNECT)
     def _connect(self) -> None:
         """
-        Creates a connection to the network.
+        Creates a connection to the network, unless already connected.
         """
-        self._wlan.active(True)
+        for delay in self._connect_steps():
+            utime.sleep_ms(delay)
 
-        self._wlan.connect(secrets.SSID, secrets.PASSWORD)
+    def _connect_steps(self):
+        """
+        Connects to the network, yielding the time in ms to wait between polls of the connection state.
+        Reconnects to the access point and with the address of the last connection if they are known, which
+        skips the scan and DHCP, and falls back to a full connect.
+        """
+        if self._radio_on_ticks is not None and self._wlan.isconnected():
+            return
 
-        # Wait for connection
-        for _ in range(15):
-            if self._wlan.isconnected():
+        if self._wlan is None:
+            import network
+            self._wlan = network.WLAN(network.STA_IF)
+
+        if self._radio_on_ticks is None:
+            self._radio_on_ticks = utime.ticks_ms()
+        self._wlan.active(True)
+
+        link = self._load_link()
+        if link is not None:
+            bssid, channel, ifconfig = link
+            self._wlan.ifconfig(ifconfig)
+            if bssid is not None:
+                self._wlan.connect(secrets.SSID, secrets.PASSWORD, bssid=bssid, channel=channel)
+            elif channel:
+                self._wlan.connect(secrets.SSID, secrets.PASSWORD, channel=channel)
+            else:
+                self._wlan.connect(secrets.SSID, secrets.PASSWORD)
+            if (yield from self._wait_connected(self.FAST_CONNECT_TIMEOUT_MS)):
                 return
 
-            time.sleep(1)
+            # The access point or the address has changed
+            self._forget_link()
+            self._wlan.disconnect()
+            self._wlan.ifconfig("dhcp")
+
+        self._wlan.connect(secrets.SSID, secrets.PASSWORD)
+        if (yield from self._wait_connected(self.CONNECT_TIMEOUT_MS)):
+            self._save_link()
+            return
 
         # Connection failed
         self._disconnect()
         raise RequestException("Could not connect to network")
 
+    def _wait_connected(self, timeout_ms: int):
+        start = utime.ticks_ms()
+        while utime.ticks_diff(utime.ticks_ms(), start) < timeout_ms:
+            if self._wlan.isconnected():
+                return True
+            yield self.CONNECT_POLL_MS
+        return self._wlan.isconnected()
+
     def _disconnect(self):
         """
         Closes connection.
         """
-        self._wlan.active(False)
+        if self._wlan is not None:
+            self._wlan.active(False)
+
+        if self._radio_on_ticks is not None:
+            self.radio_on_ms += utime.ticks_diff(utime.ticks_ms(), self._radio_on_ticks)
+            self._radio_on_ticks = None
+
+    def _load_link(self):
+        """
+        Returns (bssid, channel, ifconfig) of the last connection, or None if it is not known. The BSSID is None and
+        the channel 0 if they were not reported.
+        """
+        try:
+            with open(self._link_path, "rb") as file:
+                data = file.read()
+            bssid, channel, ip, netmask, gateway, dns = struct.unpack(self.LINK_FORMAT, data)
+        except (OSError, ValueError):
+            return None
+
+        if bssid == self.NO_BSSID:
+            bssid = None
+        return bssid, channel, (_format_ip(ip), _format_ip(netmask), _format_ip(gateway), _format_ip(dns))
+
+    def _save_link(self) -> None:
+        """
+        Stores the access point and address of the current connection.
+        """
+        # Not every port reports the access point it joined, the address alone still skips DHCP
+        bssid = _config(self._wlan, "bssid")
+        if not isinstance(bssid, bytes) or len(bssid) != 6:
+            bssid = self.NO_BSSID
+        channel = _config(self._wlan, "channel")
+        if not isinstance(channel, int) or not 0 < channel < 256:
+            channel = 0
+
+        ip, netmask, gateway, dns = self._wlan.ifconfig()
+        try:
+            with open(self._link_path, "wb") as file:
+                file.write(struct.pack(self.LINK_FORMAT, bssid, channel, _parse_ip(ip), _parse_ip(netmask),
+                                       _parse_ip(gateway), _parse_ip(dns)))
+        except OSError:
+            pass
+
+    def _forget_link(self) -> None:
+        try:
+            os.remove(self._link_path)
+        except OSError:
+            pass
+
+
+def run_steps(steps):
+    """
+    Runs a generator of steps to its end without waiting between them and returns its value.
+    """
+    try:
+        while True:
+            next(steps)
+    except StopIteration as e:
+        return e.value
+
+
+def _config(wlan, name: str):
+    """
+    Returns a parameter of the interface, or None if the port does not have it.
+    """
+    try:
+        return wlan.config(name)
+    except (ValueError, OSError, TypeError):
+        return None
+
+
+def _header(response, name: str):
+    """
+    Returns the value of a response header, or None if the response does not have it.
+    """
+    headers = getattr(response, "headers", None) or {}
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value.strip()
+    return None
+
+
+def _parse_ip(address: str) -> bytes:
+    return bytes(int(part) for part in address.split("."))
+
+
+def _format_ip(address: bytes) -> str:
+    return ".".join(str(part) for part in address)
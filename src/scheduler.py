@@ -0,0 +1,207 @@
+import os
+import struct
+import utime
+
+import clock
+
+
+class Scheduler:
+    """
+    Plans the work of every wake and the time of the next one. The state is kept on flash, since nothing in RAM
+    survives deepsleep. The RTC does not survive it either on rp2, so at wake the clock is set to the planned
+    wake time until a response from the network corrects it.
+    """
+    PATH = "schedule.bin"
+    LOG_PATH = "wake.log"
+    MAGIC = b"MCW1"
+    # magic, planned wake time, planned sleep, shown slot key, coverage end time, slot minutes, UTC offset,
+    # retries, slots from the current to the last slot in the chart
+    STATE_FORMAT = "<4sllllHhBB"
+
+    # Kinds of wake
+    REFRESH = 0  # fetch from the network and render
+    RENDER = 1  # render from the cached data
+    NOOP = 2  # nothing visible changes, sleep again
+
+    # Prices for the next day are published at 13:00, 11 hours before the end of the data covered
+    PUBLICATION_LEAD_SECONDS = 11 * 3600
+    # Wake this long after a slot boundary, so that an early wake caused by the sleep timer is unlikely
+    WAKE_MARGIN_SECONDS = 30
+
+    # Retry delay after a failure or a fetch without new data, doubled on every retry
+    BACKOFF_SECONDS = 120
+    MAX_BACKOFF_SECONDS = 3600
+
+    LOG_MAX_BYTES = 4096
+
+    def __init__(self, path: str = PATH, log_path: str = LOG_PATH):
+        self._path = path
+        self._log_path = log_path
+
+        self._planned_wake = 0
+        self._planned_sleep = 0
+        self._shown_key = -1
+        self._coverage_end = 0
+        self._slot_minutes = 60
+        self._utc_offset = 0
+        self._retries = 0
+        self._window_slots = 0
+
+        self.kind = self.REFRESH
+        self._estimated = False
+        self._wake_time = None
+        self._wake_ticks = 0
+
+        self._load()
+
+    def wake(self) -> int:
+        """
+        Restores the clock if it was lost and returns the kind of work to do in this wake.
+        """
+        now = clock.now()
+        if now is None and self._planned_wake:
+            # Time spent booting is counted from the planned wake time
+            now = self._planned_wake + utime.ticks_ms() // 1000
+            clock.set_time(now)
+            self._estimated = True
+
+        self._wake_time = now
+        self._wake_ticks = utime.ticks_ms()
+
+        if now is None or self._coverage_end == 0 or self._retries:
+            self.kind = self.REFRESH
+        elif self._needs_data(now):
+            self.kind = self.REFRESH
+        elif self._key_at(now) == self._shown_key:
+            self.kind = self.NOOP
+        else:
+            self.kind = self.RENDER
+
+        return self.kind
+
+    def succeeded(self, series, window_slots: int) -> None:
+        """
+        Records a wake that showed the chart of a series.
+        :param window_slots: Number of slots the chart shows after the current one.
+        """
+        coverage_end = series.utc_time(series.keys[-1] + 1)
+        if self.kind == self.REFRESH and self._coverage_end and coverage_end <= self._coverage_end and \
+                self._needs_data(clock.now()):
+            # Fetched, but the next prices have not been published yet
+            self._retries += 1
+        else:
+            self._retries = 0
+
+        self._coverage_end = coverage_end
+        self._slot_minutes = series.slot_minutes
+        self._utc_offset = series.utc_offset
+        self._shown_key = series.current_key
+        self._window_slots = window_slots
+
+    def failed(self) -> None:
+        """
+        Records a wake that failed, the next wake is a retry after a growing delay.
+        """
+        self._retries += 1
+        self._shown_key = -1
+
+    def sleep(self) -> int:
+        """
+        Plans the next wake, stores the state and logs this wake. Returns the time to sleep in ms.
+        """
+        now = clock.now()
+        if now is None:
+            # Without a clock the next slot boundary is not known
+            sleep_seconds = self.MAX_BACKOFF_SECONDS
+        else:
+            next_wake = self._next_boundary(now)
+            if self._retries:
+                next_wake = min(next_wake, now + self._backoff())
+            elif self._coverage_end:
+                publication = self._coverage_end - self.PUBLICATION_LEAD_SECONDS + self.WAKE_MARGIN_SECONDS
+                if now < publication < next_wake:
+                    next_wake = publication
+            sleep_seconds = max(1, next_wake - now)
+
+        self._log(now)
+
+        self._planned_wake = now + sleep_seconds if now is not None else 0
+        self._planned_sleep = sleep_seconds
+        self._save()
+
+        return sleep_seconds * 1000
+
+    def _needs_data(self, now: int) -> bool:
+        """
+        Returns True if the cached data does not cover the chart and new data should be published by now.
+        """
+        stop_key = self._key_at(now) + self._window_slots
+        window_end = ((stop_key + 1) * self._slot_minutes - self._utc_offset) * 60
+        return window_end > self._coverage_end and now >= self._coverage_end - self.PUBLICATION_LEAD_SECONDS
+
+    def _key_at(self, utc_seconds: int) -> int:
+        return (utc_seconds // 60 + self._utc_offset) // self._slot_minutes
+
+    def _next_boundary(self, now: int) -> int:
+        slot_seconds = self._slot_minutes * 60
+        offset_seconds = self._utc_offset * 60
+        return ((now + offset_seconds) // slot_seconds + 1) * slot_seconds - offset_seconds + \
+            self.WAKE_MARGIN_SECONDS
+
+    def _backoff(self) -> int:
+        return min(self.BACKOFF_SECONDS << min(self._retries - 1, 16), self.MAX_BACKOFF_SECONDS)
+
+    def _log(self, now) -> None:
+        """
+        Appends the planned and actual length of the last sleep and the time spent awake to the wake log.
+        """
+        awake_ms = utime.ticks_ms()
+        correction = 0
+        if self._estimated and now is not None:
+            # Difference between the estimated clock and the clock after a network sync
+            elapsed = utime.ticks_diff(utime.ticks_ms(), self._wake_ticks) // 1000
+            correction = now - (self._wake_time + elapsed)
+
+        line = "%d %d %d %d %d %d\n" % (self._wake_time or 0, self.kind, self._planned_sleep,
+                                        self._planned_sleep + correction, awake_ms, self._retries)
+        try:
+            if os.stat(self._log_path)[6] > self.LOG_MAX_BYTES:
+                os.rename(self._log_path, self._log_path + ".1")
+        except OSError:
+            pass
+
+        try:
+            with open(self._log_path, "a") as file:
+                file.write(line)
+        except OSError:
+            pass
+
+    def _load(self) -> None:
+        try:
+            with open(self._path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return
+
+        if len(data) != struct.calcsize(self.STATE_FORMAT):
+            return
+
+        magic, planned_wake, planned_sleep, shown_key, coverage_end, slot_minutes, utc_offset, retries, \
+            window_slots = struct.unpack(self.STATE_FORMAT, data)
+        if magic != self.MAGIC:
+            return
+
+        self._planned_wake = planned_wake
+        self._planned_sleep = planned_sleep
+        self._shown_key = shown_key
+        self._coverage_end = coverage_end
+        self._slot_minutes = slot_minutes
+        self._utc_offset = utc_offset
+        self._retries = retries
+        self._window_slots = window_slots
+
+    def _save(self) -> None:
+        with open(self._path, "wb") as file:
+            file.write(struct.pack(self.STATE_FORMAT, self.MAGIC, self._planned_wake, self._planned_sleep,
+                                   self._shown_key, self._coverage_end, self._slot_minutes, self._utc_offset,
+                                   min(self._retries, 255), self._window_slots))
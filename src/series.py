@@ -0,0 +1,257 @@
+from array import array
+
+from partialdate import PartialDate, days_from_civil
+
+
+class Series:
+    """
+    Time series of values in fixed length time slots, stored as parallel arrays.
+    Keys are slot numbers counted from 1970-01-01 00:00. Minimum, maximum, sum and the index of the current slot
+    are kept up to date as points are added and removed.
+    """
+
+    def __init__(self, slot_minutes: int = 60):
+        """
+        :param slot_minutes: Length of a time slot in minutes.
+        """
+        self.slot_minutes = slot_minutes
+        self.keys = array("l")
+        self.values = array("f")
+
+        self.min_value = None
+        self.max_value = None
+        self.total = 0.0
+
+        self.current_key = None
+        self.current_index = None
+
+        # Offset from UTC in minutes of the times in the series
+        self.utc_offset = 0
+
+    @staticmethod
+    def from_arrays(keys, values, slot_minutes: int = 60, utc_offset: int = 0) -> 'Series':
+        """
+        Creates a series from arrays of increasing keys and their values.
+        """
+        series = Series(slot_minutes)
+        series.keys = keys
+        series.values = values
+        series.utc_offset = utc_offset
+
+        for value in values:
+            series.total += value
+        series._compute_extremes()
+
+        return series
+
+    @staticmethod
+    def from_points(points: list, current_time: PartialDate = None, slot_minutes: int = 60) -> 'Series':
+        """
+        Creates a series from an ordered list of tuples formatted as (time: PartialDate, value: float).
+        Points in the same slot are averaged.
+        """
+        series = Series(slot_minutes)
+        if current_time is not None:
+            series.set_current(current_time.minutes // slot_minutes)
+
+        aggregator = SlotAggregator(series)
+        for time, value in points:
+            aggregator.add(time.minutes // slot_minutes, value)
+        aggregator.close()
+
+        return series
+
+    def key(self, year: int, month: int, day: int, hour: int, minute: int = 0) -> int:
+        """
+        Returns the key of the slot containing a given time.
+        """
+        return ((days_from_civil(year, month, day) * 24 + hour) * 60 + minute) // self.slot_minutes
+
+    def key_at(self, utc_seconds: int) -> int:
+        """
+        Returns the key of the slot containing a time given in seconds since 1970-01-01 00:00 UTC.
+        """
+        return (utc_seconds // 60 + self.utc_offset) // self.slot_minutes
+
+    def utc_time(self, key: int) -> int:
+        """
+        Returns the start of the slot with a given key in seconds since 1970-01-01 00:00 UTC.
+        """
+        return (key * self.slot_minutes - self.utc_offset) * 60
+
+    def covers(self, first_key: int, last_key: int) -> bool:
+        """
+        Returns True if the series has points from first_key to last_key.
+        """
+        return len(self.keys) > 0 and self.keys[0] <= first_key and self.keys[-1] >= last_key
+
+    def hour(self, index: int) -> int:
+        """
+        Returns the hour of day at the start of the slot at a given index.
+        """
+        return (self.keys[index] * self.slot_minutes // 60) % 24
+
+    def append(self, key: int, value: float) -> None:
+        """
+        Adds a point after the last one. Keys must be increasing.
+        """
+        if len(self.keys) and key <= self.keys[-1]:
+            raise ValueError("Keys must be increasing")
+
+        self.keys.append(key)
+        self.values.append(value)
+
+        # Read back the stored value, so that the aggregates match the stored precision
+        value = self.values[-1]
+        self.total += value
+        if self.min_value is None or value < self.min_value:
+            self.min_value = value
+        if self.max_value is None or value > self.max_value:
+            self.max_value = value
+
+        if key == self.current_key:
+            self.current_index = len(self.keys) - 1
+
+    def merge(self, index: int, value: float) -> None:
+        """
+        Replaces the value of the point at a given index with the average of it and another value.
+        """
+        old_value = self.values[index]
+        self.values[index] = (old_value + value) / 2
+        self.total += self.values[index] - old_value
+        self._compute_extremes()
+
+    def slide(self, count: int) -> None:
+        """
+        Removes the count oldest points.
+        """
+        if count <= 0:
+            return
+
+        removed = self.values[:count]
+        self.keys = self.keys[count:]
+        self.values = self.values[count:]
+
+        recompute = False
+        for value in removed:
+            self.total -= value
+            if value == self.min_value or value == self.max_value:
+                recompute = True
+
+        if recompute:
+            self._compute_extremes()
+
+        if self.current_index is not None:
+            self.current_index -= count
+            if self.current_index < 0:
+                self.current_index = None
+
+    def set_current(self, key: int) -> None:
+        """
+        Sets the key of the current slot.
+        """
+        self.current_key = key
+        self.current_index = self.index_of(key)
+
+    def index_of(self, key: int):
+        """
+        Returns the index of the point with a given key, or None if there is no such point.
+        """
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return index
+        return None
+
+    @property
+    def average(self) -> float:
+        return self.total / len(self.values)
+
+    @property
+    def current_value(self) -> float:
+        return self.values[self.current_index]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _compute_extremes(self) -> None:
+        self.min_value = None
+        self.max_value = None
+        for value in self.values:
+            if self.min_value is None or value < self.min_value:
+                self.min_value = value
+            if self.max_value is None or value > self.max_value:
+                self.max_value = value
+
+
+class SlotAggregator:
+    """
+    Appends prices to a series as they are parsed, averaging the prices that fall in the same slot. Feeds with
+    quarter hour prices fill an hourly series without ever holding more than one slot of them.
+
+    Keys are local time, so the hour repeated when the clock goes back gives the keys of its slots twice. A slot
+    with a key the series already has is averaged into that point, as an hourly slot averages both passes of the
+    hour. A slot older than the last point that is not in the series is dropped.
+    """
+
+    def __init__(self, series: Series):
+        self._series = series
+        self._key = None
+        self._total = 0.0
+        self._count = 0
+
+    def add(self, key: int, value: float) -> None:
+        """
+        Adds a price to the slot with a given key.
+        """
+        if key != self._key:
+            self.close()
+            self._key = key
+        self._total += value
+        self._count += 1
+
+    def close(self) -> None:
+        """
+        Appends the average of the open slot.
+        """
+        if self._count:
+            series = self._series
+            if len(series) and self._key <= series.keys[-1]:
+                index = series.index_of(self._key)
+                if index is not None:
+                    series.merge(index, self._total / self._count)
+            else:
+                series.append(self._key, self._total / self._count)
+        self._total = 0.0
+        self._count = 0
+
+
+def bisect_left(keys, key: int, low: int = 0, high: int = None) -> int:
+    """
+    Returns the first index in sorted keys where keys[index] >= key.
+    """
+    if high is None:
+        high = len(keys)
+
+    while low < high:
+        middle = (low + high) // 2
+        if keys[middle] < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def bisect_right(keys, key: int, low: int = 0, high: int = None) -> int:
+    """
+    Returns the first index in sorted keys where keys[index] > key.
+    """
+    if high is None:
+        high = len(keys)
+
+    while low < high:
+        middle = (low + high) // 2
+        if key < keys[middle]:
+            high = middle
+        else:
+            low = middle + 1
+    return low
@@ -0,0 +1,144 @@
+import framebuf
+
+MAGIC = b"MCS1"
+
+
+class SpriteCache:
+    """
+    Small 1-bit frame buffers for the parts of the chart that look the same on every frame: text labels and
+    the dashed average line. A sprite is drawn in any gray by blitting it through a two entry palette whose
+    background entry is the blit key, so one call draws a whole label or dashed line.
+    """
+    CHAR_WIDTH = 8
+    CHAR_HEIGHT = 8
+
+    DASH_LENGTH = 4
+    HOUR_LABELS = 24
+
+    def __init__(self, width: int, path: str = None):
+        """
+        :param width: Width of the dashed line in pixels.
+        :param path: Optional file on flash holding the prebuilt sprites. Written if missing or outdated.
+        """
+        self._width = width
+        self._labels = {}
+        self._palettes = {}
+
+        self._hour_buffers = None
+        self._dash_buffer = None
+        if path is None or not self._load(path):
+            self._build()
+            if path is not None:
+                self._save(path)
+
+        for hour in range(self.HOUR_LABELS):
+            self._labels[_hour_text(hour)] = self._sprite(self._hour_buffers[hour], 2)
+
+        self._dash_row = framebuf.FrameBuffer(self._dash_buffer, width, 1, framebuf.MONO_HLSB)
+
+    def draw_label(self, image, text: str, x: int, y: int, color: int) -> None:
+        """
+        Draws a text with its top left corner at x, y. Texts not prebuilt are rendered on first use.
+        """
+        sprite = self._labels.get(text)
+        if sprite is None:
+            sprite = self._sprite(_render(text), len(text))
+            self._labels[text] = sprite
+
+        key, palette = self._palette(color)
+        image.blit(sprite, x, y, key, palette)
+
+    def draw_hour(self, image, hour: int, x: int, y: int, color: int) -> None:
+        """
+        Draws a two digit hour label with its top left corner at x, y.
+        """
+        self.draw_label(image, _hour_text(hour), x, y, color)
+
+    def draw_dashed_line(self, image, y: int, color: int) -> None:
+        """
+        Draws a dashed line across the full width at y.
+        """
+        key, palette = self._palette(color)
+        image.blit(self._dash_row, 0, y, key, palette)
+
+    def _sprite(self, buffer: bytearray, length: int):
+        return framebuf.FrameBuffer(buffer, length * self.CHAR_WIDTH, self.CHAR_HEIGHT, framebuf.MONO_HLSB)
+
+    def _build(self) -> None:
+        self._hour_buffers = [_render(_hour_text(hour)) for hour in range(self.HOUR_LABELS)]
+
+        self._dash_buffer = bytearray((self._width + 7) // 8)
+        for start_x in range(self.DASH_LENGTH // 2, self._width, self.DASH_LENGTH * 2):
+            for x in range(start_x, min(start_x + self.DASH_LENGTH, self._width)):
+                self._dash_buffer[x >> 3] |= 0x80 >> (x & 0x07)
+
+    def _load(self, path: str) -> bool:
+        label_size = 2 * self.CHAR_WIDTH * self.CHAR_HEIGHT // 8
+        dash_size = (self._width + 7) // 8
+
+        try:
+            with open(path, "rb") as file:
+                if file.read(len(MAGIC)) != MAGIC:
+                    return False
+
+                width = file.read(2)
+                if len(width) != 2 or (width[0] << 8 | width[1]) != self._width:
+                    return False
+
+                hour_buffers = []
+                for _ in range(self.HOUR_LABELS):
+                    buffer = bytearray(label_size)
+                    if file.readinto(buffer) != label_size:
+                        return False
+                    hour_buffers.append(buffer)
+
+                dash_buffer = bytearray(dash_size)
+                if file.readinto(dash_buffer) != dash_size:
+                    return False
+        except OSError:
+            return False
+
+        self._hour_buffers = hour_buffers
+        self._dash_buffer = dash_buffer
+        return True
+
+    def _save(self, path: str) -> None:
+        try:
+            with open(path, "wb") as file:
+                file.write(MAGIC)
+                file.write(bytes([self._width >> 8, self._width & 0xff]))
+                for buffer in self._hour_buffers:
+                    file.write(buffer)
+                file.write(self._dash_buffer)
+        except OSError:
+            # The sprites are rebuilt on the next start
+            pass
+
+    def _palette(self, color: int) -> tuple:
+        """
+        Returns the blit key and the palette drawing the set bits of a sprite in color.
+        """
+        color &= 0x03
+        entry = self._palettes.get(color)
+        if entry is None:
+            key = 3 if color == 0 else 0
+            palette = framebuf.FrameBuffer(bytearray(1), 2, 1, framebuf.GS2_HMSB)
+            palette.pixel(0, 0, key)
+            palette.pixel(1, 0, color)
+            entry = (key, palette)
+            self._palettes[color] = entry
+        return entry
+
+
+def _render(text: str) -> bytearray:
+    """
+    Returns the 1-bit bitmap of a text, one byte per 8 pixel character column per row.
+    """
+    width = len(text) * SpriteCache.CHAR_WIDTH
+    buffer = bytearray(width * SpriteCache.CHAR_HEIGHT // 8)
+    framebuf.FrameBuffer(buffer, width, SpriteCache.CHAR_HEIGHT, framebuf.MONO_HLSB).text(text, 0, 0, 1)
+    return buffer
+
+
+def _hour_text(hour: int) -> str:
+    return "%02d" % hour
@@ -0,0 +1,203 @@
+import gc
+import struct
+import utime
+
+# Phases of a wake
+BOOT = 0  # reset until main starts
+CONNECT = 1  # network connect
+FETCH = 2  # request and download, without parsing
+PARSE = 3  # feed parsing
+CHART = 4  # Chart.update
+PACK = 5  # plane packing
+SPI = 6  # plane transfer
+LUT = 7  # LUT upload
+BUSY = 8  # waiting for the display
+SLEEP = 9  # planned deepsleep
+
+PHASE_NAMES = ("boot", "connect", "fetch", "parse", "chart", "pack", "spi", "lut", "busy", "sleep")
+
+PATH = "telemetry.bin"
+MAGIC = b"MCT2"
+# magic, record size, capacity, index of the next record, cycle number
+HEADER_FORMAT = "<4sHHHH"
+# cycle number, phase, times entered, time in us, lowest free heap, highest allocated heap, smallest largest free
+# block at the end of the phase (0 if not sampled)
+RECORD_FORMAT = "<HBBIIII"
+CAPACITY = 1024
+
+_mem_free = getattr(gc, "mem_free", None)
+_mem_alloc = getattr(gc, "mem_alloc", None)
+
+# Totals of this wake per phase: [times entered, time in us, lowest free heap, highest allocated heap,
+# smallest largest free block]
+_totals = {}
+# Time spent in the phases nested in each open phase, and the ticks at which each open phase started
+_stack = []
+_starts = []
+
+
+class Phase:
+    """
+    Context manager and decorator adding the time spent in it to a phase of this wake. Time spent in nested
+    phases counts only for the nested phase.
+
+        with telemetry.Phase(telemetry.FETCH):
+            ...
+
+        @telemetry.Phase(telemetry.LUT)
+        def upload():
+            ...
+
+    A Phase keeps no state of its own, so one instance can be entered again and again, also nested in itself.
+    Hot paths bind one instance instead of creating one per call.
+    """
+
+    def __init__(self, phase_id: int):
+        self._phase_id = phase_id
+
+    def __enter__(self) -> None:
+        _stack.append(0)
+        _starts.append(utime.ticks_us())
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        elapsed = utime.ticks_diff(utime.ticks_us(), _starts.pop())
+        nested = _stack.pop()
+        if _stack:
+            _stack[-1] += elapsed
+        add(self._phase_id, elapsed - nested)
+
+    def __call__(self, func):
+        # The decorated function reuses this instance on every call
+        phase = self
+
+        def timed(*args, **kwargs):
+            with phase:
+                return func(*args, **kwargs)
+
+        return timed
+
+
+def add(phase_id: int, us: int) -> None:
+    """
+    Adds time to a phase of this wake and samples the heap.
+    """
+    free = _mem_free() if _mem_free is not None else 0
+    allocated = _mem_alloc() if _mem_alloc is not None else 0
+
+    total = _totals.get(phase_id)
+    if total is None:
+        _totals[phase_id] = [1, us, free, allocated, 0]
+        return
+
+    total[0] += 1
+    total[1] += us
+    if free < total[2]:
+        total[2] = free
+    if allocated > total[3]:
+        total[3] = allocated
+
+
+def heap(phase_id: int, largest_free: int) -> None:
+    """
+    Adds a sample of the largest free heap block to a phase of this wake.
+    """
+    total = _totals.get(phase_id)
+    if total is None:
+        add(phase_id, 0)
+        total = _totals[phase_id]
+        total[0] = 0
+    if total[4] == 0 or largest_free < total[4]:
+        total[4] = largest_free
+
+
+def save(path: str = PATH, capacity: int = CAPACITY) -> None:
+    """
+    Writes the totals of this wake to the ring buffer on flash, overwriting the oldest records when it is full,
+    and starts the totals of the next wake.
+    """
+    header_size = struct.calcsize(HEADER_FORMAT)
+    record_size = struct.calcsize(RECORD_FORMAT)
+
+    try:
+        file = open(path, "r+b")
+    except OSError:
+        file = open(path, "w+b")
+
+    with file:
+        header = file.read(header_size)
+        if len(header) == header_size:
+            magic, size, stored_capacity, index, cycle = struct.unpack(HEADER_FORMAT, header)
+        else:
+            magic = None
+
+        if magic != MAGIC or size != record_size or stored_capacity != capacity:
+            index = 0
+            cycle = 0
+            file.seek(header_size)
+            file.write(bytearray(record_size * capacity))
+
+        cycle = (cycle + 1) & 0xffff
+        for phase_id in sorted(_totals):
+            count, us, free, allocated, largest = _totals[phase_id]
+            file.seek(header_size + index * record_size)
+            file.write(struct.pack(RECORD_FORMAT, cycle, phase_id, min(count, 255), min(us, 0xffffffff), free,
+                                   allocated, largest))
+            index = (index + 1) % capacity
+
+        file.seek(0)
+        file.write(struct.pack(HEADER_FORMAT, MAGIC, record_size, capacity, index, cycle))
+
+    _totals.clear()
+
+
+def last_cycle(path: str = PATH) -> dict:
+    """
+    Returns the time in us of each phase of the last saved wake, keyed by phase.
+    """
+    header_size = struct.calcsize(HEADER_FORMAT)
+    record_size = struct.calcsize(RECORD_FORMAT)
+    times = {}
+
+    try:
+        with open(path, "rb") as file:
+            magic, size, capacity, index, cycle = struct.unpack(HEADER_FORMAT, file.read(header_size))
+            if magic != MAGIC or size != record_size:
+                return times
+
+            # The records of a wake are written in order of phase, so read backwards until another cycle
+            for _ in range(len(PHASE_NAMES)):
+                index = (index - 1) % capacity
+                file.seek(header_size + index * record_size)
+                record_cycle, phase_id, count, us, free, allocated, largest = struct.unpack(
+                    RECORD_FORMAT, file.read(record_size))
+                if record_cycle != cycle or phase_id in times:
+                    break
+                times[phase_id] = us
+    except (OSError, ValueError):
+        pass
+
+    return times
+
+
+def draw_footer(image, x: int, y: int, color: int, background: int, path: str = PATH) -> None:
+    """
+    Draws a line of stats of the last saved wake: time awake, on the network and waiting for the display in
+    seconds, and the lowest free heap of this wake in kB.
+    :param x: Right edge of the text.
+    :param y: Top of the text.
+    """
+    times = last_cycle(path)
+    if not times:
+        return
+
+    awake = 0
+    for phase_id, us in times.items():
+        if phase_id != SLEEP:
+            awake += us
+
+    network = times.get(CONNECT, 0) + times.get(FETCH, 0)
+    free = min(total[2] for total in _totals.values()) if _totals else 0
+    text = "wake %.1fs net %.1fs busy %.1fs %dk" % (awake / 1e6, network / 1e6, times.get(BUSY, 0) / 1e6, free // 1024)
+    width = 8 * len(text)
+    image.rect(x - width - 1, y - 1, width + 1, 10, background, True)
+    image.text(text, x - width, y, color)
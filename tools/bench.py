@@ -0,0 +1,106 @@
+"""
+Runs the pipeline benchmark on the host with the emulated display.
+
+    python tools/bench.py                       # compare with the stored baseline
+    python tools/bench.py --update-baseline     # store the results as the new baseline
+    python tools/bench.py --payload recorded.json
+    python tools/bench.py --budgets-only        # only check the allocation budgets
+
+Times include the I/O time modelled by the emulator (SPI transfers, sleeps and BUSY waits).
+Heap figures come from tracemalloc. A stage that allocates more than its budget fails the run, with or without a
+baseline. The exit status is 1 if a stage is over its budget or has regressed, so that the run can gate a commit.
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+import emulator
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "bench_baseline.json")
+
+# Allocation budgets of benchmark.ALLOCATION_BUDGETS on CPython, where objects are larger and the first run of a
+# stage also allocates the code objects and caches of the interpreter
+HOST_ALLOCATION_BUDGETS = {
+    "Chart.update": 8192,
+    "Display.pack_planes": 1024,
+    "Display._lut": 2048,
+    "Display.redraw": 2048,
+    # Includes starting the thread that packs the planes
+    "Display.redraw_dual_core": 6144,
+}
+
+
+class TracemallocProbe:
+    """
+    Measures heap use on CPython.
+    """
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def stop(self) -> tuple:
+        current, peak = tracemalloc.get_traced_memory()
+        return peak - self._start, current - self._start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--payload", action="append", default=[], help="recorded API payload, may be repeated")
+    parser.add_argument("--sizes", default="24,48,96,192", help="sizes of the synthetic datasets")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--budgets-only", action="store_true",
+                        help="only check the allocation budgets, which do not depend on the computer")
+    args = parser.parse_args()
+
+    board = emulator.install()
+
+    import benchmark
+    from display import Display
+
+    recorded = {}
+    for path in args.payload:
+        with open(path, "rb") as file:
+            recorded[os.path.basename(path)] = file.read()
+
+    sizes = tuple(int(size) for size in args.sizes.split(","))
+    display = Display()
+    results = benchmark.run_datasets(display, sizes, recorded, TracemallocProbe(), lambda: board.clock.now_us)
+
+    bench = benchmark.Benchmark()
+    bench.results = results
+    print(bench.report())
+
+    violations = bench.check_budgets(HOST_ALLOCATION_BUDGETS)
+    for violation in violations:
+        print("OVER BUDGET", violation)
+
+    if args.budgets_only:
+        return 1 if violations else 0
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=1, sort_keys=True)
+        print("Baseline written to", args.baseline)
+        return 1 if violations else 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline at", args.baseline, "- run with --update-baseline to create one")
+        return 1 if violations else 0
+
+    with open(args.baseline) as file:
+        regressions = bench.compare(json.load(file))
+
+    for regression in regressions:
+        print("REGRESSION", regression)
+
+    return 1 if regressions or violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
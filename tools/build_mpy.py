@@ -0,0 +1,67 @@
+"""
+Precompiles the firmware modules to .mpy files with mpy-cross, so that the device does not compile them on
+every wake.
+
+    python tools/build_mpy.py                    # writes ./build
+    python tools/build_mpy.py --mpy-cross ~/micropython/mpy-cross/build/mpy-cross
+
+main.py stays source, since MicroPython only runs main.py at boot, and secrets.py is copied as it is.
+mpy-cross must match the MicroPython version on the device, install it with `pip install mpy-cross==<version>`.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+SRC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+BUILD_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "build"))
+
+# Copied as source
+SOURCE_MODULES = ("main.py", "secrets.py")
+
+# The Pico W has a Cortex-M0+, the viper and native kernels need the architecture to be compiled ahead of time
+ARCHITECTURE = "armv6m"
+
+
+def build(mpy_cross: str, out: str, optimize: int) -> list:
+    """
+    Compiles every module in ./src to out and returns the paths of the files written.
+    """
+    os.makedirs(out, exist_ok=True)
+
+    written = []
+    for name in sorted(os.listdir(SRC_PATH)):
+        if not name.endswith(".py"):
+            continue
+
+        source = os.path.join(SRC_PATH, name)
+        if name in SOURCE_MODULES:
+            target = os.path.join(out, name)
+            shutil.copyfile(source, target)
+        else:
+            target = os.path.join(out, name[:-3] + ".mpy")
+            subprocess.run([mpy_cross, "-march=" + ARCHITECTURE, "-O%d" % optimize, "-o", target, source],
+                           check=True)
+        written.append(target)
+
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mpy-cross", default="mpy-cross", help="mpy-cross executable")
+    parser.add_argument("--out", default=BUILD_PATH, help="output directory")
+    parser.add_argument("-O", dest="optimize", type=int, default=1,
+                        help="optimisation level, 1 or more removes asserts and __debug__ code")
+    args = parser.parse_args()
+
+    if shutil.which(args.mpy_cross) is None:
+        sys.exit("%s not found, install it with `pip install mpy-cross`" % args.mpy_cross)
+
+    for path in build(args.mpy_cross, args.out, args.optimize):
+        print(os.path.relpath(path))
+
+
+if __name__ == "__main__":
+    main()
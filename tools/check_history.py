@@ -0,0 +1,56 @@
+"""
+Checks that a wake appends the fetched prices to history.bin only when HISTORY_DAYS is set in secrets.py. Runs the
+update of a wake against tools/fake_api.py in a temporary directory. Exits non-zero if the history file is written
+without HISTORY_DAYS or missing with it.
+
+    python tools/check_history.py
+"""
+import os
+import sys
+import tempfile
+
+import emulator
+import fake_api
+
+
+def check(name: str, history_days: int, expected: bool) -> bool:
+    import history
+    import main
+    import secrets
+    import uasyncio
+    from display import Display
+
+    secrets.HISTORY_DAYS = history_days
+    display = Display(planar=True, init=False)
+    display.image.fill(display.WHITE)
+    uasyncio.run(main.update(display))
+
+    written = os.path.exists(history.PATH)
+    if written != expected:
+        print("FAIL %s: %s is %s" % (name, history.PATH, "written" if written else "missing"))
+        return False
+
+    print("ok   %s" % name)
+    return True
+
+
+def main() -> int:
+    emulator.install()
+    server = fake_api.start(0)
+
+    import secrets
+    secrets.API_URL = "http://127.0.0.1:%d/prices" % server.server_address[1]
+
+    results = []
+    try:
+        for name, history_days, expected in (("no HISTORY_DAYS", 0, False), ("HISTORY_DAYS = 7", 7, True)):
+            with tempfile.TemporaryDirectory() as directory:
+                os.chdir(directory)
+                results.append(check(name, history_days, expected))
+    finally:
+        server.shutdown()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
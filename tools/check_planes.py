@@ -0,0 +1,84 @@
+"""
+Checks that planes.pack is bit-identical to the per-pixel encoding of the original send_bytes, for every GS2 byte
+pair and for mixed rows of all four gray levels. Exits non-zero on the first mismatch.
+
+    python tools/check_planes.py
+"""
+import random
+import sys
+
+import emulator
+
+WIDTH = 400
+HEIGHT = 300
+
+
+def reference_plane(buffer, temp: bool) -> bytearray:
+    """
+    The encoding of send_bytes before planes.pack, one output byte per two GS2 bytes.
+    :param temp: True for the old plane (0x10), False for the new plane (0x13).
+    """
+    plane = bytearray(len(buffer) // 2)
+    for i in range(len(plane)):
+        output_byte = 0
+        for j in range(2):
+            pixel_value = buffer[i * 2 + j]
+            for k in range(4):
+                pixel_bits = pixel_value & 0x03
+                if pixel_bits == 0x03:
+                    output_byte |= 0x01  # white
+                elif pixel_bits == 0x02:
+                    output_byte |= 0x00 if temp else 0x01  # gray1
+                elif pixel_bits == 0x01:
+                    output_byte |= 0x01 if temp else 0x00  # gray2
+                if j != 1 or k != 3:
+                    output_byte <<= 1
+                pixel_value >>= 2
+        plane[i] = output_byte
+    return plane
+
+
+def check(name: str, buffer) -> bool:
+    import planes
+
+    old = bytearray(len(buffer) // 2)
+    new = bytearray(len(buffer) // 2)
+    planes.pack(buffer, old, new)
+
+    for label, plane, temp in (("old", old, True), ("new", new, False)):
+        expected = reference_plane(buffer, temp)
+        if plane != expected:
+            index = next(i for i in range(len(plane)) if plane[i] != expected[i])
+            print("FAIL %s: %s plane byte %d is 0x%02x, expected 0x%02x (source 0x%02x 0x%02x)" % (
+                name, label, index, plane[index], expected[index], buffer[index * 2], buffer[index * 2 + 1]))
+            return False
+
+    print("ok   %s" % name)
+    return True
+
+
+def main() -> int:
+    emulator.install()
+
+    # Every pair of GS2 bytes, so every combination of eight pixels at every position
+    pairs = bytearray(2 * 65536)
+    for value in range(65536):
+        pairs[2 * value] = value >> 8
+        pairs[2 * value + 1] = value & 0xff
+
+    # Rows of a single gray level each, then rows mixing all levels in random order
+    row_bytes = WIDTH // 4
+    levels = (0x00, 0x55, 0xaa, 0xff)
+    uniform = bytearray(row_bytes * len(levels))
+    for index, level in enumerate(levels):
+        uniform[index * row_bytes:(index + 1) * row_bytes] = bytes([level]) * row_bytes
+
+    rng = random.Random(1)
+    mixed = bytearray(rng.getrandbits(8) for _ in range(row_bytes * HEIGHT))
+
+    results = [check("all byte pairs", pairs), check("uniform rows", uniform), check("mixed rows", mixed)]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Checks that get_data parses a feed across the end of daylight saving time, where the clock goes back from
++02:00 to +01:00 and the hour from 02:00 to 03:00 comes twice, for slots of 60 and 15 minutes. Exits non-zero if
+the keys are not increasing or a slot is not the average of its prices over both passes of the hour.
+
+    python tools/check_slots.py
+"""
+import datetime
+import json
+import sys
+
+import emulator
+
+# The clock goes back at 01:00 UTC, the quarter hour prices run from 00:00 to 06:00 local time
+CHANGE = datetime.datetime(2026, 10, 25, 1, 0, tzinfo=datetime.timezone.utc)
+START = datetime.datetime(2026, 10, 24, 22, 0, tzinfo=datetime.timezone.utc)
+POINTS = 28
+
+
+def make_payload() -> tuple:
+    """
+    Returns the response body and the prices of every local slot start in minutes, both passes of the repeated
+    hour in one list.
+    """
+    intervals = []
+    prices = {}
+    for index in range(POINTS):
+        utc = START + datetime.timedelta(minutes=15 * index)
+        hours = 2 if utc < CHANGE else 1
+        local = utc.astimezone(datetime.timezone(datetime.timedelta(hours=hours)))
+        price = float(10 + index)
+
+        intervals.append({
+            "startDateTime": local.isoformat(timespec="milliseconds"),
+            "endDateTime": (local + datetime.timedelta(minutes=15)).isoformat(timespec="milliseconds"),
+            "price": price,
+        })
+        prices.setdefault(local.hour * 60 + local.minute, []).append(price)
+
+    payload = {"current": intervals[POINTS // 2], "intervals": intervals}
+    return json.dumps(payload).encode(), prices
+
+
+def check(slot_minutes: int) -> bool:
+    import main
+    import secrets
+    from benchmark import PayloadHandler
+
+    name = "%d minute slots" % slot_minutes
+    body, prices = make_payload()
+    secrets.SLOT_MINUTES = slot_minutes
+    try:
+        series = main.get_data(PayloadHandler(body))
+    except ValueError as e:
+        print("FAIL %s: %s" % (name, e))
+        return False
+
+    keys = list(series.keys)
+    if any(second <= first for first, second in zip(keys, keys[1:])):
+        print("FAIL %s: keys are not increasing: %s" % (name, keys))
+        return False
+
+    # Both passes of the repeated hour have the same number of prices in a slot, so the averages are equal weight
+    expected = {}
+    for minute, slot_prices in prices.items():
+        slot = expected.setdefault(minute - minute % slot_minutes, [[], []])
+        for index, price in enumerate(slot_prices):
+            slot[index].append(price)
+
+    if len(keys) != len(expected):
+        print("FAIL %s: %d slots, expected %d" % (name, len(keys), len(expected)))
+        return False
+
+    for key, value in zip(keys, series.values):
+        passes = [sum(slot) / len(slot) for slot in expected[key * slot_minutes % (24 * 60)] if slot]
+        average = sum(passes) / len(passes)
+        if abs(value - average) > 1e-3:
+            print("FAIL %s: slot %02d:%02d is %.3f, expected %.3f" % (
+                name, key * slot_minutes // 60 % 24, key * slot_minutes % 60, value, average))
+            return False
+
+    if abs(series.total - sum(series.values)) > 1e-3 or series.max_value != max(series.values):
+        print("FAIL %s: total or maximum not updated" % name)
+        return False
+
+    print("ok   %s" % name)
+    return True
+
+
+def main() -> int:
+    emulator.install()
+    results = [check(60), check(15)]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Renders a chart with the emulated display and reports what a wake would cost on the device.
+
+    python tools/emulate.py --points 96 --out panel.png
+"""
+import argparse
+import json
+import time
+
+import emulator
+import synthetic
+
+
+def _print_stage(name: str, board, host_cpu_us: float) -> None:
+    estimate = emulator.estimate_us(board, host_cpu_us)
+    print("%-14s %8d transactions %8d bytes  cpu %7.1f ms  core1 %7.1f ms  bus %8.1f ms  busy %8.1f ms  "
+          "sleep %7.1f ms  total %8.1f ms" % (
+              name, board.transactions, board.bytes_sent, estimate["cpu"] / 1000, estimate["core1"] / 1000,
+              estimate["bus"] / 1000, estimate["busy"] / 1000, estimate["sleep"] / 1000, estimate["total"] / 1000))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=48, help="number of synthetic price intervals")
+    parser.add_argument("--resolution", type=int, default=60, help="minutes per synthetic interval")
+    parser.add_argument("--slot-minutes", type=int, help="SLOT_MINUTES of secrets.py, the prices are averaged per slot")
+    parser.add_argument("--payload", help="recorded API payload to render instead of synthetic data")
+    parser.add_argument("--out", default="panel.png", help="decoded panel image, .png or .pgm")
+    parser.add_argument("--baudrate", type=int, help="SPI clock to model instead of the driver setting")
+    parser.add_argument("--refresh-ms", type=int, default=4200, help="BUSY time of a full refresh")
+    parser.add_argument("--planar", action="store_true", help="draw straight into the display planes")
+    parser.add_argument("--dual-core", action="store_true", help="pack the planes on core 1 while sending them")
+    parser.add_argument("--cpu-scale", type=float, default=0.0,
+                        help="factor from host CPU time to device CPU time, 0 leaves CPU time out")
+    args = parser.parse_args()
+
+    timing = emulator.Timing(baudrate=args.baudrate, refresh_ms=args.refresh_ms, cpu_scale=args.cpu_scale)
+    board = emulator.install(timing)
+
+    if args.slot_minutes:
+        import secrets
+        secrets.SLOT_MINUTES = args.slot_minutes
+
+    import main as firmware
+    from benchmark import PayloadHandler
+    from chart import Chart
+    from display import Display
+
+    if args.payload:
+        payload = synthetic.load_payload(args.payload)
+    else:
+        payload = synthetic.make_payload(args.points, args.resolution)
+
+    board.reset_stats()
+    start = time.process_time()
+    display = Display(args.planar)
+    display.image.fill(display.WHITE)
+    _print_stage("init", board, (time.process_time() - start) * 1e6)
+
+    board.reset_stats()
+    start = time.process_time()
+    data = firmware.get_data(PayloadHandler(json.dumps(payload).encode()))
+    Chart(display).update(data)
+    _print_stage("Chart.update", board, (time.process_time() - start) * 1e6)
+
+    board.reset_stats()
+    start = time.process_time()
+    display.redraw(args.dual_core)
+    _print_stage("redraw", board, (time.process_time() - start) * 1e6)
+
+    with open(args.out, "wb") as file:
+        file.write(board.panel.to_pgm() if args.out.endswith(".pgm") else board.panel.to_png())
+
+    print("wake time %.1f ms, panel image written to %s" % (board.clock.now_us / 1000, args.out))
+
+
+if __name__ == "__main__":
+    main()
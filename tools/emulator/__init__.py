@@ -0,0 +1,73 @@
+"""
+Headless emulator for running the microchart firmware on a host with CPython.
+
+install() registers pure Python versions of the MicroPython modules used by the firmware
+(framebuf, machine, utime, uasyncio, network, urequests, ntptime, _thread) and puts ./src on the import path:
+
+    import emulator
+    board = emulator.install()
+
+    from display import Display
+    display = Display()
+    display.redraw()
+    open("panel.png", "wb").write(board.panel.to_png())
+"""
+import os
+import sys
+import types
+
+from emulator.board import Board, Timing
+
+SRC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+_MODULES = ("framebuf", "machine", "utime", "uasyncio", "network", "urequests", "ntptime", "_thread")
+
+
+def install(timing: Timing = None) -> Board:
+    """
+    Registers the emulated modules and returns a new board that they use.
+    :param timing: Timing model of the board, the defaults of Timing if None.
+    """
+    # The standard library keeps the _thread of CPython once threading is loaded
+    import threading  # noqa: F401
+    from emulator import _thread, framebuf, machine, network, ntptime, uasyncio, urequests, utime
+
+    machine.board = Board(timing)
+
+    for name in _MODULES:
+        sys.modules[name] = sys.modules["emulator." + name]
+
+    if SRC_PATH not in sys.path:
+        sys.path.insert(0, SRC_PATH)
+
+    if not os.path.exists(os.path.join(SRC_PATH, "secrets.py")):
+        secrets = types.ModuleType("secrets")
+        secrets.API_URL = "http://127.0.0.1:8000/prices"
+        secrets.SSID = "emulator"
+        secrets.PASSWORD = ""
+        sys.modules["secrets"] = secrets
+    elif "secrets" in sys.modules and not hasattr(sys.modules["secrets"], "API_URL"):
+        # The standard library module of the same name is already loaded
+        del sys.modules["secrets"]
+
+    return machine.board
+
+
+def estimate_us(board: Board, host_cpu_us: float) -> dict:
+    """
+    Returns the estimated time on the device, split into CPU of core 0 and core 1, bus, sleep and BUSY wait.
+    Core 1 runs alongside core 0, the total counts it only where it takes longer than everything on core 0.
+    :param host_cpu_us: CPU time measured on the host for the same work, of all threads.
+    """
+    clock = board.clock
+    cpu_us = (host_cpu_us - clock.core1_cpu_us) * board.timing.cpu_scale
+    core1_us = clock.core1_cpu_us * board.timing.cpu_scale
+    core0_us = cpu_us + clock.bus_us + clock.sleep_us + clock.busy_wait_us
+    return {
+        "cpu": cpu_us,
+        "core1": core1_us,
+        "bus": clock.bus_us,
+        "sleep": clock.sleep_us,
+        "busy": clock.busy_wait_us,
+        "total": max(core0_us, core1_us),
+    }
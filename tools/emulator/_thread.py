@@ -0,0 +1,33 @@
+"""
+_thread of the rp2 port on CPython threads. The rp2 port runs one extra thread, on core 1. The CPU time of that
+thread is added to Clock.core1_cpu_us, so that estimate_us can overlap it with the work of core 0.
+"""
+import _thread as _host_thread
+import time
+
+from emulator import machine
+
+_running = False
+
+
+def start_new_thread(function, args: tuple, kwargs: dict = None) -> int:
+    global _running
+    if _running:
+        raise OSError("core1 in use")
+    _running = True
+
+    def run() -> None:
+        global _running
+        start = time.thread_time()
+        try:
+            function(*args, **(kwargs or {}))
+        finally:
+            machine.board.clock.core1_cpu_us += (time.thread_time() - start) * 1e6
+            _running = False
+
+    return _host_thread.start_new_thread(run, ())
+
+
+def __getattr__(name: str):
+    # allocate_lock, get_ident and the rest are the ones of CPython, the standard library imports them from here
+    return getattr(_host_thread, name)
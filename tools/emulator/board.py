@@ -0,0 +1,327 @@
+"""
+Model of the Pico W board with the e-paper display attached.
+Keeps a virtual clock, decodes the SPI command stream sent to the display back into an image and
+accounts for the time spent on the bus, sleeping and waiting for the display.
+"""
+import struct
+import zlib
+
+
+class Timing:
+    """
+    Timing model used to estimate how long a wake takes on the device.
+    """
+
+    def __init__(self, baudrate: int = None, transaction_overhead_us: int = 60, power_on_ms: int = 80,
+                 refresh_ms: int = 4200, partial_refresh_ms: int = 4200, cpu_scale: float = 0.0):
+        """
+        :param baudrate: SPI clock, or None to use the baudrate the driver configures.
+        :param transaction_overhead_us: Time to toggle DC and CS around a transaction.
+        :param power_on_ms: BUSY time after power on (0x04).
+        :param refresh_ms: BUSY time of a full refresh (0x12) with the 4 gray LUTs of the driver. Refreshes with other
+            LUTs take time in proportion to the frames of their VCOM LUT.
+        :param partial_refresh_ms: BUSY time of a refresh in partial mode with the 4 gray LUTs.
+        :param cpu_scale: Factor from host CPU time to device CPU time, 0 to leave CPU time out.
+        """
+        self.baudrate = baudrate
+        self.transaction_overhead_us = transaction_overhead_us
+        self.power_on_ms = power_on_ms
+        self.refresh_ms = refresh_ms
+        self.partial_refresh_ms = partial_refresh_ms
+        self.cpu_scale = cpu_scale
+
+
+class Clock:
+    """
+    Virtual clock advanced by modelled I/O and sleeps instead of real time.
+    """
+
+    def __init__(self):
+        self.now_us = 0
+        self.bus_us = 0
+        self.sleep_us = 0
+        self.busy_wait_us = 0
+        # Host CPU time of the thread on core 1, which runs alongside the virtual clock of core 0
+        self.core1_cpu_us = 0
+
+    def advance(self, us: int) -> None:
+        self.now_us += int(us)
+
+
+class Panel:
+    """
+    Decodes the commands sent to the display controller.
+    """
+    WIDTH = 400
+    HEIGHT = 300
+
+    # Frames of the 4 gray VCOM LUT of the driver, the waveform that takes Timing.refresh_ms
+    REFERENCE_LUT_FRAMES = 100
+
+    def __init__(self, timing: Timing, clock: Clock):
+        self._timing = timing
+        self._clock = clock
+
+        plane_size = self.WIDTH * self.HEIGHT // 8
+        self.old_plane = bytearray(plane_size)
+        self.new_plane = bytearray(plane_size)
+        # Gray level (0 black - 3 white) of every pixel currently shown
+        self.image = bytearray([3]) * (self.WIDTH * self.HEIGHT)
+
+        self.luts = {}
+        self.registers = {}
+        self.refreshes = 0
+        self.partial_refreshes = 0
+        self.asleep = False
+
+        self._command = None
+        self._data = bytearray()
+        # Bytes of plane data received since the plane command
+        self._plane_offset = 0
+        self._partial = False
+        self._window = (0, 0, self.WIDTH, self.HEIGHT)
+        self._busy_until_us = 0
+
+    def is_busy(self) -> bool:
+        return self._clock.now_us < self._busy_until_us
+
+    def busy_remaining_us(self) -> int:
+        return max(0, self._busy_until_us - self._clock.now_us)
+
+    def reset(self) -> None:
+        self.asleep = False
+        self._partial = False
+        self._command = None
+
+    def write(self, data, is_data: bool) -> None:
+        if not is_data:
+            for command in bytes(data):
+                self._finish_command()
+                self._start_command(command)
+            return
+
+        # Plane data is decoded as it arrives instead of being collected, like the controller does
+        if self._command == 0x10:
+            self._write_plane(self.old_plane, data)
+        elif self._command == 0x13:
+            self._write_plane(self.new_plane, data)
+        else:
+            self._data += data
+
+    def end_transaction(self) -> None:
+        self._finish_command()
+
+    def _start_command(self, command: int) -> None:
+        self._command = command
+        self._data = bytearray()
+        self._plane_offset = 0
+
+        if command == 0x04:  # power on
+            self._set_busy(self._timing.power_on_ms)
+        elif command == 0x12:  # refresh
+            self._refresh()
+        elif command == 0x91:
+            self._partial = True
+        elif command == 0x92:
+            self._partial = False
+            self._window = (0, 0, self.WIDTH, self.HEIGHT)
+
+    def _finish_command(self) -> None:
+        command = self._command
+        data = bytes(self._data)
+        self._command = None
+        self._data = bytearray()
+
+        if command is None:
+            return
+
+        if 0x20 <= command <= 0x25:
+            self.luts[command] = data
+        elif command == 0x90 and len(data) >= 8:
+            x = (data[0] << 8) | data[1]
+            x_end = (data[2] << 8) | data[3]
+            y = (data[4] << 8) | data[5]
+            y_end = (data[6] << 8) | data[7]
+            self._window = (x & ~7, y, (x_end | 7) - (x & ~7) + 1, y_end - y + 1)
+        elif command == 0x07 and data[:1] == b"\xa5":
+            self.asleep = True
+        elif data:
+            self.registers[command] = data
+
+    def _write_plane(self, plane: bytearray, data) -> None:
+        row_bytes = self.WIDTH // 8
+        x, y, width, height = self._window if self._partial else (0, 0, self.WIDTH, self.HEIGHT)
+        width_bytes = width // 8
+
+        position = 0
+        while position < len(data):
+            row, column = divmod(self._plane_offset, width_bytes)
+            if row >= height:
+                break
+
+            count = min(width_bytes - column, len(data) - position)
+            start = (y + row) * row_bytes + x // 8 + column
+            plane[start:start + count] = data[position:position + count]
+            position += count
+            self._plane_offset += count
+
+    def _refresh(self) -> None:
+        x, y, width, height = self._window if self._partial else (0, 0, self.WIDTH, self.HEIGHT)
+        row_bytes = self.WIDTH // 8
+
+        for row in range(y, y + height):
+            for column in range(x, x + width):
+                index = row * row_bytes + (column >> 3)
+                bit = 7 - (column & 0x07)
+                old = (self.old_plane[index] >> bit) & 0x01
+                new = (self.new_plane[index] >> bit) & 0x01
+                self.image[row * self.WIDTH + column] = _gray_level((new << 1) | old)
+
+        if self._partial:
+            self.partial_refreshes += 1
+            self._set_busy(self._waveform_ms(self._timing.partial_refresh_ms))
+        else:
+            self.refreshes += 1
+            self._set_busy(self._waveform_ms(self._timing.refresh_ms))
+
+    def _waveform_ms(self, reference_ms: int) -> int:
+        """
+        Returns the time of a refresh with the uploaded VCOM LUT, scaled from the time of the 4 gray waveform.
+        """
+        lut = self.luts.get(0x20)
+        if not lut:
+            return reference_ms
+
+        # Every 6 byte group is a level byte, four phase lengths in frames and a repeat count
+        frames = 0
+        for start in range(0, len(lut) - 5, 6):
+            frames += sum(lut[start + 1:start + 5]) * lut[start + 5]
+        return reference_ms * frames // self.REFERENCE_LUT_FRAMES
+
+    def _set_busy(self, ms: int) -> None:
+        self._busy_until_us = self._clock.now_us + ms * 1000
+
+    def to_pgm(self) -> bytes:
+        """
+        Returns the shown image as a binary PGM file.
+        """
+        header = b"P5 %d %d 255\n" % (self.WIDTH, self.HEIGHT)
+        return header + bytes(level * 85 for level in self.image)
+
+    def to_png(self) -> bytes:
+        """
+        Returns the shown image as a grayscale PNG file.
+        """
+        raw = bytearray()
+        for row in range(self.HEIGHT):
+            raw.append(0)
+            raw += bytes(level * 85 for level in self.image[row * self.WIDTH:(row + 1) * self.WIDTH])
+
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        header = struct.pack(">IIBBBBB", self.WIDTH, self.HEIGHT, 8, 0, 0, 0, 0)
+        return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(bytes(raw))) + \
+            chunk(b"IEND", b"")
+
+
+def _gray_level(value: int) -> int:
+    """
+    Returns the gray level (0 black - 3 white) shown for a GS2 pixel value.
+    """
+    if value == 1:
+        return 2  # light gray
+    if value == 2:
+        return 1  # dark gray
+    return value
+
+
+class Board:
+    """
+    Pins, SPI bus and display of the emulated device.
+    """
+    DC_PIN = 8
+    CS_PIN = 6
+    BUSY_PIN = 21
+    RST_PIN = 13
+
+    IRQ_RISING = 8
+
+    def __init__(self, timing: Timing = None):
+        self.timing = timing if timing is not None else Timing()
+        self.clock = Clock()
+        self.panel = Panel(self.timing, self.clock)
+        self.pins = {}
+
+        self.transactions = 0
+        self.bytes_sent = 0
+        self.deep_sleep_ms = None
+
+        self._baudrate = 1_000_000
+        self._selected = False
+
+    def set_baudrate(self, baudrate: int) -> None:
+        self._baudrate = baudrate
+
+    def pin_value(self, pin_id: int, default: int) -> int:
+        if pin_id == self.BUSY_PIN:
+            return 0 if self.panel.is_busy() else 1
+        return default
+
+    def pin_changed(self, pin_id: int, value: int) -> None:
+        if pin_id == self.CS_PIN:
+            if value == 0 and not self._selected:
+                self._selected = True
+                self.transactions += 1
+                self._spend_bus(self.timing.transaction_overhead_us)
+            elif value == 1 and self._selected:
+                self._selected = False
+                self.panel.end_transaction()
+        elif pin_id == self.RST_PIN and value == 0:
+            self.panel.reset()
+
+    def spi_write(self, data) -> None:
+        count = len(data)
+        self.bytes_sent += count
+
+        baudrate = self.timing.baudrate or self._baudrate
+        self._spend_bus(count * 8 * 1_000_000 / baudrate)
+
+        dc = self.pins.get(self.DC_PIN)
+        self.panel.write(data, dc is not None and dc.value() == 1)
+
+    def sleep_us(self, us: int) -> None:
+        edge_us = self.next_irq_us()
+
+        busy = min(us, self.panel.busy_remaining_us())
+        self.clock.busy_wait_us += busy
+        self.clock.sleep_us += us - busy
+        self.clock.advance(us)
+
+        if edge_us is not None and edge_us <= self.clock.now_us:
+            pin = self.pins[self.BUSY_PIN]
+            pin.irq_handler(pin)
+
+    def next_irq_us(self):
+        """
+        Returns the time of the next edge that fires a pin interrupt, or None if there is none. BUSY rises
+        when the display finishes.
+        """
+        pin = self.pins.get(self.BUSY_PIN)
+        if pin is None or pin.irq_handler is None or not pin.irq_trigger & self.IRQ_RISING:
+            return None
+        if not self.panel.is_busy():
+            return None
+        return self.clock.now_us + self.panel.busy_remaining_us()
+
+    def _spend_bus(self, us: float) -> None:
+        self.clock.bus_us += us
+        self.clock.advance(us)
+
+    def reset_stats(self) -> None:
+        self.transactions = 0
+        self.bytes_sent = 0
+        self.clock.bus_us = 0
+        self.clock.sleep_us = 0
+        self.clock.busy_wait_us = 0
+        self.clock.core1_cpu_us = 0
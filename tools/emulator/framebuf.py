@@ -0,0 +1,207 @@
+"""
+Pure Python implementation of the parts of the MicroPython framebuf module used by microchart.
+Supports the GS2_HMSB and MONO_HLSB formats.
+"""
+from emulator.font import FONT, FIRST_CHAR, LAST_CHAR
+
+MONO_VLSB = 0
+MVLSB = MONO_VLSB
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width: int, height: int, format: int, stride: int = None):
+        if stride is None:
+            stride = width
+
+        if format == GS2_HMSB:
+            stride = (stride + 3) & ~3
+            size = stride * height // 4
+        elif format == MONO_HLSB:
+            stride = (stride + 7) & ~7
+            size = stride * height // 8
+        else:
+            raise ValueError("invalid format")
+
+        if len(buffer) < size:
+            raise ValueError("buffer too small")
+
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = stride
+
+    def fill(self, c: int) -> None:
+        if self.format == GS2_HMSB:
+            value = (c & 0x03) * 0x55
+        else:
+            value = 0xff if c & 0x01 else 0x00
+
+        buffer = self.buffer
+        buffer[:] = bytes([value]) * len(buffer)
+
+    def pixel(self, x: int, y: int, c: int = None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+
+        if c is None:
+            return self._get(x, y)
+
+        self._set(x, y, c)
+
+    def hline(self, x: int, y: int, w: int, c: int) -> None:
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x: int, y: int, h: int, c: int) -> None:
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x: int, y: int, w: int, h: int, c: int, f: bool = False) -> None:
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+
+        self.fill_rect(x, y, w, 1, c)
+        self.fill_rect(x, y + h - 1, w, 1, c)
+        self.fill_rect(x, y, 1, h, c)
+        self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def fill_rect(self, x: int, y: int, w: int, h: int, c: int) -> None:
+        if h < 1 or w < 1 or x + w <= 0 or y + h <= 0 or y >= self.height or x >= self.width:
+            return
+
+        x_end = min(self.width, x + w)
+        y_end = min(self.height, y + h)
+        x = max(x, 0)
+        y = max(y, 0)
+
+        for row in range(y, y_end):
+            for column in range(x, x_end):
+                self._set(column, row, c)
+
+    def line(self, x1: int, y1: int, x2: int, y2: int, c: int) -> None:
+        # Same Bresenham variant as modframebuf.c, so that the emulated pixels match the device
+        dx = x2 - x1
+        if dx > 0:
+            sx = 1
+        else:
+            dx = -dx
+            sx = -1
+
+        dy = y2 - y1
+        if dy > 0:
+            sy = 1
+        else:
+            dy = -dy
+            sy = -1
+
+        steep = dy > dx
+        if steep:
+            x1, y1 = y1, x1
+            dx, dy = dy, dx
+            sx, sy = sy, sx
+
+        e = 2 * dy - dx
+        for _ in range(dx):
+            if steep:
+                if 0 <= y1 < self.width and 0 <= x1 < self.height:
+                    self._set(y1, x1, c)
+            else:
+                if 0 <= x1 < self.width and 0 <= y1 < self.height:
+                    self._set(x1, y1, c)
+
+            while e >= 0:
+                y1 += sy
+                e -= 2 * dx
+
+            x1 += sx
+            e += 2 * dy
+
+        if 0 <= x2 < self.width and 0 <= y2 < self.height:
+            self._set(x2, y2, c)
+
+    def text(self, s: str, x0: int, y0: int, c: int = 1) -> None:
+        for char in s:
+            code = ord(char)
+            if code < FIRST_CHAR or code > LAST_CHAR:
+                code = LAST_CHAR
+
+            glyph = FONT[code - FIRST_CHAR]
+            for column in range(8):
+                bits = glyph[column]
+                x = x0 + column
+                if 0 <= x < self.width:
+                    y = y0
+                    while bits:
+                        if bits & 1 and 0 <= y < self.height:
+                            self._set(x, y, c)
+                        bits >>= 1
+                        y += 1
+
+            x0 += 8
+
+    def blit(self, fbuf, x: int, y: int, key: int = -1, palette=None) -> None:
+        if x >= self.width or y >= self.height or -x >= fbuf.width or -y >= fbuf.height:
+            return
+
+        x_start = max(0, -x)
+        y_start = max(0, -y)
+        x_end = min(fbuf.width, self.width - x)
+        y_end = min(fbuf.height, self.height - y)
+
+        for row in range(y_start, y_end):
+            for column in range(x_start, x_end):
+                c = fbuf._get(column, row)
+                if palette is not None:
+                    c = palette._get(c, 0)
+                if c != key:
+                    self._set(x + column, y + row, c)
+
+    def scroll(self, xstep: int, ystep: int) -> None:
+        # Same order as modframebuf.c, pixels the image moved away from keep their value
+        if xstep < 0:
+            x_start, x_end, dx = 0, self.width + xstep, 1
+            if x_end <= 0:
+                return
+        else:
+            x_start, x_end, dx = self.width - 1, xstep - 1, -1
+            if x_end >= x_start:
+                return
+
+        if ystep < 0:
+            y, y_end, dy = 0, self.height + ystep, 1
+            if y_end <= 0:
+                return
+        else:
+            y, y_end, dy = self.height - 1, ystep - 1, -1
+            if y_end >= y:
+                return
+
+        while y != y_end:
+            for x in range(x_start, x_end, dx):
+                self._set(x, y, self._get(x - xstep, y - ystep))
+            y += dy
+
+    def _get(self, x: int, y: int) -> int:
+        if self.format == GS2_HMSB:
+            shift = (x & 0x03) << 1
+            return (self.buffer[(x + y * self.stride) >> 2] >> shift) & 0x03
+
+        offset = 7 - (x & 0x07)
+        return (self.buffer[(x + y * self.stride) >> 3] >> offset) & 0x01
+
+    def _set(self, x: int, y: int, c: int) -> None:
+        if self.format == GS2_HMSB:
+            index = (x + y * self.stride) >> 2
+            shift = (x & 0x03) << 1
+            self.buffer[index] = ((c & 0x03) << shift) | (self.buffer[index] & ~(0x03 << shift))
+            return
+
+        index = (x + y * self.stride) >> 3
+        offset = 7 - (x & 0x07)
+        self.buffer[index] = ((c & 0x01) << offset) | (self.buffer[index] & ~(0x01 << offset))
@@ -0,0 +1,121 @@
+"""
+Emulated MicroPython machine module, backed by the board model.
+"""
+from emulator.board import Board
+
+board = Board()
+
+
+class DeepSleep(Exception):
+    """
+    Raised by deepsleep, since the emulated program can not continue after it.
+    """
+
+    def __init__(self, time_ms: int):
+        super().__init__("deepsleep for %d ms" % time_ms)
+        self.time_ms = time_ms
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id: int, mode: int = -1, pull: int = -1, value: int = None):
+        self.id = id
+        self.mode = mode
+        self._value = 1 if pull == self.PULL_UP else 0
+        self.irq_handler = None
+        self.irq_trigger = 0
+        board.pins[id] = self
+
+        if value is not None:
+            self.value(value)
+
+    def value(self, x: int = None):
+        if x is None:
+            return board.pin_value(self.id, self._value)
+
+        self._value = 1 if x else 0
+        board.pin_changed(self.id, self._value)
+
+    def on(self) -> None:
+        self.value(1)
+
+    def off(self) -> None:
+        self.value(0)
+
+    def __call__(self, x: int = None):
+        return self.value(x)
+
+    def irq(self, handler=None, trigger: int = IRQ_FALLING | IRQ_RISING, hard: bool = False) -> None:
+        self.irq_handler = handler
+        self.irq_trigger = trigger
+
+
+class SPI:
+    def __init__(self, id: int, baudrate: int = 1_000_000, **kwargs):
+        self.id = id
+        board.set_baudrate(baudrate)
+
+    def init(self, baudrate: int = 1_000_000, **kwargs) -> None:
+        board.set_baudrate(baudrate)
+
+    def write(self, buf) -> None:
+        board.spi_write(buf)
+
+    def deinit(self) -> None:
+        pass
+
+
+class RTC:
+    _datetime = (2021, 1, 1, 4, 0, 0, 0, 0)
+
+    def datetime(self, datetimetuple: tuple = None):
+        if datetimetuple is None:
+            return RTC._datetime
+        RTC._datetime = tuple(datetimetuple)
+
+
+def lightsleep(time_ms: int = None) -> None:
+    """
+    Sleeps until time_ms has passed or a pin interrupt fires.
+    """
+    edge_us = board.next_irq_us()
+    if time_ms is None and edge_us is None:
+        raise RuntimeError("lightsleep without a timeout or a pending interrupt never wakes up")
+
+    until_us = board.clock.now_us + time_ms * 1000 if time_ms is not None else edge_us
+    if edge_us is not None:
+        until_us = min(until_us, edge_us)
+    board.sleep_us(until_us - board.clock.now_us)
+
+
+def disable_irq() -> int:
+    # Time only passes in sleeps, so no interrupt can come between a check and the sleep that follows it
+    return 0
+
+
+def enable_irq(state: int = 0) -> None:
+    pass
+
+
+def deepsleep(time_ms: int = None) -> None:
+    board.deep_sleep_ms = time_ms
+    raise DeepSleep(time_ms or 0)
+
+
+def reset() -> None:
+    raise DeepSleep(0)
+
+
+def freq(hz: int = None) -> int:
+    return 125_000_000
+
+
+def unique_id() -> bytes:
+    return b"\xe6\x61\x38\x52\x83\x17\x2c\x2e"
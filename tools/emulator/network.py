@@ -0,0 +1,78 @@
+"""
+Emulated MicroPython network module.
+The station connects at once, the host network is used for the actual requests.
+"""
+from emulator import machine
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 3
+
+# Modelled time from connect() until the station has an address
+CONNECT_MS = 2500
+# Modelled time of a connect with a static address on a given channel, which skips the scan and DHCP
+FAST_CONNECT_MS = 600
+
+ACCESS_POINT = (b"emulator", b"\x02\x00\x00\x00\x00\x01", 6, -60, 3, 0)
+DHCP_LEASE = ("192.168.1.50", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+
+
+class WLAN:
+    def __init__(self, interface: int = STA_IF):
+        self._active = False
+        self._connected_at_us = None
+        self._config = {"mac": b"\x28\xcd\xc1\x00\x00\x01", "ssid": "", "channel": 6}
+        self._ifconfig = ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+        self._static = False
+
+    def active(self, is_active: bool = None):
+        if is_active is None:
+            return self._active
+
+        self._active = bool(is_active)
+        if not self._active:
+            self._connected_at_us = None
+
+    def connect(self, ssid: str = None, key: str = None, bssid: bytes = None, channel: int = None) -> None:
+        self._config["ssid"] = ssid
+        if not self._static:
+            self._ifconfig = DHCP_LEASE
+
+        fast = self._static and self._ifconfig == DHCP_LEASE and bssid in (None, ACCESS_POINT[1]) and \
+            channel == ACCESS_POINT[2]
+        self._connected_at_us = machine.board.clock.now_us + (FAST_CONNECT_MS if fast else CONNECT_MS) * 1000
+
+    def scan(self) -> list:
+        return [ACCESS_POINT]
+
+    def disconnect(self) -> None:
+        self._connected_at_us = None
+
+    def isconnected(self) -> bool:
+        return self._connected_at_us is not None and machine.board.clock.now_us >= self._connected_at_us
+
+    def status(self, param: str = None):
+        if param == "rssi":
+            return -60
+        if self.isconnected():
+            return STAT_GOT_IP
+        return STAT_CONNECTING if self._connected_at_us is not None else STAT_IDLE
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self._ifconfig if self.isconnected() else ("0.0.0.0",) * 4
+
+        self._static = config != "dhcp"
+        if self._static:
+            self._ifconfig = tuple(config)
+
+    def config(self, *args, **kwargs):
+        # Like the rp2 port, the station reports its channel but not the BSSID it joined
+        if args:
+            if args[0] not in self._config:
+                raise ValueError("unknown config param")
+            return self._config[args[0]]
+        self._config.update(kwargs)
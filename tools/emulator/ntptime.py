@@ -0,0 +1,18 @@
+"""
+Emulated MicroPython ntptime module, sets the emulated RTC from the host clock.
+"""
+import time
+
+from emulator import machine
+
+host = "pool.ntp.org"
+timeout = 1
+
+
+def time_() -> int:
+    return int(time.time())
+
+
+def settime() -> None:
+    t = time.gmtime()
+    machine.RTC().datetime((t.tm_year, t.tm_mon, t.tm_mday, t.tm_wday, t.tm_hour, t.tm_min, t.tm_sec, 0))
@@ -0,0 +1,189 @@
+"""
+Emulated MicroPython uasyncio module.
+A minimal event loop on the virtual clock of the board model: tasks that sleep advance the clock instead of
+waiting, so an emulated wake runs as fast as the host allows.
+"""
+import heapq
+
+from emulator import machine
+
+
+class CancelledError(BaseException):
+    pass
+
+
+class TimeoutError(Exception):
+    pass
+
+
+class _Sleep:
+    def __init__(self, ms: int):
+        self._ms = ms
+
+    def __await__(self):
+        yield ("sleep", self._ms)
+
+
+def sleep_ms(ms: int) -> _Sleep:
+    return _Sleep(max(0, int(ms)))
+
+
+def sleep(seconds: float) -> _Sleep:
+    return _Sleep(max(0, int(seconds * 1000)))
+
+
+class Task:
+    def __init__(self, coro):
+        self.coro = coro
+        self.done = False
+        self.result = None
+        self.exception = None
+        self.waiters = []
+
+    def __await__(self):
+        if not self.done:
+            yield ("wait", self)
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+    def cancel(self) -> bool:
+        if self.done:
+            return False
+        _loop.schedule(self, CancelledError(), 0)
+        return True
+
+
+class ThreadSafeFlag:
+    """
+    Flag set from an interrupt handler and awaited by one task.
+    """
+
+    def __init__(self):
+        self._set = False
+        self._waiter = None
+
+    def set(self) -> None:
+        self._set = True
+        if self._waiter is not None:
+            waiter = self._waiter
+            self._waiter = None
+            _loop.schedule(waiter, None, 0)
+
+    def clear(self) -> None:
+        self._set = False
+
+    def __await__(self):
+        if not self._set:
+            yield ("flag", self)
+        self._set = False
+
+    async def wait(self) -> None:
+        await self
+
+
+class _Loop:
+    def __init__(self):
+        self._queue = []
+        self._sequence = 0
+
+    def schedule(self, task: Task, value, delay_us: int) -> None:
+        self._sequence += 1
+        heapq.heappush(self._queue, (machine.board.clock.now_us + delay_us, self._sequence, task, value))
+
+    def run_until_complete(self, main: Task):
+        while not main.done:
+            # Pin interrupts fire when the clock reaches their edge
+            edge_us = machine.board.next_irq_us()
+            if edge_us is not None and (not self._queue or edge_us < self._queue[0][0]):
+                self._advance(edge_us)
+                continue
+
+            if not self._queue:
+                raise RuntimeError("Deadlock, no task can run")
+
+            wake_us, sequence, task, value = heapq.heappop(self._queue)
+            self._advance(wake_us)
+            self._step(task, value)
+
+        if main.exception is not None:
+            raise main.exception
+        return main.result
+
+    def _advance(self, until_us: int) -> None:
+        now_us = machine.board.clock.now_us
+        if until_us > now_us:
+            machine.board.sleep_us(until_us - now_us)
+
+    def _step(self, task: Task, value) -> None:
+        if task.done:
+            return
+
+        try:
+            if isinstance(value, BaseException):
+                request = task.coro.throw(value)
+            else:
+                request = task.coro.send(value)
+        except StopIteration as e:
+            self._finish(task, e.value, None)
+            return
+        except BaseException as e:
+            self._finish(task, None, e)
+            return
+
+        kind, argument = request
+        if kind == "sleep":
+            self.schedule(task, None, argument * 1000)
+        elif kind == "wait":
+            if argument.done:
+                self.schedule(task, None, 0)
+            else:
+                argument.waiters.append(task)
+        elif kind == "flag":
+            argument._waiter = task
+
+    def _finish(self, task: Task, result, exception) -> None:
+        task.done = True
+        task.result = result
+        task.exception = exception
+        for waiter in task.waiters:
+            self.schedule(waiter, None, 0)
+        task.waiters = []
+
+
+_loop = _Loop()
+
+
+def create_task(coro) -> Task:
+    task = Task(coro)
+    _loop.schedule(task, None, 0)
+    return task
+
+
+def run(coro):
+    return _loop.run_until_complete(create_task(coro))
+
+
+async def gather(*awaitables):
+    tasks = [awaitable if isinstance(awaitable, Task) else create_task(awaitable) for awaitable in awaitables]
+    return [await task for task in tasks]
+
+
+async def _cancel_after(task: Task, timeout_ms: int) -> None:
+    await sleep_ms(timeout_ms)
+    task.cancel()
+
+
+async def wait_for_ms(awaitable, timeout_ms: int):
+    task = awaitable if isinstance(awaitable, Task) else create_task(awaitable)
+    timer = create_task(_cancel_after(task, timeout_ms))
+    try:
+        return await task
+    except CancelledError:
+        raise TimeoutError()
+    finally:
+        timer.cancel()
+
+
+def get_event_loop() -> _Loop:
+    return _loop
@@ -0,0 +1,53 @@
+"""
+Emulated MicroPython urequests module, backed by urllib on the host.
+"""
+import io
+import json as _json
+import urllib.error
+import urllib.request
+
+
+class Response:
+    def __init__(self, status_code: int, headers: dict, body: bytes):
+        self.status_code = status_code
+        self.reason = b""
+        self.headers = headers
+        self.raw = io.BytesIO(body)
+        self._content = None
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = self.raw.read()
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode()
+
+    def json(self):
+        return _json.loads(self.content)
+
+    def close(self) -> None:
+        self.raw.close()
+
+
+def request(method: str, url: str, data=None, json=None, headers=None, stream=None, timeout=None,
+            parse_headers=True) -> Response:
+    if json is not None:
+        data = _json.dumps(json).encode()
+
+    request = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return Response(response.status, dict(response.headers.items()), response.read())
+    except urllib.error.HTTPError as e:
+        return Response(e.code, dict(e.headers.items()), e.read())
+
+
+def get(url: str, **kwargs) -> Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> Response:
+    return request("POST", url, **kwargs)
@@ -0,0 +1,51 @@
+"""
+Emulated MicroPython utime module.
+Sleeping and the tick counters use the virtual clock of the board model.
+"""
+import time as _time
+
+from emulator import machine
+
+
+def sleep(seconds: float) -> None:
+    machine.board.sleep_us(int(seconds * 1_000_000))
+
+
+def sleep_ms(ms: int) -> None:
+    machine.board.sleep_us(ms * 1000)
+
+
+def sleep_us(us: int) -> None:
+    machine.board.sleep_us(us)
+
+
+def ticks_us() -> int:
+    return machine.board.clock.now_us
+
+
+def ticks_ms() -> int:
+    return machine.board.clock.now_us // 1000
+
+
+def ticks_add(ticks: int, delta: int) -> int:
+    return ticks + delta
+
+
+def ticks_diff(ticks1: int, ticks2: int) -> int:
+    return ticks1 - ticks2
+
+
+def time() -> int:
+    return int(_time.time())
+
+
+def localtime(secs: int = None) -> tuple:
+    return _time.localtime(secs)[:8]
+
+
+def gmtime(secs: int = None) -> tuple:
+    return _time.gmtime(secs)[:8]
+
+
+def mktime(t: tuple) -> int:
+    return int(_time.mktime(tuple(t[:8]) + (0,)))
@@ -0,0 +1,81 @@
+"""
+Local stand-in for the price API, serving a synthetic payload with the headers of the real one.
+
+    python tools/fake_api.py --port 8000 --points 48
+
+Point API_URL in secrets.py, or the --api-url of tools/prerender_server.py, at http://<host>:8000/prices.
+The payload starts at midnight today in UTC+2 and its current interval is taken from the clock of the host.
+"""
+import argparse
+import datetime
+import hashlib
+import http.server
+import json
+import threading
+
+import synthetic
+
+
+def make_payload(points: int, resolution_minutes: int) -> bytes:
+    """
+    Returns a payload starting at midnight today, with the current interval at the time of the call.
+    """
+    timezone = datetime.timezone(datetime.timedelta(hours=2))
+    now = datetime.datetime.now(timezone)
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    current_index = min(points - 1, int((now - start).total_seconds() // 60) // resolution_minutes)
+    return json.dumps(synthetic.make_payload(points, resolution_minutes, current_index, start)).encode()
+
+
+class PriceApiHandler(http.server.BaseHTTPRequestHandler):
+    points = 48
+    resolution_minutes = 60
+
+    def do_GET(self) -> None:
+        body = make_payload(self.points, self.resolution_minutes)
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start(port: int = 8000, points: int = 48, resolution_minutes: int = 60) -> http.server.HTTPServer:
+    """
+    Serves the fake API from a background thread and returns the server. Port 0 picks a free port.
+    """
+    handler = type("Handler", (PriceApiHandler,), {"points": points, "resolution_minutes": resolution_minutes})
+    server = http.server.ThreadingHTTPServer(("", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--points", type=int, default=48, help="number of price intervals")
+    parser.add_argument("--resolution", type=int, default=60, help="minutes per interval")
+    args = parser.parse_args()
+
+    server = start(args.port, args.points, args.resolution)
+    print("Price API on http://%s:%d/prices" % server.server_address)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Renders the chart on a computer and serves the planes ready to send to the display, so that a device with
+PRERENDER_URL in secrets.py only downloads a frame instead of fetching, parsing and drawing the prices.
+
+    python tools/prerender_server.py --api-url https://<price api> --port 8001
+    python tools/prerender_server.py --fake-api     # with tools/fake_api.py as the price API
+
+The firmware modules in ./src draw the frame with the emulated MicroPython modules, so a frame is identical to
+one drawn on the device. GET /frame?time=<seconds since 1970 UTC> renders the chart at that time, or at the
+time of the host without it. Responses are gzip compressed when asked for and carry an ETag.
+"""
+import argparse
+import gzip
+import hashlib
+import http.server
+import time
+import urllib.parse
+import urllib.request
+
+import emulator
+
+emulator.install()
+import main as firmware  # noqa: E402
+import prerender  # noqa: E402
+from benchmark import PayloadHandler  # noqa: E402
+from chart import Chart  # noqa: E402
+from display import Display  # noqa: E402
+
+import fake_api  # noqa: E402
+
+# Seconds a fetched payload is reused
+PAYLOAD_MAX_AGE = 300
+
+
+class PayloadSource:
+    """
+    Fetches the price payload from the API and keeps it for PAYLOAD_MAX_AGE seconds.
+    """
+
+    def __init__(self, api_url: str):
+        self._api_url = api_url
+        self._payload = None
+        self._fetched = 0
+
+    def get(self) -> bytes:
+        if self._payload is None or time.time() - self._fetched > PAYLOAD_MAX_AGE:
+            with urllib.request.urlopen(self._api_url, timeout=30) as response:
+                self._payload = response.read()
+            self._fetched = time.time()
+        return self._payload
+
+
+def render(payload: bytes, now: int = None) -> bytes:
+    """
+    Returns the frame of the chart of a payload.
+    :param now: Time in seconds since 1970-01-01 00:00 UTC of the current slot, the current interval of the
+        payload if None or not in the payload.
+    """
+    series = firmware.get_data(PayloadHandler(payload))
+    if now is not None and series.index_of(series.key_at(now)) is not None:
+        series.set_current(series.key_at(now))
+
+    display = Display(planar=True, init=False)
+    display.image.fill(display.WHITE)
+    Chart(display).update(series)
+
+    start_key, stop_key = Chart.get_window(series.current_key, series.slot_minutes)
+    old_plane, new_plane = display.get_planes()
+    return prerender.encode(old_plane, new_plane, series.current_key, series.keys[-1], stop_key,
+                            series.slot_minutes, series.utc_offset)
+
+
+class FrameHandler(http.server.BaseHTTPRequestHandler):
+    source = None
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != "/frame":
+            self.send_error(404)
+            return
+
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            now = int(query["time"][0]) if "time" in query else int(time.time())
+            frame = render(self.source.get(), now)
+        except Exception as e:
+            self.send_error(502, "Could not render frame: %s" % e)
+            return
+
+        etag = '"%s"' % hashlib.sha1(frame).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = frame
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(frame, mtime=0)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        print("%s %s" % (self.address_string(), format % args))
+
+
+def start(api_url: str, port: int = 8001) -> http.server.HTTPServer:
+    """
+    Creates the server, frames are rendered one at a time since the emulated board is shared.
+    """
+    handler = type("Handler", (FrameHandler,), {"source": PayloadSource(api_url)})
+    return http.server.HTTPServer(("", port), handler)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-url", help="URL of the price API")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--fake-api", action="store_true", help="serve tools/fake_api.py as the price API")
+    parser.add_argument("--fake-api-port", type=int, default=8000)
+    args = parser.parse_args()
+
+    api_url = args.api_url
+    if args.fake_api:
+        fake = fake_api.start(args.fake_api_port)
+        api_url = "http://127.0.0.1:%d/prices" % fake.server_address[1]
+    if api_url is None:
+        parser.error("--api-url or --fake-api is needed")
+
+    server = start(api_url, args.port)
+    print("Frames on http://%s:%d/frame from %s" % (server.server_address + (api_url,)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Synthetic price feed payloads shaped like the responses of the price API.
+"""
+import datetime
+import json
+import math
+import random
+
+
+def make_payload(points: int = 48, resolution_minutes: int = 60, current_index: int = None,
+                 start: datetime.datetime = None, seed: int = 1) -> dict:
+    """
+    Returns a payload with a number of price intervals starting at midnight.
+    :param points: Number of intervals.
+    :param resolution_minutes: Length of every interval.
+    :param current_index: Index of the current interval, a third into the data if None.
+    :param start: Time of the first interval, midnight today if None.
+    :param seed: Seed for the price noise.
+    """
+    rng = random.Random(seed)
+    timezone = datetime.timezone(datetime.timedelta(hours=2))
+
+    if start is None:
+        start = datetime.datetime.now(timezone).replace(hour=0, minute=0, second=0, microsecond=0)
+    if current_index is None:
+        current_index = points // 3
+
+    intervals = []
+    for index in range(points):
+        time = start + datetime.timedelta(minutes=index * resolution_minutes)
+        hour = time.hour + time.minute / 60
+        # Morning and evening peaks on top of a base price
+        price = 60 + 45 * math.exp(-((hour - 8) ** 2) / 6) + 70 * math.exp(-((hour - 19) ** 2) / 5)
+        price += rng.uniform(-8, 8)
+
+        intervals.append({
+            "startDateTime": time.isoformat(timespec="milliseconds"),
+            "endDateTime": (time + datetime.timedelta(minutes=resolution_minutes)).isoformat(timespec="milliseconds"),
+            "price": round(max(price, 0.5), 2),
+        })
+
+    return {
+        "current": intervals[current_index],
+        "intervals": intervals,
+    }
+
+
+def load_payload(path: str) -> dict:
+    """
+    Returns a payload recorded from the price API.
+    """
+    with open(path) as file:
+        return json.load(file)
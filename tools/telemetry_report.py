@@ -0,0 +1,132 @@
+"""
+Decodes the telemetry ring buffer copied from the device into per-phase percentiles and the estimated charge
+used per wake cycle.
+
+    mpremote cp :telemetry.bin .
+    python tools/telemetry_report.py telemetry.bin
+    python tools/telemetry_report.py telemetry.bin --radio-ma 70 --sleep-ma 1.3
+
+The charge estimate multiplies the time of every phase with a typical current of the Pico W in that phase.
+Measure the board with a power profiler and pass the measured currents for accurate figures.
+"""
+import argparse
+import struct
+import sys
+
+import emulator
+
+emulator.install()
+import telemetry  # noqa: E402
+
+# Typical currents in mA
+CPU_MA = 25.0
+RADIO_MA = 60.0
+BUSY_MA = 30.0
+SLEEP_MA = 1.5
+
+PERCENTILES = (50, 90, 99)
+
+
+def read_cycles(path: str) -> list:
+    """
+    Returns the stored wake cycles from oldest to newest as dicts of phase to
+    (count, us, free, allocated, largest free block).
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+
+    header_size = struct.calcsize(telemetry.HEADER_FORMAT)
+    magic, record_size, capacity, index, cycle = struct.unpack(telemetry.HEADER_FORMAT, data[:header_size])
+    if magic != telemetry.MAGIC or record_size != struct.calcsize(telemetry.RECORD_FORMAT):
+        raise ValueError("Not a telemetry file")
+
+    cycles = []
+    current = None
+    current_cycle = None
+    for i in range(capacity):
+        offset = header_size + ((index + i) % capacity) * record_size
+        record_cycle, phase_id, count, us, free, allocated, largest = struct.unpack(
+            telemetry.RECORD_FORMAT, data[offset:offset + record_size])
+        if record_cycle == 0 and count == 0:
+            continue
+
+        if record_cycle != current_cycle:
+            current = {}
+            current_cycle = record_cycle
+            cycles.append(current)
+        current[phase_id] = (count, us, free, allocated, largest)
+
+    return cycles
+
+
+def percentile(values: list, p: int) -> float:
+    values = sorted(values)
+    if not values:
+        return 0
+    index = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[index]
+
+
+def charge_mah(cycle: dict, cpu_ma: float, radio_ma: float, busy_ma: float, sleep_ma: float) -> float:
+    """
+    Returns the estimated charge used by a wake cycle, including the sleep after it.
+    """
+    currents = {
+        telemetry.CONNECT: radio_ma,
+        telemetry.FETCH: radio_ma,
+        telemetry.BUSY: busy_ma,
+        telemetry.SLEEP: sleep_ma,
+    }
+
+    mah = 0.0
+    for phase_id, (count, us, free, allocated, largest) in cycle.items():
+        mah += us / 3.6e9 * currents.get(phase_id, cpu_ma)
+    return mah
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="telemetry.bin copied from the device")
+    parser.add_argument("--cpu-ma", type=float, default=CPU_MA, help="current while computing")
+    parser.add_argument("--radio-ma", type=float, default=RADIO_MA, help="current while the radio is on")
+    parser.add_argument("--busy-ma", type=float, default=BUSY_MA, help="current while the display refreshes")
+    parser.add_argument("--sleep-ma", type=float, default=SLEEP_MA, help="current in deepsleep")
+    args = parser.parse_args()
+
+    cycles = read_cycles(args.path)
+    if not cycles:
+        sys.exit("No cycles recorded")
+
+    print("%d cycles" % len(cycles))
+    print("%-8s %6s" % ("phase", "cycles") + "".join(" %9s" % ("p%d ms" % p) for p in PERCENTILES) +
+          " %9s %9s %9s" % ("max ms", "min free", "min block"))
+
+    for phase_id, name in enumerate(telemetry.PHASE_NAMES):
+        records = [cycle[phase_id] for cycle in cycles if phase_id in cycle]
+        if not records:
+            continue
+
+        times = [us / 1000 for count, us, free, allocated, largest in records]
+        free = min(free for count, us, free, allocated, largest in records)
+        blocks = [largest for count, us, free, allocated, largest in records if largest]
+        print("%-8s %6d" % (name, len(records)) + "".join(" %9.1f" % percentile(times, p) for p in PERCENTILES) +
+              " %9.1f %9d %9s" % (max(times), free, min(blocks) if blocks else "-"))
+
+    awake = [sum(record[1] for phase_id, record in cycle.items() if phase_id != telemetry.SLEEP)
+             for cycle in cycles]
+    charges = [charge_mah(cycle, args.cpu_ma, args.radio_ma, args.busy_ma, args.sleep_ma) for cycle in cycles]
+
+    print()
+    print("awake ms " + " ".join("p%d %.1f" % (p, percentile(awake, p) / 1000) for p in PERCENTILES))
+    print("mAh per cycle " + " ".join("p%d %.4f" % (p, percentile(charges, p)) for p in PERCENTILES) +
+          " mean %.4f" % (sum(charges) / len(charges)))
+
+    cycle_hours = [cycle.get(telemetry.SLEEP, (0, 0))[1] / 3.6e9 + awake_us / 3.6e9
+                   for cycle, awake_us in zip(cycles, awake)]
+    total_hours = sum(cycle_hours)
+    if total_hours:
+        print("mAh per day %.1f" % (sum(charges) / total_hours * 24))
+
+
+if __name__ == "__main__":
+    main()